@@ -11,6 +11,11 @@ except Exception:
 
 
 def main():
+    import multiprocessing
+
+    # the image transcoder starts new processes. needed by the frozen builds.
+    multiprocessing.freeze_support()
+
     from .core import start_app
 
     start_app()
@@ -3,6 +3,7 @@ import os
 import shutil
 
 from ..assets.web import get_css_style, get_js_script
+from ..models.chapter import Chapter
 
 logger = logging.getLogger(__name__)
 
@@ -85,7 +86,7 @@ def make_webs(app, data):
         os.makedirs(dir_name, exist_ok=True)
         os.makedirs(img_dir, exist_ok=True)
         for index, chapter in enumerate(chapters):
-            assert isinstance(chapter, dict)
+            assert isinstance(chapter, Chapter)
 
             # Generate HTML file
             direction = "rtl" if app.crawler.is_rtl else "ltr"
@@ -6,9 +6,8 @@ from questionary import prompt
 from ...core import display
 from ...core.app import App
 from ...core.arguments import get_args
-from ...core.crawler import Crawler
 from ...core.exeptions import LNException
-from ...core.sources import crawler_list, prepare_crawler, rejected_sources
+from ...core.sources import get_searchable_links, prepare_crawler, rejected_sources
 from .open_folder_prompt import display_open_folder
 from .resume_download import resume_session
 
@@ -35,16 +34,13 @@ def start(self):
     # Set filename if provided
     self.app.good_file_name = (args.filename or "").strip()
     self.app.no_suffix_after_filename = args.filename_only
+    self.app.image_profile = args.image_profile
 
     # Process user input
     self.app.user_input = self.get_novel_url()
     if not self.app.user_input.startswith("http"):
         logger.info("Detected query input")
-        search_links = [
-            str(link)
-            for link, crawler in crawler_list.items()
-            if crawler.search_novel != Crawler.search_novel
-        ]
+        search_links = get_searchable_links()
         self.search_mode = True
     else:
         url = urlparse(self.app.user_input)
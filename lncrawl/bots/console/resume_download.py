@@ -13,7 +13,7 @@ from ...core.arguments import get_args
 from ...core.crawler import Crawler
 from ...core.exeptions import LNException
 from ...core.sources import prepare_crawler
-from ...models import MetaInfo
+from ...models import Chapter, MetaInfo, Volume
 from .open_folder_prompt import display_open_folder
 
 logger = logging.getLogger(__name__)
@@ -87,6 +87,7 @@ def load_session_from_metadata(meta: MetaInfo) -> App:
     app.login_data = meta.session.login_data
     app.pack_by_volume = meta.session.pack_by_volume
     app.output_formats = meta.session.output_formats
+    app.image_profile = meta.session.get("image_profile", app.image_profile)
     app.good_file_name = meta.session.good_file_name
     app.no_suffix_after_filename = meta.session.no_append_after_filename
     logger.info("Novel Url: %s", meta.novel.url)
@@ -98,8 +99,8 @@ def load_session_from_metadata(meta: MetaInfo) -> App:
     app.crawler.novel_title = meta.novel.title
     app.crawler.novel_author = ", ".join(meta.novel.authors)
     app.crawler.novel_cover = meta.novel.cover_url
-    app.crawler.volumes = meta.novel.volumes
-    app.crawler.chapters = meta.novel.chapters
+    app.crawler.volumes = [Volume(**vol) for vol in meta.novel.volumes]
+    app.crawler.chapters = [Chapter(**chap) for chap in meta.novel.chapters]
     app.crawler.is_rtl = meta.novel.is_rtl
     app.crawler.language = meta.novel.language
     app.crawler.novel_synopsis = meta.novel.synopsis
@@ -12,6 +12,7 @@ import discord
 from lncrawl.core.app import App
 from lncrawl.core.crawler import Crawler
 from lncrawl.core.sources import prepare_crawler
+from lncrawl.models import CombinedSearchResult, ImageProfile
 from lncrawl.utils.uploader import upload
 
 from .config import available_formats, disable_search, logger
@@ -26,7 +27,7 @@ class MessageHandler:
         self.last_activity = datetime.now()
         self.closed = False
         self.get_current_status = None
-        self.selected_novel: Optional[dict] = None
+        self.selected_novel: Optional[CombinedSearchResult] = None
         self.executor = ThreadPoolExecutor(max_workers=10, thread_name_prefix=uid)
 
     def process(self, message):
@@ -246,7 +247,7 @@ class MessageHandler:
         self.display_sources_selection()
 
     def display_sources_selection(self):
-        assert isinstance(self.selected_novel, dict)
+        assert isinstance(self.selected_novel, CombinedSearchResult)
         novel_list = self.selected_novel["novels"]
         self.send_sync(
             "**%s** is found in %d sources:\n"
@@ -282,7 +283,7 @@ class MessageHandler:
     def handle_sources_to_search(self):
         self.state = self.busy_state
 
-        assert isinstance(self.selected_novel, dict)
+        assert isinstance(self.selected_novel, CombinedSearchResult)
         if len(self.selected_novel["novels"]) == 1:
             novel = self.selected_novel["novels"][0]
             return self.handle_search_result(novel)
@@ -457,6 +458,9 @@ class MessageHandler:
                     "- Send `epub pdf` to download both epub and pdf formats.",
                     "- Send `{space separated format names}` for multiple formats",
                     "Available formats: `" + "` `".join(available_formats) + "`",
+                    "To optimize the images for a device, add one of these: `"
+                    + "` `".join(x.value for x in ImageProfile)
+                    + "`",
                 ]
             )
         )
@@ -470,6 +474,12 @@ class MessageHandler:
             self.get_novel_url()
             return
 
+        profiles = [x.value for x in ImageProfile if x.value in text.lower()]
+        for profile in profiles:
+            text = re.sub(profile, "", text, flags=re.I).strip()
+        if profiles:
+            self.app.image_profile = ImageProfile(profiles[0])
+
         if text == "!all":
             output_format = set(available_formats)
         else:
@@ -485,7 +495,8 @@ class MessageHandler:
 
         self.app.output_formats = {x: (x in output_format) for x in available_formats}
         self.send_sync(
-            "I will generate e-book in (%s) format" % (", ".join(output_format))
+            "I will generate e-book in (%s) format" % (", ".join(output_format)),
+            "Images will be optimized for: %s" % ImageProfile(self.app.image_profile).value,
         )
 
         self.send_sync(
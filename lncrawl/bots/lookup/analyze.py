@@ -10,7 +10,7 @@ from ...core.crawler import Crawler
 from ...core.display import LINE_SIZE
 from ...core.exeptions import LNException
 from ...core.novel_info import format_novel
-from ...core.sources import crawler_list, rejected_sources, template_list
+from ...core.sources import crawler_list, load_all_crawlers, rejected_sources, template_list
 
 logger = logging.getLogger(__name__)
 
@@ -23,6 +23,9 @@ def analyze_url(base_url: str, url: str) -> Type[Crawler]:
     if CrawlerType:
         raise LNException("A crawler already exists for this url")
 
+    # the templates are found by importing the sources
+    load_all_crawlers()
+
     for index, template in enumerate(template_list):
         name = template.__name__
         print(Style.BRIGHT + Chars.CLOVER, "Checking", name, end=" ")
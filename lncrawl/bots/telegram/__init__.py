@@ -10,6 +10,7 @@ from telegram.ext import (Application, CommandHandler, ContextTypes,
 
 from lncrawl.core.app import App
 from lncrawl.core.sources import prepare_crawler
+from lncrawl.models import ImageProfile
 from lncrawl.utils.uploader import upload
 
 logger = logging.getLogger(__name__)
@@ -109,6 +110,11 @@ class TelegramBot:
                         filters.TEXT & ~(filters.COMMAND), self.handle_output_format
                     ),
                 ],
+                "handle_image_profile": [
+                    MessageHandler(
+                        filters.TEXT & ~(filters.COMMAND), self.handle_image_profile
+                    ),
+                ],
             },
         )
         self.application.add_handler(conv_handler)
@@ -574,7 +580,6 @@ class TelegramBot:
 
     async def handle_output_format(self, update, context):
         app = context.user_data.get("app")
-        user = update.message.from_user
 
         text = update.message.text.strip().lower()
         app.output_formats = {}
@@ -589,6 +594,30 @@ class TelegramBot:
             await update.message.reply_text("Sorry, I did not understand.")
             return
 
+        context.user_data["output_format"] = text
+        await update.message.reply_text(
+            "Which device do you want the images to be optimized for?",
+            reply_markup=ReplyKeyboardMarkup(
+                [[x.value] for x in ImageProfile],
+                one_time_keyboard=True,
+            ),
+        )
+        return "handle_image_profile"
+
+    async def handle_image_profile(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        app = context.user_data.get("app")
+        user = update.message.from_user
+
+        text = update.message.text.strip().lower()
+        profiles = [x.value for x in ImageProfile]
+        if text not in profiles:
+            await update.message.reply_text(
+                "Sorry, I did not understand. Try one of these: " + ", ".join(profiles)
+            )
+            return
+
+        app.image_profile = ImageProfile(text)
+
         chat_id = update.effective_message.chat_id
         job = context.job_queue.run_once(
             self.process_download_request,
@@ -601,7 +630,7 @@ class TelegramBot:
 
         await update.message.reply_text(
             "Your request has been received."
-            'I will generate book in "%s" format' % text,
+            'I will generate book in "%s" format' % context.user_data.get("output_format"),
             reply_markup=ReplyKeyboardRemove(),
         )
 
@@ -2,3 +2,10 @@ import os
 
 DEFAULT_OUTPUT_PATH = os.path.abspath("Lightnovels")
 META_FILE_NAME = "meta.json"
+DEFAULT_USER_DATA_PATH = os.path.join(os.path.expanduser("~"), ".lncrawl")
+DEFAULT_CACHE_PATH = os.path.join(DEFAULT_USER_DATA_PATH, "cache")
+DEFAULT_CACHE_SIZE = 512 * 1024 * 1024  # bytes
+DEFAULT_CACHE_TTL = 60 * 60  # seconds
+DEFAULT_COOKIE_PATH = os.path.join(DEFAULT_USER_DATA_PATH, "cookies")
+DEFAULT_IMAGE_STORE_PATH = os.path.join(DEFAULT_USER_DATA_PATH, "images")
+DEFAULT_IMAGE_STORE_SIZE = 1024 * 1024 * 1024  # bytes
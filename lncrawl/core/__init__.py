@@ -64,6 +64,12 @@ def start_app():
         os.environ["use_proxy"] = "auto"
         start_proxy_fetcher()
 
+    if args.no_cache:
+        os.environ["no_cache"] = "yes"
+
+    if args.low_memory:
+        os.environ["low_memory"] = "yes"
+
     try:
         bot = os.getenv("BOT", "").lower()
         run_bot(bot)
@@ -0,0 +1,188 @@
+import asyncio
+import atexit
+import logging
+from concurrent.futures import Future
+from http.cookies import SimpleCookie
+from threading import Lock, Thread
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from requests import Response
+from requests.exceptions import ConnectionError, ReadTimeout
+from requests.structures import CaseInsensitiveDict
+
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+logger = logging.getLogger(__name__)
+
+MAX_CONCURRENT_REQUESTS = 256
+
+__engine_lock = Lock()
+__engine: Optional["AsyncEngine"] = None
+
+
+class AsyncEngine:
+    """An asyncio event loop running on a single background thread.
+
+    Coroutines are submitted from any thread with `submit` and resolved with
+    the regular `concurrent.futures.Future`, so the results can be consumed by
+    the `TaskManager.resolve_futures` just like the thread pool tasks.
+
+    The requests per hostname are limited by the `TaskManager.domain_gate`
+    of the caller.
+
+    Args:
+    - max_requests (int, optional): Number of requests to keep in flight. Default: 256.
+    """
+
+    def __init__(self, max_requests: int = MAX_CONCURRENT_REQUESTS) -> None:
+        self.max_requests = max_requests
+        self._session: Optional["aiohttp.ClientSession"] = None
+        self._loop = asyncio.new_event_loop()
+        self._thread = Thread(
+            target=self._loop.run_forever,
+            name="lncrawl_aioengine",
+            daemon=True,
+        )
+        self._thread.start()
+        self._semaphore = self.call(asyncio.Semaphore, max_requests)
+
+    @property
+    def loop(self) -> asyncio.AbstractEventLoop:
+        return self._loop
+
+    @property
+    def has_http_client(self) -> bool:
+        """True if the async http client (aiohttp) is available"""
+        return aiohttp is not None
+
+    def call(self, fn: Callable, *args) -> Any:
+        """Run a plain callable inside the event loop and wait for the result"""
+
+        async def inner():
+            return fn(*args)
+
+        return self.submit(inner()).result()
+
+    def submit(self, coro: Awaitable) -> Future:
+        """Schedules a coroutine to the event loop from any thread.
+
+        Returns:
+            A Future representing the given coroutine.
+        """
+        return asyncio.run_coroutine_threadsafe(coro, self._loop)
+
+    async def run_sync(self, executor, fn: Callable, *args) -> Any:
+        """Adapter to await a blocking callable on the given executor"""
+        return await self._loop.run_in_executor(executor, fn, *args)
+
+    def _get_session(self) -> "aiohttp.ClientSession":
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                # cookies are passed and collected per request by the scraper,
+                # so that crawlers sharing this session do not mix them up.
+                cookie_jar=aiohttp.DummyCookieJar(),
+                connector=aiohttp.TCPConnector(
+                    limit=self.max_requests,
+                    ssl=False,
+                ),
+            )
+        return self._session
+
+    async def request(
+        self,
+        method: str,
+        url: str,
+        headers: Dict[str, str] = {},
+        cookies: Dict[str, str] = {},
+        proxies: Dict[str, str] = {},
+        timeout=None,
+        allow_redirects: bool = True,
+        **kwargs,
+    ) -> Response:
+        """Make an async http request and return it as a `requests.Response`.
+
+        The client errors are raised as `requests` exceptions, so that the
+        callers can handle them with the `ScraperErrorGroup`.
+        """
+        if aiohttp is None:
+            raise ImportError("aiohttp is required for the async engine")
+
+        if isinstance(timeout, tuple):
+            timeout = aiohttp.ClientTimeout(
+                sock_connect=timeout[0],
+                sock_read=timeout[1],
+            )
+        elif timeout:
+            timeout = aiohttp.ClientTimeout(total=timeout)
+
+        proxy = None
+        for value in proxies.values():
+            proxy = value
+
+        async with self._semaphore:
+            try:
+                async with self._get_session().request(
+                    method.upper(),
+                    url,
+                    headers=headers,
+                    cookies=cookies,
+                    proxy=proxy,
+                    timeout=timeout,
+                    allow_redirects=allow_redirects,
+                    **kwargs,
+                ) as res:
+                    content = await res.read()
+            except asyncio.TimeoutError as e:
+                raise ReadTimeout(f"Timed out: {url}") from e
+            except aiohttp.ClientError as e:
+                raise ConnectionError(f"{type(e).__name__}: {e}") from e
+
+        response = Response()
+        response._content = content
+        response.status_code = res.status
+        response.reason = res.reason or ""
+        response.url = str(res.url)
+        response.headers = CaseInsensitiveDict(dict(res.headers))
+        response.encoding = "utf8"
+        response.cookies.update(
+            {
+                name: morsel.value
+                for name, morsel in SimpleCookie(
+                    "\n".join(res.headers.getall("Set-Cookie", []))
+                ).items()
+            }
+        )
+        return response
+
+    async def _close(self):
+        if self._session and not self._session.closed:
+            await self._session.close()
+
+    def shutdown(self) -> None:
+        if self._loop.is_closed():
+            return
+        if aiohttp is not None:
+            try:
+                self.submit(self._close()).result(5)
+            except Exception:
+                pass
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join(5)
+
+
+def get_async_engine() -> AsyncEngine:
+    """Returns the process-wide async engine. Creates one on first use."""
+    global __engine
+    with __engine_lock:
+        if __engine is None:
+            if aiohttp is None:
+                logger.warning(
+                    "aiohttp is not installed. "
+                    "Async engine will run requests on the thread pool."
+                )
+            __engine = AsyncEngine()
+            atexit.register(__engine.shutdown)
+        return __engine
@@ -1,5 +1,6 @@
 import atexit
 import logging
+import os
 import shutil
 from pathlib import Path
 from threading import Thread
@@ -12,11 +13,12 @@ from slugify import slugify
 from .. import constants as C
 from ..binders import available_formats, generate_books
 from ..core.exeptions import LNException
-from ..core.sources import crawler_list, prepare_crawler
-from ..models import Chapter, CombinedSearchResult, OutputFormat
+from ..core.sources import get_searchable_links, prepare_crawler
+from ..models import Chapter, CombinedSearchResult, ImageProfile, OutputFormat
 from .browser import Browser
 from .crawler import Crawler
-from .downloader import fetch_chapter_body, fetch_chapter_images
+from .downloader import (ImageQueue, export_chapter_files, fetch_chapter_body,
+                         fetch_chapter_images)
 from .exeptions import ScraperErrorGroup
 from .novel_info import format_novel, save_metadata
 from .novel_search import search_novels
@@ -40,6 +42,7 @@ class App:
         self.chapters: List[Chapter] = []
         self.book_cover: Optional[str] = None
         self.output_formats: Dict[OutputFormat, bool] = {}
+        self.image_profile: ImageProfile = ImageProfile.original
         self.archived_outputs = None
         self.good_file_name: str = ""
         self.no_suffix_after_filename = False
@@ -75,11 +78,7 @@ class App:
             self.crawler = prepare_crawler(self.user_input)
         else:
             logger.info("Detected query input")
-            self.crawler_links = [
-                str(link)
-                for link, crawler in crawler_list.items()
-                if crawler.search_novel != Crawler.search_novel
-            ]
+            self.crawler_links = get_searchable_links()
 
     def guess_novel_title(self, url: str) -> str:
         try:
@@ -127,6 +126,11 @@ class App:
             raise LNException("No crawler is selected")
 
         if self.can_do("login") and self.login_data:
+            # responses of a logged in session should not be shared
+            self.crawler.use_cache = False
+            # nor the cookies, when the bot is serving multiple users
+            if os.getenv("BOT", "console") != "console":
+                self.crawler.share_cookies = False
             logger.debug("Login with %s", self.login_data)
             self.crawler.login(*list(self.login_data))
 
@@ -160,12 +164,17 @@ class App:
         assert self.crawler
 
         save_metadata(self)
-        fetch_chapter_body(self)
-        save_metadata(self)
-        fetch_chapter_images(self)
+        with ImageQueue(self) as images:
+            # the images are downloaded along with the chapters
+            fetch_chapter_body(self, images)
+            save_metadata(self)
+            fetch_chapter_images(self, images)
         save_metadata(self, True)
 
-        if not self.output_formats.get(OutputFormat.json.value, False):
+        if self.output_formats.get(OutputFormat.json.value, False):
+            export_chapter_files(self)
+        else:
+            # chapter files saved by the older versions
             shutil.rmtree(Path(self.output_path) / "json", ignore_errors=True)
 
         if self.can_do("logout"):
@@ -6,6 +6,7 @@ from .. import constants as C
 from ..assets.version import get_version
 from ..binders import available_formats
 from ..bots import supported_bots
+from ..models import ImageProfile
 from .display import LINE_SIZE, epilog
 
 
@@ -270,6 +271,33 @@ _builder = Args(
             action="store_true",
             help="Ignore images in chapters when downloading.",
         ),
+        Args(
+            "--image-profile",
+            type=str.lower,
+            metavar="NAME",
+            choices=[x.value for x in ImageProfile],
+            default=ImageProfile.original.value,
+            help="Resize the images for a device: "
+            + ", ".join(x.value for x in ImageProfile)
+            + ". Default: original.",
+        ),
+        Args(
+            "--no-cache",
+            action="store_true",
+            help="Do not use the cached responses from previous runs.",
+        ),
+        Args(
+            "--async-engine",
+            action="store_true",
+            help="Download chapters using the asyncio engine (requires aiohttp). "
+            "Only the sources with an async chapter download, e.g. the ones using "
+            "the general soup templates, do not need a thread per chapter.",
+        ),
+        Args(
+            "--low-memory",
+            action="store_true",
+            help="Keep the chapter contents compressed in memory.",
+        ),
         Args(
             "--close-directly",
             action="store_true",
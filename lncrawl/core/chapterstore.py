@@ -0,0 +1,451 @@
+"""
+Embedded store of the downloaded chapters of a novel
+"""
+import json
+import logging
+import sqlite3
+import time
+from pathlib import Path
+from threading import Lock
+from typing import Dict, Iterable, List, Optional, Set, Tuple, Union
+
+from ..models.chapter import Chapter
+from ..utils.compress import CompressedText, compress
+
+logger = logging.getLogger(__name__)
+
+STORE_FILE_NAME = "chapters.db"
+BATCH_SIZE = 50  # chapters to write in one transaction
+BATCH_INTERVAL = 5  # seconds to keep the unwritten chapters at most
+
+# (filename, start, end) of an image element in a chapter body.
+# The start and end are None if the image is not used in the body.
+ImageSpan = Tuple[str, Optional[int], Optional[int]]
+
+
+def find_image_spans(body: str, filenames: Iterable[str]) -> List[ImageSpan]:
+    """Locate the `<img alt="filename">` elements of the images in the body.
+    Each image should have been given a unique filename, as done by
+    `Crawler.extract_chapter_images`."""
+    spans: List[ImageSpan] = []
+    for filename in filenames:
+        found = False
+        key = f'alt="{filename}"'
+        pos = body.find(key)
+        while pos >= 0:
+            # the attribute values are escaped, so the nearest brackets are the element's
+            start = body.rfind("<", 0, pos)
+            end = body.find(">", pos) + 1
+            if start >= 0 and end > 0 and body[start:start + 4].lower() == "<img":
+                spans.append((filename, start, end))
+                found = True
+            pos = body.find(key, pos + len(key))
+        if not found:
+            spans.append((filename, None, None))
+    return spans
+
+
+class StoredBody:
+    """Reference to the body of a chapter in a store. Use `str()` to load it."""
+
+    __slots__ = ("store", "chapter_id")
+
+    def __init__(self, store: "ChapterStore", chapter_id: int) -> None:
+        self.store = store
+        self.chapter_id = chapter_id
+
+    def compressed(self) -> Optional[CompressedText]:
+        return self.store.get_body(self.chapter_id)
+
+    def __str__(self) -> str:
+        body = self.compressed()
+        return str(body) if body is not None else ""
+
+    def __repr__(self) -> str:
+        return f"<StoredBody {self.chapter_id} in {self.store.db_path}>"
+
+
+class ChapterStore:
+    """Keeps the chapters of a novel in a single SQLite database.
+
+    The chapters are written in batches, each batch in one transaction,
+    and can be looked up by id or url. The bodies are stored compressed,
+    and decompressed only when they are read. The restored chapters keep
+    only a `StoredBody` reference, so the bodies stay out of memory.
+
+    The store also indexes the image elements in the chapter bodies, so that
+    the chapters using an image can be found without reading every body.
+
+    Args:
+    - db_path (str): The database file. Usually `<output_path>/chapters.db`.
+    - batch_size (int, optional): Number of chapters to buffer before writing. Default: 50.
+    - batch_interval (float, optional): Seconds to buffer the chapters at most. Default: 5.
+    """
+
+    def __init__(
+        self,
+        db_path: Union[str, Path],
+        batch_size: int = BATCH_SIZE,
+        batch_interval: float = BATCH_INTERVAL,
+    ) -> None:
+        self.db_path = Path(db_path)
+        self.batch_size = batch_size
+        self.batch_interval = batch_interval
+        self._lock = Lock()
+        self._pending: Dict[int, tuple] = {}
+        self._pending_images: Dict[int, List[ImageSpan]] = {}
+        self._flushed_at = time.time()
+
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.db: Optional[sqlite3.Connection] = self._connect()
+        self.db.execute(
+            """
+            CREATE TABLE IF NOT EXISTS chapters (
+                id INTEGER PRIMARY KEY,
+                url TEXT,
+                volume INTEGER,
+                success INTEGER,
+                data TEXT NOT NULL,
+                updated_at REAL,
+                codec TEXT,
+                body BLOB
+            )
+            """
+        )
+        columns = [row[1] for row in self.db.execute("PRAGMA table_info(chapters)")]
+        if "body" not in columns:
+            # stores created before the bodies were compressed
+            self.db.execute("ALTER TABLE chapters ADD COLUMN codec TEXT")
+            self.db.execute("ALTER TABLE chapters ADD COLUMN body BLOB")
+        self.db.execute("CREATE INDEX IF NOT EXISTS chapters_url ON chapters (url)")
+
+        has_image_index = self.db.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'chapter_images'"
+        ).fetchone()
+        self.db.execute(
+            """
+            CREATE TABLE IF NOT EXISTS chapter_images (
+                filename TEXT NOT NULL,
+                chapter_id INTEGER NOT NULL,
+                start INTEGER,
+                end INTEGER
+            )
+            """
+        )
+        self.db.execute(
+            "CREATE INDEX IF NOT EXISTS chapter_images_filename ON chapter_images (filename)"
+        )
+        self.db.execute(
+            "CREATE INDEX IF NOT EXISTS chapter_images_chapter ON chapter_images (chapter_id)"
+        )
+        if not has_image_index:
+            # stores created before the images were indexed
+            self._index_stored_images()
+
+    def _connect(self) -> sqlite3.Connection:
+        db = sqlite3.connect(
+            str(self.db_path),
+            timeout=30,
+            check_same_thread=False,
+            isolation_level=None,
+        )
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute("PRAGMA synchronous=NORMAL")
+        return db
+
+    def _db(self) -> sqlite3.Connection:
+        # must be called with the lock held
+        if self.db is None:
+            self.db = self._connect()
+        return self.db
+
+    def __enter__(self) -> "ChapterStore":
+        return self
+
+    def __exit__(self, type, value, traceback) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """Write the buffered chapters and close the database.
+        It is opened again if the stored bodies are read later.
+        """
+        self.flush()
+        with self._lock:
+            if self.db:
+                self.db.close()
+                self.db = None
+
+    # ------------------------------------------------------------------------- #
+    # Read
+    # ------------------------------------------------------------------------- #
+
+    def _encode(self, chapter: Chapter) -> tuple:
+        data = chapter.to_dict(exclude=["body"])
+        body = chapter.raw_body
+        if isinstance(body, StoredBody):
+            body = body.compressed()
+        codec = None
+        if isinstance(body, CompressedText):
+            codec, body = body.codec, body.data
+        elif isinstance(body, str):
+            codec, body = compress(body.encode("utf-8"))
+        return (
+            chapter.id,
+            chapter.url,
+            chapter.volume,
+            int(bool(chapter.success)),
+            json.dumps(data, ensure_ascii=False),
+            time.time(),
+            codec,
+            body,
+        )
+
+    def _decode(self, data: str, codec: Optional[str], body: Optional[bytes]) -> dict:
+        """The stored fields. The body is decompressed when it is read."""
+        fields = json.loads(data)
+        if codec and body is not None:
+            fields["body"] = CompressedText(codec, body)
+        return fields
+
+    def get(self, chapter_id: int) -> Optional[Chapter]:
+        """Find a chapter by id"""
+        with self._lock:
+            row = self._pending.get(chapter_id)
+            if row:
+                row = row[4], row[6], row[7]
+            else:
+                row = self._db().execute(
+                    "SELECT data, codec, body FROM chapters WHERE id = ?",
+                    (chapter_id,),
+                ).fetchone()
+        return Chapter(**self._decode(*row)) if row else None
+
+    def get_by_url(self, url: str) -> Optional[Chapter]:
+        """Find a chapter by url"""
+        with self._lock:
+            for pending in self._pending.values():
+                if pending[1] == url:
+                    row = pending[4], pending[6], pending[7]
+                    break
+            else:
+                row = self._db().execute(
+                    "SELECT data, codec, body FROM chapters WHERE url = ? LIMIT 1",
+                    (url,),
+                ).fetchone()
+        return Chapter(**self._decode(*row)) if row else None
+
+    def get_body(self, chapter_id: int) -> Optional[CompressedText]:
+        """The stored body of a chapter, still compressed"""
+        with self._lock:
+            row = self._pending.get(chapter_id)
+            if row:
+                row = row[6], row[7]
+            else:
+                row = self._db().execute(
+                    "SELECT codec, body FROM chapters WHERE id = ?",
+                    (chapter_id,),
+                ).fetchone()
+        if not row or not row[0] or row[1] is None:
+            return None
+        return CompressedText(*row)
+
+    def restore(self, chapters: Iterable[Chapter]) -> Set[int]:
+        """Update the given chapters with the stored ones.
+        The bodies are not loaded, but read from the store when needed.
+
+        Returns:
+            Ids of the restored chapters.
+        """
+        self.flush()
+        by_id = {chapter.id: chapter for chapter in chapters}
+        ids = list(by_id.keys())
+        restored = set()
+        for i in range(0, len(ids), 500):
+            batch = ids[i:i + 500]
+            with self._lock:
+                rows = self._db().execute(
+                    "SELECT id, data, body IS NOT NULL FROM chapters WHERE id IN (%s)"
+                    % ",".join("?" * len(batch)),
+                    batch,
+                ).fetchall()
+            for chapter_id, data, has_body in rows:
+                chapter = by_id[chapter_id]
+                chapter.update(**json.loads(data))
+                chapter.raw_body = StoredBody(self, chapter_id) if has_body else None
+                restored.add(chapter_id)
+        return restored
+
+    def iter_chapters(self, page_size: int = 500) -> Iterable[Chapter]:
+        """All stored chapters ordered by id.
+        The bodies are not loaded, but read from the store when needed."""
+        self.flush()
+        last_id = -(2**63)
+        while True:
+            with self._lock:
+                rows = self._db().execute(
+                    "SELECT id, data, body IS NOT NULL FROM chapters "
+                    "WHERE id > ? ORDER BY id LIMIT ?",
+                    (last_id, page_size),
+                ).fetchall()
+            if not rows:
+                return
+            for chapter_id, data, has_body in rows:
+                chapter = Chapter(**json.loads(data))
+                chapter.raw_body = StoredBody(self, chapter_id) if has_body else None
+                yield chapter
+            last_id = rows[-1][0]
+
+    def __len__(self) -> int:
+        self.flush()
+        with self._lock:
+            return self._db().execute("SELECT COUNT(*) FROM chapters").fetchone()[0]
+
+    # ------------------------------------------------------------------------- #
+    # Write
+    # ------------------------------------------------------------------------- #
+
+    def put(self, chapter: Chapter, unload_body: bool = False) -> None:
+        """Save a chapter. It is written with the next batch.
+
+        Args:
+        - chapter (Chapter): The chapter to save.
+        - unload_body (bool, optional): Keep only a reference to the stored body in memory. Default: False.
+        """
+        row = self._encode(chapter)
+        spans = self._image_spans_of(chapter)
+        with self._lock:
+            self._pending[chapter.id] = row
+            if spans is not None:
+                self._pending_images[chapter.id] = spans
+            is_due = len(self._pending) >= self.batch_size
+            is_due = is_due or time.time() - self._flushed_at > self.batch_interval
+        if unload_body and row[7] is not None:
+            chapter.raw_body = StoredBody(self, chapter.id)
+        if is_due:
+            self.flush()
+
+    def put_many(self, chapters: Iterable[Chapter]) -> None:
+        for chapter in chapters:
+            self.put(chapter)
+        self.flush()
+
+    def flush(self) -> None:
+        """Write the buffered chapters in a single transaction"""
+        with self._lock:
+            self._flushed_at = time.time()
+            if not self._pending:
+                return
+            rows = list(self._pending.values())
+            db = self._db()
+            try:
+                db.execute("BEGIN")
+                db.executemany(
+                    "INSERT OR REPLACE INTO chapters "
+                    "(id, url, volume, success, data, updated_at, codec, body) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    rows,
+                )
+                self._write_image_spans(db, self._pending_images)
+                db.execute("COMMIT")
+            except Exception:
+                db.execute("ROLLBACK")
+                raise
+            self._pending.clear()
+            self._pending_images.clear()
+        logger.debug(f"Saved {len(rows)} chapters to {self.db_path}")
+
+    # ------------------------------------------------------------------------- #
+    # Image index
+    # ------------------------------------------------------------------------- #
+
+    @staticmethod
+    def _image_spans_of(chapter: Chapter) -> Optional[List[ImageSpan]]:
+        """The image elements of the chapter body.
+        None if the body was not changed since it was stored."""
+        body = chapter.raw_body
+        if isinstance(body, StoredBody):
+            return None
+        images = chapter.images or {}
+        if not body or not images:
+            return []
+        return find_image_spans(str(body), images.keys())
+
+    @staticmethod
+    def _write_image_spans(db: sqlite3.Connection, spans: Dict[int, List[ImageSpan]]) -> None:
+        db.executemany(
+            "DELETE FROM chapter_images WHERE chapter_id = ?",
+            [(chapter_id,) for chapter_id in spans],
+        )
+        db.executemany(
+            "INSERT INTO chapter_images (filename, chapter_id, start, end) VALUES (?, ?, ?, ?)",
+            [
+                (filename, chapter_id, start, end)
+                for chapter_id, items in spans.items()
+                for filename, start, end in items
+            ],
+        )
+
+    def _index_stored_images(self) -> None:
+        assert self.db is not None
+        spans: Dict[int, List[ImageSpan]] = {}
+        rows = self.db.execute("SELECT id, data, codec, body FROM chapters")
+        for chapter_id, data, codec, body in rows:
+            chapter = Chapter(**self._decode(data, codec, body))
+            spans[chapter_id] = self._image_spans_of(chapter) or []
+        if not spans:
+            return
+        self.db.execute("BEGIN")
+        self._write_image_spans(self.db, spans)
+        self.db.execute("COMMIT")
+        logger.debug(f"Indexed the images of {len(spans)} chapters in {self.db_path}")
+
+    def find_images(self, filenames: Iterable[str]) -> Dict[int, List[ImageSpan]]:
+        """Find the chapters using any of the images.
+
+        Returns:
+            The image elements in each chapter body, by chapter id.
+        """
+        self.flush()
+        filenames = list(filenames)
+        result: Dict[int, List[ImageSpan]] = {}
+        for i in range(0, len(filenames), 500):
+            batch = filenames[i:i + 500]
+            with self._lock:
+                rows = self._db().execute(
+                    "SELECT chapter_id, filename, start, end FROM chapter_images "
+                    "WHERE filename IN (%s)" % ",".join("?" * len(batch)),
+                    batch,
+                ).fetchall()
+            for chapter_id, filename, start, end in rows:
+                result.setdefault(chapter_id, []).append((filename, start, end))
+        return result
+
+    # ------------------------------------------------------------------------- #
+    # Export
+    # ------------------------------------------------------------------------- #
+
+    @staticmethod
+    def json_file_of(chapter: Chapter, output_path: str, pack_by_volume: bool) -> Path:
+        """Path of the chapter in the per-chapter JSON layout"""
+        dir_name = Path(output_path) / "json"
+        if pack_by_volume:
+            vol_name = "Volume " + str(chapter.volume).rjust(2, "0")
+            dir_name = dir_name / vol_name
+
+        chapter_name = str(chapter.id).rjust(5, "0")
+        return dir_name / (chapter_name + ".json")
+
+    def export_json(self, output_path: str, pack_by_volume: bool) -> List[Path]:
+        """Write every chapter to `<output_path>/json/[Volume XX/]<id>.json`
+
+        Returns:
+            The written files.
+        """
+        files = []
+        for chapter in self.iter_chapters():
+            file_name = self.json_file_of(chapter, output_path, pack_by_volume)
+            file_name.parent.mkdir(parents=True, exist_ok=True)
+            with file_name.open("w", encoding="utf-8") as fp:
+                json.dump(chapter.to_dict(), fp, ensure_ascii=False)
+            files.append(file_name)
+        return files
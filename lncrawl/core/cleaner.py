@@ -1,23 +1,414 @@
 import itertools
+import json
 import re
 import sys
 import unicodedata
-from typing import AnyStr, Dict, List, Set, Union
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, AnyStr, Callable, Dict, FrozenSet, List, Optional, Set, Tuple, Union
 
+import soupsieve
 from bs4 import Comment, Tag
 
+from .. import constants as C
+
 LINE_SEP = "<br>"
 
-INVISIBLE_CHARS = [
-    code
-    for code in range(sys.maxunicode)
-    if unicodedata.category(chr(code)) in {"Cf", "Cc"}
-]
-NONPRINTABLE = itertools.chain(range(0x00, 0x20), range(0x7F, 0xA0), INVISIBLE_CHARS)
-NONPRINTABLE_MAPPING = {character: None for character in NONPRINTABLE}
+
+def find_nonprintable_ranges() -> List[Tuple[int, int]]:
+    """The ranges of the control and format characters in the unicode version
+    of this python. Slow, as it checks the category of every character."""
+    ranges: List[Tuple[int, int]] = []
+    for code in range(sys.maxunicode):
+        if unicodedata.category(chr(code)) not in {"Cf", "Cc"}:
+            continue
+        if ranges and ranges[-1][1] == code - 1:
+            ranges[-1] = (ranges[-1][0], code)
+        else:
+            ranges.append((code, code))
+    return ranges
+
+
+@lru_cache(maxsize=None)
+def nonprintable_ranges() -> List[Tuple[int, int]]:
+    """The ranges of the characters removed from the texts.
+
+    Uses the table generated by `scripts/gen_nonprintable.py`. For another
+    unicode version, the ranges are found once and cached on disk.
+    """
+    from ..assets.nonprintable import NONPRINTABLE_RANGES, UNIDATA_VERSION
+
+    if UNIDATA_VERSION == unicodedata.unidata_version:
+        return NONPRINTABLE_RANGES
+
+    cache_file = Path(C.DEFAULT_CACHE_PATH) / f"nonprintable-{unicodedata.unidata_version}.json"
+    try:
+        return [(start, end) for start, end in json.loads(cache_file.read_text())]
+    except (OSError, ValueError, TypeError):
+        pass
+    ranges = find_nonprintable_ranges()
+    try:
+        cache_file.parent.mkdir(parents=True, exist_ok=True)
+        cache_file.write_text(json.dumps(ranges))
+    except OSError:
+        pass
+    return ranges
+
+
+@lru_cache(maxsize=None)
+def _nonprintable_re() -> re.Pattern:
+    chars = "".join(
+        f"\\U{start:08x}" if start == end else f"\\U{start:08x}-\\U{end:08x}"
+        for start, end in nonprintable_ranges()
+    )
+    return re.compile(f"[{chars}]+")
+
+
+def __getattr__(name: str) -> Any:
+    # the tables used before, built on first access
+    if name == "INVISIBLE_CHARS":
+        return [code for start, end in nonprintable_ranges() for code in range(start, end + 1)]
+    if name == "NONPRINTABLE":
+        return itertools.chain(range(0x00, 0x20), range(0x7F, 0xA0), __getattr__("INVISIBLE_CHARS"))
+    if name == "NONPRINTABLE_MAPPING":
+        return {character: None for character in __getattr__("NONPRINTABLE")}
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+# selectors whose match depends on the siblings or the descendants of a tag,
+# which may already be cleaned when the tag is visited
+RE_STRUCTURAL_SELECTOR = re.compile(r"[+~]|:(nth-|first-|last-|only-|has|empty|root)")
+RE_TAG_NAME = re.compile(r"^[a-zA-Z][\w-]*$")
+
+
+def _subject_keys(compiled: soupsieve.SoupSieve) -> Optional[FrozenSet[str]]:
+    """The tag names, `.class` and `#id` of which a tag must have one to match.
+    None if any tag may match."""
+    keys = set()
+    for selector in compiled.selectors:
+        if selector.ids:
+            keys.add("#" + selector.ids[0])
+        elif selector.classes:
+            keys.add("." + selector.classes[0])
+        elif selector.tag and selector.tag.name != "*":
+            keys.add(selector.tag.name.lower())
+        else:
+            return None
+    return frozenset(keys)
+
+
+def _may_match(tag: Tag, keys: Optional[FrozenSet[str]]) -> bool:
+    if keys is None or tag.name in keys:
+        return True
+    attrs = tag.attrs
+    if "id" in attrs and "#" + str(attrs["id"]) in keys:
+        return True
+    classes = attrs.get("class") or ()
+    if isinstance(classes, str):
+        classes = classes.split()
+    return any("." + name in keys for name in classes)
+
+
+def _pattern_source(pattern: Union[str, re.Pattern]) -> str:
+    """The source of a pattern to join with others, keeping its flags"""
+    if not isinstance(pattern, re.Pattern):
+        return str(pattern)
+    flags = "".join(
+        letter
+        for flag, letter in [(re.I, "i"), (re.M, "m"), (re.S, "s"), (re.X, "x")]
+        if pattern.flags & flag
+    )
+    return f"(?{flags}:{pattern.pattern})" if flags else pattern.pattern
+
+
+def _join_patterns(patterns) -> str:
+    return "|".join(f"({_pattern_source(x)})" for x in patterns)
+
+
+class _CleaningRules:
+    """The rules of a cleaner, compiled for matching one tag or text at a time.
+
+    Matching a selector is much slower than looking up the name, classes and
+    id of a tag, so only the tags having one that a selector requires are matched.
+    """
+
+    __slots__ = (
+        "bad_css",
+        "bad_css_keys",
+        "pair_names",
+        "pair_css",
+        "pair_css_keys",
+        "pair_patterns",
+        "in_walk",
+        "bad_text",
+        "substitutions",
+        "substitutions_re",
+    )
+
+    def __init__(
+        self,
+        bad_css: FrozenSet[str],
+        pairs: Tuple[Tuple[str, Any], ...],
+        bad_text_regex: FrozenSet[Union[str, re.Pattern]],
+        substitutions: Tuple[Tuple[str, str], ...],
+    ) -> None:
+        self.bad_css = soupsieve.compile(",".join(bad_css)) if bad_css else None
+        self.bad_css_keys = _subject_keys(self.bad_css) if self.bad_css else None
+
+        pair_keys = [key for key, _ in pairs]
+        self.pair_names: Optional[FrozenSet[str]] = None
+        self.pair_css = None
+        self.pair_css_keys = None
+        if all(RE_TAG_NAME.match(key) for key in pair_keys):
+            self.pair_names = frozenset(pair_keys)
+        else:
+            self.pair_css = soupsieve.compile(",".join(pair_keys))
+            self.pair_css_keys = _subject_keys(self.pair_css)
+        self.pair_patterns: Dict[str, Optional[re.Pattern]] = {}
+        for key, pattern in pairs:
+            if not pattern:
+                pattern = None
+            elif isinstance(pattern, tuple):
+                pattern = re.compile(_join_patterns(x for x in pattern if x), re.M)
+            elif not isinstance(pattern, re.Pattern):
+                pattern = re.compile(pattern, re.M)
+            self.pair_patterns[key] = pattern
+        self.in_walk = not any(
+            RE_STRUCTURAL_SELECTOR.search(selector)
+            for selector in itertools.chain(bad_css, pair_keys)
+        )
+
+        # all bad texts in one pattern
+        self.bad_text = re.compile(_join_patterns(bad_text_regex)) if bad_text_regex else None
+
+        self.substitutions = dict(substitutions)
+        self.substitutions_re = (
+            re.compile(_join_patterns(self.substitutions), flags=re.IGNORECASE)
+            if substitutions
+            else None
+        )
+
+    def is_bad_css(self, tag: Tag) -> bool:
+        return (
+            self.bad_css is not None
+            and _may_match(tag, self.bad_css_keys)
+            and self.bad_css.match(tag)
+        )
+
+    def is_pair(self, tag: Tag) -> bool:
+        if self.pair_names is not None:
+            return tag.name in self.pair_names
+        return _may_match(tag, self.pair_css_keys) and self.pair_css.match(tag)
+
+    def substitute(self, text: str) -> str:
+        if self.substitutions_re is None:
+            return text
+        return self.substitutions_re.sub(
+            lambda m: self.substitutions[str(m.group(0)).lower()], text
+        )
+
+
+@lru_cache(maxsize=256)
+def _compile_rules(*key) -> _CleaningRules:
+    # shared by the cleaners with the same rules, e.g. of the same crawler class
+    return _CleaningRules(*key)
+
+
+def _freeze(value: Any) -> Any:
+    if isinstance(value, (list, set, tuple)):
+        return tuple(value)
+    return value
+
+
+class _WatchedSet(set):
+    """A set which tells the cleaner when it is changed"""
+
+    def __init__(self, items=(), on_change: Optional[Callable[[], None]] = None) -> None:
+        super().__init__(items)
+        self.on_change = on_change
+
+    def _changed(self, result=None):
+        if self.on_change:
+            self.on_change()
+        return result
+
+
+class _WatchedDict(dict):
+    """A dict which tells the cleaner when it is changed"""
+
+    def __init__(self, items=(), on_change: Optional[Callable[[], None]] = None) -> None:
+        super().__init__(items)
+        self.on_change = on_change
+
+    def _changed(self, result=None):
+        if self.on_change:
+            self.on_change()
+        return result
+
+
+def _watched(method: Callable) -> Callable:
+    def watched(self, *args, **kwargs):
+        return self._changed(method(self, *args, **kwargs))
+
+    watched.__name__ = method.__name__
+    return watched
+
+
+def _watch_methods(cls, names: List[str]) -> None:
+    base = cls.__mro__[1]
+    for name in names:
+        if hasattr(base, name):  # e.g. dict.__ior__ is new in python 3.9
+            setattr(cls, name, _watched(getattr(base, name)))
+
+
+_watch_methods(
+    _WatchedSet,
+    [
+        "add", "clear", "discard", "pop", "remove", "update",
+        "difference_update", "intersection_update", "symmetric_difference_update",
+        "__ior__", "__iand__", "__isub__", "__ixor__",
+    ],
+)
+_watch_methods(
+    _WatchedDict,
+    [
+        "__setitem__", "__delitem__", "__ior__", "clear",
+        "pop", "popitem", "setdefault", "update",
+    ],
+)
+
+# the attributes of a TextCleaner which are compiled into _CleaningRules
+RULE_ATTRIBUTES = {
+    "bad_css": _WatchedSet,
+    "bad_tag_text_pairs": _WatchedDict,
+    "bad_text_regex": _WatchedSet,
+    "substitutions": _WatchedDict,
+}
+
+
+class _Frame:
+    """An element being written by the `_ParagraphWriter`"""
+
+    __slots__ = ("name", "is_block", "is_wrap", "start", "pending", "tail", "is_open")
+
+    def __init__(self, name: str, is_block: bool, is_wrap: bool, start: int) -> None:
+        self.name = name
+        self.is_block = is_block
+        self.is_wrap = is_wrap
+        self.start = start  # number of tokens written before the element
+        self.pending = 0  # line breaks waiting for the next token
+        self.tail = 0  # line breaks at the end, which an empty inline element removes
+        self.is_open = False  # whether the start tag of a wrapping element is written
+
+
+class _ParagraphWriter:
+    """Writes the paragraphs of a tree as its elements are visited.
+
+    The line breaks inside an element are kept only if it has text before and
+    after them. The elements other than blocks and plain text are repeated
+    around each line of text in them.
+    """
+
+    def __init__(self) -> None:
+        self.paragraphs: List[str] = []
+        self.pieces: List[str] = []
+        self.spaced = False  # whether the next piece is separated by a space
+        self.count = 0  # number of tokens written
+        self.frames: List[_Frame] = [_Frame("", False, False, 0)]
+        self.wraps: List[_Frame] = []  # the wrapping frames
+        self.opened = 0  # number of wrapping frames with the start tag written
+        self.waiting: List[_Frame] = []  # frames with pending line breaks
+
+    def line_break(self) -> None:
+        frame = self.frames[-1]
+        frame.pending += 1
+        frame.tail += 1
+        if frame.pending == 1:
+            self.waiting.append(frame)
+
+    def empty_text(self) -> None:
+        self.frames[-1].tail = 0
+
+    def token(self, text: str) -> None:
+        if self.waiting:
+            has_break = False
+            for frame in self.waiting:
+                if frame.pending and self.count > frame.start:
+                    has_break = True
+                frame.pending = frame.tail = 0
+            self.waiting.clear()
+            if has_break:
+                self._end_paragraph()
+
+        if self.opened < len(self.wraps):
+            self._open_wraps()
+        if self.spaced:
+            self.pieces.append(" ")
+        self.pieces.append(text)
+        self.spaced = True
+        self.count += 1
+
+    def open(self, name: str, is_block: bool, is_plain: bool) -> None:
+        if is_block:
+            self.line_break()
+        frame = _Frame(name, is_block, not (is_block or is_plain), self.count)
+        self.frames.append(frame)
+        if frame.is_wrap:
+            self.wraps.append(frame)
+
+    def close(self) -> None:
+        frame = self.frames.pop()
+        frame.pending = 0  # no text after the line breaks
+        if frame.is_wrap:
+            if frame.is_open:
+                self.pieces.append(f"</{frame.name}>")
+            self.wraps.pop()
+            self.opened = min(self.opened, len(self.wraps))
+
+        parent = self.frames[-1]
+        if self.count > frame.start:
+            if frame.is_block:
+                self.line_break()
+        elif not frame.is_block and parent.tail:
+            parent.tail -= 1
+            parent.pending -= 1
+
+    def finish(self) -> List[str]:
+        self._end_paragraph()
+        return self.paragraphs
+
+    def _open_wraps(self) -> None:
+        for frame in self.wraps[self.opened:]:
+            if self.spaced:
+                self.pieces.append(" ")
+            self.pieces.append(f"<{frame.name}>")
+            self.spaced = False
+            frame.is_open = True
+        self.opened = len(self.wraps)
+
+    def _end_paragraph(self) -> None:
+        if self.opened:
+            for frame in reversed(self.wraps[:self.opened]):
+                self.pieces.append(f"</{frame.name}>")
+                frame.is_open = False
+            self.opened = 0
+        if self.pieces:
+            self.paragraphs.append("".join(self.pieces))
+        self.pieces = []
+        self.spaced = False
 
 
 class TextCleaner:
+    def __setattr__(self, name: str, value: Any) -> None:
+        watch = RULE_ATTRIBUTES.get(name)
+        if watch:
+            value = watch(value, on_change=self._rules_changed)
+            self._rules_changed()
+        super().__setattr__(name, value)
+
+    def _rules_changed(self) -> None:
+        self.__dict__["_rules_"] = None
+
     def __init__(self) -> None:
         self.bad_text_regex: Set[Union[str, re.Pattern[str]]] = set(
             [
@@ -149,58 +540,106 @@ class TextCleaner:
     def extract_contents(self, tag) -> str:
         self.clean_contents(tag)
         body = self.extract_paragraphs(tag)
-        paragraphs = " ".join(body).split(LINE_SEP)
         return "".join(
             [
-                f"<p>{p.strip()}</p>"
-                for p in paragraphs
-                if not self.contains_bad_texts(p)
+                f"<p>{p}</p>"
+                for p in body
+                if p != LINE_SEP and not self.contains_bad_texts(p)
             ]
         )
 
     def clean_contents(self, div):
+        """Remove the bad tags and attributes in a single walk of the tree.
+
+        The result is the same as removing the `bad_css` matches first, then the
+        `bad_tag_text_pairs` matches, and then cleaning the remaining tags one by one.
+        """
         if not isinstance(div, Tag):
             return div
 
-        if self.bad_css:
-            for bad in div.select(",".join(self.bad_css)):
-                bad.extract()
-
-        if self.bad_tag_text_pairs:
-            for tag in div.select(",".join(self.bad_tag_text_pairs.keys())):
-                if self.tag_contains_bad_text(tag):
-                    tag.extract()
+        rules = self._cleaning_rules()
+        if not rules.in_walk:
+            # the selectors must be matched before anything is removed
+            self._remove_bad_selectors(div)
 
-        for tag in div.find_all(True):
-            if isinstance(tag, Comment):
-                tag.extract()  # Remove comments
+        parents = [div]
+        children = [iter(list(div.contents))]
+        while children:
+            tag = next(children[-1], None)
+            if tag is None:
+                children.pop()
+                parent = parents.pop()
+                if parent is not div:
+                    # after the descendants, which may be matched by its attributes
+                    self.clean_attributes(parent)
                 continue
-            if not isinstance(tag, Tag):
-                continue  # Skip elements that are not a Tag
-            if tag.name in self.bad_tags:
+            if not isinstance(tag, Tag) or tag.parent is not parents[-1]:
+                continue  # Skip elements that are not a Tag, or already removed
+            if rules.in_walk and self._is_bad_selector(tag, rules):
+                tag.extract()
+            elif tag.name in self.bad_tags:
                 tag.extract()  # Remove bad tags
             elif tag.name in ["br", "hr"]:
+                if rules.in_walk:
+                    self._remove_bad_next_siblings(tag, rules)
                 self.extract_on_duplicate_sibling(tag)
             elif tag.name == "img":
                 self.clean_image(tag)
             else:
-                self.clean_attributes(tag)
+                parents.append(tag)
+                children.append(iter(list(tag.contents)))
 
         self.clean_attributes(div)
         return div
 
+    def _cleaning_rules(self) -> _CleaningRules:
+        """The compiled rules. Compiled again only after the rules are changed."""
+        rules: Optional[_CleaningRules] = self.__dict__.get("_rules_")
+        if rules is None:
+            rules = self._rules_ = _compile_rules(
+                frozenset(self.bad_css),
+                tuple((k, _freeze(v)) for k, v in self.bad_tag_text_pairs.items()),
+                frozenset(self.bad_text_regex),
+                tuple(self.substitutions.items()),
+            )
+        return rules
+
+    def _remove_bad_selectors(self, div: Tag) -> None:
+        if self.bad_css:
+            for bad in div.select(",".join(self.bad_css)):
+                bad.extract()
+
+        if self.bad_tag_text_pairs:
+            for tag in div.select(",".join(self.bad_tag_text_pairs.keys())):
+                if self.tag_contains_bad_text(tag):
+                    tag.extract()
+
+    def _is_bad_selector(self, tag: Tag, rules: _CleaningRules) -> bool:
+        if rules.is_bad_css(tag):
+            return True
+        if self.bad_tag_text_pairs and rules.is_pair(tag):
+            # the text is checked without the bad_css matches inside
+            bad_inside = [
+                elem
+                for elem in (tag.descendants if rules.bad_css else ())
+                if isinstance(elem, Tag) and rules.is_bad_css(elem)
+            ]
+            for bad in bad_inside:
+                bad.extract()
+            return self.tag_contains_bad_text(tag)
+        return False
+
+    def _remove_bad_next_siblings(self, tag: Tag, rules: _CleaningRules) -> None:
+        # the next sibling must be the one left after removing the bad selectors
+        next_tag = tag.next_sibling
+        while isinstance(next_tag, Tag) and self._is_bad_selector(next_tag, rules):
+            bad, next_tag = next_tag, next_tag.next_sibling
+            bad.extract()
+
     def clean_text(self, text) -> str:
         text = str(text).strip()
-        text = text.translate(NONPRINTABLE_MAPPING)
-        if not hasattr(self, "_subs_"):
-            self._subs_ = re.compile(
-                "|".join([f"({x})" for x in self.substitutions.keys()]),
-                flags=re.IGNORECASE,
-            )
-        text = self._subs_.sub(
-            lambda m: self.substitutions[str(m.group(0)).lower()], text
-        )
-        return text
+        text = _nonprintable_re().sub("", text)
+        return self._cleaning_rules().substitute(text)
 
     def extract_on_duplicate_sibling(self, tag: Tag):
         next_tag = tag.next_sibling
@@ -221,17 +660,13 @@ class TextCleaner:
         tag.attrs = attrs
 
     def tag_contains_bad_text(self, tag: Tag) -> bool:
-        pattern = self.bad_tag_text_pairs.get(tag.name)
-        if not tag.text:
+        text = tag.text
+        if not text:
             return True
+        pattern = self._cleaning_rules().pair_patterns.get(tag.name)
         if not pattern:
             return False
-        if isinstance(pattern, list):
-            pattern = "|".join([f"({x})" for x in pattern if x])
-        if not isinstance(pattern, re.Pattern):
-            pattern = re.compile(pattern, re.M)
-            self.bad_tag_text_pairs[tag.name] = pattern
-        return bool(pattern.search(tag.text))
+        return bool(pattern.search(text))
 
     def clean_image(self, tag: Tag):
         src = None
@@ -258,57 +693,54 @@ class TextCleaner:
         return ";".join(clean_css)
 
     def extract_paragraphs(self, tag) -> list:
+        """The paragraphs of the tag, separated by `LINE_SEP`.
+
+        The tree is visited once, writing each text to its paragraph as it is found.
+        """
         if not isinstance(tag, Tag):
             return []
 
-        body = []
-        for elem in tag.contents:
-            if isinstance(elem, Comment):
-                continue
-            if not isinstance(elem, Tag):
-                body.append(self.clean_text(elem))
-                continue
-            if elem.name in self.unchanged_tags:
-                body.append(str(elem))
-                continue
-            if elem.name == "hr":
-                body.append(LINE_SEP)
-                # body.append('-' * 8)
-                # body.append(LINE_SEP)
-                continue
-            if elem.name == "br":
-                body.append(LINE_SEP)
-                continue
-            # if not elem.text.strip():
-            #     continue
-
-            is_block = elem.name in self.p_block_tags
-            is_plain = elem.name in self.plain_text_tags
-            content = " ".join(self.extract_paragraphs(elem))
-
-            if is_block:
-                body.append(LINE_SEP)
+        writer = _ParagraphWriter()
+        children = [iter(tag.contents)]
+        while children:
+            for elem in children[-1]:
+                if isinstance(elem, Tag):
+                    name = elem.name
+                    if name in self.unchanged_tags:
+                        writer.token(str(elem).strip())
+                    elif name in ["br", "hr"]:
+                        writer.line_break()
+                    else:
+                        writer.open(
+                            name,
+                            is_block=name in self.p_block_tags,
+                            is_plain=name in self.plain_text_tags,
+                        )
+                        children.append(iter(elem.contents))
+                        break  # continue with the children of the element
+                elif not isinstance(elem, Comment):
+                    text = self.clean_text(elem).strip()
+                    if text:
+                        writer.token(text)
+                    else:
+                        writer.empty_text()
+            else:
+                children.pop()
+                if children:
+                    writer.close()
 
-            for line in content.split(LINE_SEP):
-                line = line.strip()
-                if not line:
-                    continue
-                if not (is_plain or is_block):
-                    line = "<%s>%s</%s>" % (elem.name, line, elem.name)
-                body.append(line)
+        paragraphs = writer.finish()
+        body = []
+        for paragraph in paragraphs:
+            if body:
                 body.append(LINE_SEP)
-
-            if body and body[-1] == LINE_SEP and not is_block:
-                body.pop()
-
-        return [x.strip() for x in body if x.strip()]
+            body.append(paragraph)
+        return body
 
     def contains_bad_texts(self, text: str) -> bool:
         if not text.strip():
             return True
-        if not self.bad_text_regex:
+        pattern = self._cleaning_rules().bad_text
+        if not pattern:
             return False
-        if not hasattr(self, "__blacklist__"):
-            pattern = re.compile("|".join(["(%s)" % p for p in self.bad_text_regex]))
-            self.__blacklist__ = pattern
-        return bool(self.__blacklist__.search(text))
+        return bool(pattern.search(text))
@@ -0,0 +1,185 @@
+"""
+Process-wide HTTP connection pools shared by the Scraper sessions
+"""
+import atexit
+import logging
+import ssl
+import time
+from threading import Event, Lock, Thread
+from typing import Any, Dict, Optional
+from urllib.parse import urlparse
+from weakref import WeakKeyDictionary
+
+from cloudscraper import CipherSuiteAdapter
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_POOL_SIZE = 10
+MAX_POOL_SIZE = 25
+MAX_POOL_COUNT = 100
+IDLE_TIMEOUT = 60  # seconds to keep the connections of an unused host
+REAP_INTERVAL = 15
+
+__pools_lock = Lock()
+__pools: Optional["ConnectionPools"] = None
+
+
+class SharedAdapter(CipherSuiteAdapter):
+    """A transport adapter to mount on many sessions at once.
+
+    The connection pool of each host is sized by the `ConnectionPools`.
+    Closing a session does not close this adapter, so that the warm
+    connections are reused by the next session.
+    """
+
+    def __init__(self, pools: "ConnectionPools", **kwargs) -> None:
+        self.pools = pools
+        super().__init__(**kwargs)
+
+    def build_connection_pool_key_attributes(self, request, verify, cert=None):
+        # Available since requests 2.32. Older versions use the default pool size.
+        host_params, pool_kwargs = super().build_connection_pool_key_attributes(
+            request, verify, cert
+        )
+        pool_kwargs["maxsize"] = self.pools.size_of(host_params["host"])
+        return host_params, pool_kwargs
+
+    def send(self, request, *args, **kwargs):
+        self.pools.touch(urlparse(request.url).hostname)
+        return super().send(request, *args, **kwargs)
+
+    def close(self) -> None:
+        pass
+
+    def shutdown(self) -> None:
+        super().close()
+
+
+class ConnectionPools:
+    """Keeps one set of keep-alive connection pools for the whole process.
+
+    Each host gets a pool large enough for the workers of all the scrapers
+    using it, capped by their domain window. The pools only grow, and the
+    pools of the hosts that were not used for a while are closed.
+
+    Args:
+    - max_pool_size (int, optional): Largest number of connections to keep per host. Default: 25.
+    - idle_timeout (float, optional): Seconds to keep the connections of an unused host. Default: 60.
+    """
+
+    def __init__(
+        self,
+        max_pool_size: int = MAX_POOL_SIZE,
+        idle_timeout: float = IDLE_TIMEOUT,
+    ) -> None:
+        self.max_pool_size = max_pool_size
+        self.idle_timeout = idle_timeout
+        self._lock = Lock()
+        self._sizes: Dict[str, int] = {}
+        self._owners: Dict[str, WeakKeyDictionary] = {}
+        self._last_used: Dict[str, float] = {}
+        self._stopped = Event()
+
+        # The certificates are not verified by the scrapers anyway.
+        # See: lncrawl.utils.ssl_no_verify
+        ctx = ssl.create_default_context()
+        ctx.check_hostname = False
+        ctx.verify_mode = ssl.CERT_NONE
+        self.adapter = SharedAdapter(
+            self,
+            ssl_context=ctx,
+            pool_connections=MAX_POOL_COUNT,
+            pool_maxsize=DEFAULT_POOL_SIZE,
+        )
+
+        self._reaper = Thread(
+            target=self._reap_forever,
+            name="lncrawl_connpool",
+            daemon=True,
+        )
+        self._reaper.start()
+
+    def mount(self, session) -> None:
+        """Make the session to use the shared connection pools"""
+        session.mount("https://", self.adapter)
+        session.mount("http://", self.adapter)
+
+    def reserve(self, hostname: Optional[str], owner: Any, workers: int, limit: int) -> None:
+        """Grow the pool of the host for the workers of the owner.
+
+        Args:
+        - hostname: The host to request.
+        - owner: The scraper, which is counted once until it is garbage collected.
+        - workers: Number of concurrent requests of the owner.
+        - limit: Most number of concurrent requests allowed to the host.
+        """
+        if not hostname:
+            return
+        with self._lock:
+            owners = self._owners.setdefault(hostname, WeakKeyDictionary())
+            owners[owner] = workers
+            wanted = min(limit, self.max_pool_size, sum(owners.values()))
+            if wanted > self._sizes.get(hostname, DEFAULT_POOL_SIZE):
+                logger.debug(f"Connection pool size of {hostname}: {wanted}")
+                self._sizes[hostname] = wanted
+
+    def size_of(self, hostname: Optional[str]) -> int:
+        return self._sizes.get(hostname or "", DEFAULT_POOL_SIZE)
+
+    def touch(self, hostname: Optional[str]) -> None:
+        self._last_used[hostname or ""] = time.monotonic()
+
+    def reap(self) -> int:
+        """Close the pools of idle hosts and the pools replaced by a larger one.
+
+        Returns:
+            Number of pools closed.
+        """
+        now = time.monotonic()
+        managers = [self.adapter.poolmanager]
+        managers += list(self.adapter.proxy_manager.values())
+
+        closed = 0
+        for manager in managers:
+            for key in manager.pools.keys():
+                host = key.key_host
+                idle = now - self._last_used.get(host, 0) > self.idle_timeout
+                size = getattr(key, "key_maxsize", None)
+                resized = size is not None and size != self.size_of(host)
+                if resized and not idle:
+                    # wait for the borrowed connections to come back
+                    pool = manager.pools.get(key)
+                    resized = pool is not None and pool.pool.full()
+                if idle or resized:
+                    # disposing a pool closes its connections
+                    manager.pools.pop(key, None)
+                    closed += 1
+
+        with self._lock:
+            for host, used_at in list(self._last_used.items()):
+                if now - used_at > self.idle_timeout:
+                    self._last_used.pop(host, None)
+        if closed:
+            logger.debug(f"Closed {closed} idle connection pools")
+        return closed
+
+    def _reap_forever(self) -> None:
+        while not self._stopped.wait(REAP_INTERVAL):
+            try:
+                self.reap()
+            except Exception as e:
+                logger.debug(f"Failed to reap connection pools. {e}")
+
+    def shutdown(self) -> None:
+        self._stopped.set()
+        self.adapter.shutdown()
+
+
+def get_connection_pools() -> ConnectionPools:
+    """Returns the process-wide connection pools. Creates one on first use."""
+    global __pools
+    with __pools_lock:
+        if __pools is None:
+            __pools = ConnectionPools()
+            atexit.register(__pools.shutdown)
+        return __pools
@@ -0,0 +1,207 @@
+"""
+Persistent per-host cookie jars shared by the scrapers across runs and processes
+"""
+import json
+import logging
+import os
+import time
+import weakref
+from pathlib import Path
+from threading import Lock
+from typing import Dict, FrozenSet, List, Optional, Set, Tuple
+
+from requests.cookies import RequestsCookieJar, create_cookie
+
+from .. import constants as C
+from ..utils.filelock import file_lock
+
+logger = logging.getLogger(__name__)
+
+SESSION_COOKIE_TTL = 24 * 60 * 60  # seconds to keep the cookies without expiry
+
+__store_lock = Lock()
+__store: Optional["CookieStore"] = None
+
+CookieKey = Tuple[str, str, str]  # name, domain, path
+
+
+def _domain_matches(domain: str, hostname: str) -> bool:
+    domain = domain.lstrip(".").lower()
+    return not domain or hostname == domain or hostname.endswith("." + domain)
+
+
+class CookieStore:
+    """Saves the cookies of each host to a JSON file, e.g. `cf_clearance`
+    and login cookies, so that new scrapers do not start cold.
+
+    The files are locked while being updated. The jar is the authority for
+    the cookies it has seen, so the ones the server removed or expired are
+    removed from the file too. Only the cookies the jar has never seen are
+    kept from the file, e.g. the ones saved by other processes. Expired
+    cookies are dropped. The files are readable by the owner only, as they
+    keep the login sessions.
+
+    Args:
+    - store_path (str, optional): Where to keep the files. Default: ~/.lncrawl/cookies
+    - session_ttl (float, optional): Seconds to keep the cookies without expiry. Default: 1 day
+    """
+
+    def __init__(
+        self,
+        store_path: str = C.DEFAULT_COOKIE_PATH,
+        session_ttl: float = SESSION_COOKIE_TTL,
+    ) -> None:
+        self.root = Path(store_path)
+        self.session_ttl = session_ttl
+        self._lock = Lock()
+        self._saved: Dict[str, FrozenSet] = {}
+        # cookies each jar has seen per host, by the id of the jar
+        self._seen: Dict[int, Tuple[weakref.ref, Dict[str, Set[CookieKey]]]] = {}
+
+    def _file_of(self, hostname: str) -> Path:
+        return self.root / f"{hostname.lower()}.json"
+
+    def _read(self, file: Path) -> List[dict]:
+        try:
+            with open(file, "r", encoding="utf-8") as fp:
+                return json.load(fp)
+        except FileNotFoundError:
+            return []
+        except Exception as e:
+            logger.debug(f"Failed to read cookies from {file}. {e}")
+            return []
+
+    def _is_alive(self, item: dict, now: float) -> bool:
+        expires = item.get("expires")
+        if expires:
+            return expires > now
+        return item.get("saved_at", 0) + self.session_ttl > now
+
+    def _items_of(self, hostname: str, jar: RequestsCookieJar) -> Dict[CookieKey, dict]:
+        now = time.time()
+        items = {}
+        for cookie in jar:
+            if not _domain_matches(cookie.domain, hostname):
+                continue
+            if cookie.expires and cookie.expires <= now:
+                continue
+            items[(cookie.name, cookie.domain, cookie.path)] = {
+                "name": cookie.name,
+                "value": cookie.value,
+                "domain": cookie.domain,
+                "path": cookie.path,
+                "expires": cookie.expires,
+                "secure": cookie.secure,
+            }
+        return items
+
+    def _seen_of(self, jar: RequestsCookieJar, hostname: str) -> Set[CookieKey]:
+        """The keys of the cookies of the host the jar has seen. Call it with the lock."""
+        ref, hosts = self._seen.get(id(jar), (None, {}))
+        if ref is None or ref() is not jar:
+            hosts = {}
+            self._seen[id(jar)] = (weakref.ref(jar), hosts)
+            weakref.finalize(jar, self._seen.pop, id(jar), None)
+        return hosts.setdefault(hostname, set())
+
+    def _fingerprint(self, items: Dict[CookieKey, dict]) -> FrozenSet:
+        return frozenset((k, v["value"], v["expires"]) for k, v in items.items())
+
+    def load(self, hostname: Optional[str], jar: RequestsCookieJar) -> int:
+        """Add the saved cookies of the host to the jar.
+
+        Returns:
+            Number of cookies loaded.
+        """
+        if not hostname:
+            return 0
+        now = time.time()
+        count = 0
+        for item in self._read(self._file_of(hostname)):
+            if not self._is_alive(item, now):
+                continue
+            jar.set_cookie(
+                create_cookie(
+                    name=item["name"],
+                    value=item["value"],
+                    domain=item.get("domain") or "",
+                    path=item.get("path") or "/",
+                    expires=item.get("expires"),
+                    secure=bool(item.get("secure")),
+                )
+            )
+            count += 1
+        items = self._items_of(hostname, jar)
+        with self._lock:
+            self._saved[hostname] = self._fingerprint(items)
+            self._seen_of(jar, hostname).update(items.keys())
+        if count:
+            logger.debug(f"Loaded {count} saved cookies of {hostname}")
+        return count
+
+    def save(self, hostname: Optional[str], jar: RequestsCookieJar) -> bool:
+        """Save the cookies of the host from the jar, keeping the saved ones
+        the jar has never seen. Nothing is written if the cookies did not
+        change since the last call.
+
+        Returns:
+            True if the file was updated.
+        """
+        if not hostname:
+            return False
+        try:
+            items = self._items_of(hostname, jar)
+        except RuntimeError:
+            return False  # the jar was changed by another thread. try next time.
+        fingerprint = self._fingerprint(items)
+        with self._lock:
+            seen = self._seen_of(jar, hostname)
+            seen.update(items.keys())
+            seen = set(seen)
+            if self._saved.get(hostname) == fingerprint:
+                return False
+            self._saved[hostname] = fingerprint
+
+        now = time.time()
+        file = self._file_of(hostname)
+        try:
+            with file_lock(str(file)):
+                merged: Dict[CookieKey, dict] = {}
+                for item in self._read(file):
+                    key = (item["name"], item.get("domain") or "", item.get("path") or "/")
+                    if key not in seen and self._is_alive(item, now):
+                        merged[key] = item
+                for key, item in items.items():
+                    merged[key] = dict(item, saved_at=now)
+
+                temp_file = file.with_name(f".{file.name}.{os.getpid()}")
+                temp_file.unlink(missing_ok=True)  # left by a crash, with any mode
+                fd = os.open(temp_file, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+                with os.fdopen(fd, "w", encoding="utf-8") as fp:
+                    json.dump(list(merged.values()), fp, indent=2)
+                os.replace(temp_file, file)
+        except Exception as e:
+            logger.debug(f"Failed to save cookies of {hostname}. {e}")
+            return False
+        return True
+
+    def clear(self, hostname: Optional[str] = None) -> None:
+        """Remove the saved cookies of a host, or of every host"""
+        files = [self._file_of(hostname)] if hostname else self.root.glob("*.json")
+        for file in files:
+            with file_lock(str(file)):
+                file.unlink(missing_ok=True)
+        with self._lock:
+            if hostname:
+                self._saved.pop(hostname, None)
+            else:
+                self._saved.clear()
+
+
+def get_cookie_store() -> CookieStore:
+    """Returns the process-wide cookie store. Creates one on first use."""
+    global __store
+    with __store_lock:
+        if __store is None:
+            __store = CookieStore()
+        return __store
@@ -1,15 +1,23 @@
 import hashlib
 import logging
+import re
 from abc import abstractmethod
-from typing import Generator, List, Optional
+from concurrent.futures import FIRST_COMPLETED, Future, wait
+from itertools import islice
+from typing import Callable, Dict, Generator, List, Optional
+from urllib.parse import urlparse
 
+from .aioengine import get_async_engine
 from .arguments import get_args
 from ..models import Chapter, SearchResult, Volume
 from .cleaner import TextCleaner
+from .httpcache import get_response_cache
 from .scraper import Scraper
 
 logger = logging.getLogger(__name__)
 
+RE_IMG_TAG = re.compile(r"<img\b", re.IGNORECASE)
+
 
 class Crawler(Scraper):
     """Blueprint for creating new crawlers"""
@@ -19,6 +27,10 @@ class Crawler(Scraper):
     base_url: List[str]
     language = ""
 
+    # Seconds to reuse a cached response without revalidation.
+    # Use a negative value to disable response cache for this source.
+    cache_ttl: Optional[float] = None
+
     # ------------------------------------------------------------------------- #
     # Constructor & Destructors
     # ------------------------------------------------------------------------- #
@@ -68,6 +80,11 @@ class Crawler(Scraper):
             parser=parser,
         )
 
+        if self.cache_ttl is not None:
+            cache = get_response_cache()
+            for url in self.base_url:
+                cache.set_ttl(urlparse(url).hostname, self.cache_ttl)
+
     def __del__(self) -> None:
         # if hasattr(self, "volumes"):
         #     self.volumes.clear()
@@ -102,6 +119,17 @@ class Crawler(Scraper):
         """Download body of a single chapter and return as clean html format."""
         raise NotImplementedError()
 
+    async def async_download_chapter_body(self, chapter: Chapter) -> str:
+        """Async version of the `download_chapter_body` used by the async engine.
+        Override it with `self.async_get_soup` etc. to avoid blocking a thread per chapter,
+        as done by the `GeneralSoupTemplate`. By default, it runs the synchronous
+        `download_chapter_body` on the executor, which gains nothing from the engine."""
+        return await get_async_engine().run_sync(
+            self.executor,
+            self.download_chapter_body,
+            chapter,
+        )
+
     # ------------------------------------------------------------------------- #
     # Utility methods that can be overriden
     # ------------------------------------------------------------------------- #
@@ -122,8 +150,11 @@ class Crawler(Scraper):
         if not chapter.body:
             return
 
-        has_changes = False
         chapter.setdefault("images", {})
+        if not RE_IMG_TAG.search(chapter.body):
+            return  # nothing to parse
+
+        has_changes = False
         soup = self.make_soup(chapter.body)
         for img in soup.select("img[src]"):
             full_url = self.absolute_url(img["src"], page_url=chapter["url"])
@@ -141,32 +172,72 @@ class Crawler(Scraper):
         self,
         chapters: List[Chapter],
         fail_fast=False,
+        on_chapter: Optional[Callable[[Chapter], None]] = None,
     ) -> Generator[int, None, None]:
-        futures = {
-            index: self.executor.submit(self.download_chapter_body, chapter)
-            for index, chapter in enumerate(chapters)
-            if not chapter.success
-        }
-        yield len(chapters) - len(futures)
-
-        self.resolve_futures(
-            futures.values(),
-            desc="Chapters",
-            unit="item",
-            fail_fast=fail_fast,
-        )
-        chapter = None
-        for (index, future) in futures.items():
-            try:
-                chapter = chapters[index]
-                chapter.body = future.result()
-                self.extract_chapter_images(chapter)
-                chapter.success = True
-            except KeyboardInterrupt:
-                break
-            except Exception:
-                if isinstance(chapter, Chapter):
-                    chapter.body = ""
-                    chapter.success = False
-            finally:
-                yield 1
+        """Download the chapters that are not successful yet.
+
+        The chapters are processed in the order they complete, and only a few
+        of them are kept in flight at a time, so that the memory usage does not
+        grow with the number of chapters.
+
+        Args:
+        - chapters (List[Chapter]): The chapters to download.
+        - fail_fast (bool, optional): Raise the first error instead of skipping the chapter.
+        - on_chapter (Callable, optional): Called with each processed chapter, e.g. to save it.
+
+        Yields:
+            Number of chapters processed.
+        """
+        pending = [chapter for chapter in chapters if not chapter.success]
+        yield len(chapters) - len(pending)
+        if not pending:
+            return
+
+        engine = get_async_engine() if get_args().async_engine else None
+
+        def submit(chapter: Chapter) -> Future:
+            if engine:
+                return engine.submit(self.async_download_chapter_body(chapter))
+            return self.executor.submit(self.download_chapter_body, chapter)
+
+        if engine and engine.has_http_client:
+            # the connections of the async engine are the limit, not the threads
+            max_in_flight = engine.max_requests
+        else:
+            max_in_flight = 2 * max(self.workers, self.max_domain_window)
+        queue = iter(pending)
+        in_flight: Dict[Future, Chapter] = {}
+        bar = self.progress_bar(desc="Chapters", unit="item", total=len(pending))
+        try:
+            while True:
+                for chapter in islice(queue, max_in_flight - len(in_flight)):
+                    in_flight[submit(chapter)] = chapter
+                if not in_flight:
+                    break
+
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    chapter = in_flight.pop(future)
+                    try:
+                        chapter.body = future.result()
+                        self.extract_chapter_images(chapter)
+                        chapter.success = True
+                    except Exception as e:
+                        chapter.body = ""
+                        chapter.success = False
+                        if fail_fast:
+                            raise
+                        if bar.disable:
+                            logger.exception("Failed to download chapter")
+                        else:
+                            bar.clear()
+                            logger.warning(f"{type(e).__name__}: {e}")
+                    if on_chapter:
+                        on_chapter(chapter)
+                    bar.update()
+                    yield 1
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.cancel_futures(in_flight.keys())
+            bar.close()
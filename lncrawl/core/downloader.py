@@ -3,35 +3,29 @@ To download chapter bodies
 """
 import json
 import logging
+from concurrent.futures import CancelledError, Future, ThreadPoolExecutor
 from pathlib import Path
+from threading import Lock
+from typing import Dict, List, Optional, Tuple
 
+from ..models import ImageProfile
 from ..models.chapter import Chapter
 from ..utils.imgen import generate_cover_image
+from ..utils.transcode import get_image_transcoder, original_bytes
 from .arguments import get_args
+from .chapterstore import STORE_FILE_NAME, ChapterStore, ImageSpan, find_image_spans
+from .httpcache import get_response_cache
+from .imagestore import content_digest, get_image_store, link_file
+from .retry import get_retry_stats
 
 logger = logging.getLogger(__name__)
 
 
-def _chapter_file(
-    chapter: Chapter,
-    output_path: str,
-    pack_by_volume: bool,
-):
-    dir_name = Path(output_path) / "json"
-    if pack_by_volume:
-        vol_name = "Volume " + str(chapter.volume).rjust(2, "0")
-        dir_name = dir_name / vol_name
+def _chapter_store(app) -> ChapterStore:
+    return ChapterStore(Path(app.output_path) / STORE_FILE_NAME)
 
-    chapter_name = str(chapter.id).rjust(5, "0")
-    json_file = dir_name / (chapter_name + ".json")
-    return json_file
-
-
-def _save_chapter(app, chapter: Chapter):
-    from .app import App
-
-    assert isinstance(app, App)
 
+def _save_chapter(store: ChapterStore, chapter: Chapter):
     if not chapter.body:
         chapter.body = "<p><i>Failed to download chapter body</i></p>"
 
@@ -49,17 +43,121 @@ def _save_chapter(app, chapter: Chapter):
     if not chapter.body.startswith(title):
         chapter.body = "".join([title, chapter.body])
 
-    file_name = _chapter_file(
+    store.put(chapter, unload_body=True)
+
+
+def _restore_chapter_file(app, store: ChapterStore, chapter: Chapter) -> bool:
+    """Import a chapter file saved by the older versions to the store"""
+    file_name = ChapterStore.json_file_of(
         chapter,
-        output_path=app.output_path,
         pack_by_volume=app.pack_by_volume,
+        output_path=app.output_path,
     )
-    file_name.parent.mkdir(parents=True, exist_ok=True)
-    with file_name.open("w", encoding="utf-8") as fp:
-        json.dump(chapter, fp, ensure_ascii=False)
+    try:
+        with open(file_name, "r", encoding="utf-8") as file:
+            old_chapter = json.load(file)
+            chapter.update(**old_chapter)
+    except FileNotFoundError:
+        return False
+    except json.JSONDecodeError:
+        logger.info("Unable to decode JSON from the file: %s" % file_name)
+        return False
+    except Exception as e:
+        logger.exception("An error occurred while reading the file:", e)
+        return False
+
+    store.put(chapter, unload_body=True)
+    return True
+
+
+class ImageQueue:
+    """Downloads the content images in a separate pool of workers, as soon as
+    the chapters containing them are downloaded.
+
+    The images are usually served by a different host than the chapters, so
+    they are downloaded along with the chapters instead of after them.
+    The requests to each host are still limited by its domain gate.
+
+    Args:
+    - app (App): The app to download the images of.
+    - workers (int, optional): Number of concurrent downloads. Default: the crawler workers.
+    """
+
+    def __init__(self, app, workers: Optional[int] = None) -> None:
+        from .app import App
+
+        assert isinstance(app, App)
+        assert app.crawler is not None
+
+        self.app = app
+        self.image_folder = Path(app.output_path) / "images"
+        self.futures: Dict[str, Future] = {}
+        self._lock = Lock()
+        self._executor = ThreadPoolExecutor(
+            max_workers=workers or app.crawler.workers,
+            thread_name_prefix="lncrawl_image",
+        )
+
+    def __enter__(self) -> "ImageQueue":
+        return self
+
+    def __exit__(self, type, value, traceback) -> None:
+        self.close()
+
+    def add(self, chapter: Chapter) -> None:
+        """Start downloading the images of the chapter"""
+        for filename, url in (chapter.get("images") or {}).items():
+            with self._lock:
+                if filename in self.futures:
+                    continue
+                future = self.futures[filename] = Future()
+            self._executor.submit(self._download, url, filename, future)
+
+    def _download(self, url: str, filename: str, future: Future) -> None:
+        if not future.set_running_or_notify_cancel():
+            return  # cancelled before started
+        try:
+            saving = _fetch_content_image(self.app, url, self.image_folder / filename)
+        except BaseException as e:
+            future.set_exception(e)
+            return
+        if not saving:
+            future.set_result(None)
+            return
+
+        # the image is converted by another process. this thread is free to download the next one.
+        def done(saving: Future) -> None:
+            if saving.cancelled():
+                future.set_exception(CancelledError())
+            elif saving.exception():
+                future.set_exception(saving.exception())
+            else:
+                future.set_result(None)
+
+        saving.add_done_callback(done)
+
+    def failed(self) -> List[str]:
+        """Names of the image files that could not be downloaded"""
+        return [
+            filename
+            for filename in self.futures
+            if not (self.image_folder / filename).is_file()
+        ]
+
+    def close(self) -> None:
+        """Stop the downloads that are not started yet"""
+        for future in self.futures.values():
+            future.cancel()
+        self._executor.shutdown(wait=False)
+
 
+def fetch_chapter_body(app, images: Optional[ImageQueue] = None):
+    """Download the chapter bodies, and save each one to the chapter store.
 
-def fetch_chapter_body(app):
+    Args:
+    - app (App): The app to download the chapters of.
+    - images (ImageQueue, optional): Where to queue the images of the downloaded chapters.
+    """
     from .app import App
 
     assert isinstance(app, App)
@@ -68,58 +166,167 @@ def fetch_chapter_body(app):
     if not app.output_formats:
         app.output_formats = {}
 
-    # restore from file cache
-    for chapter in app.chapters:
-        file_name = _chapter_file(
-            chapter,
-            pack_by_volume=app.pack_by_volume,
-            output_path=app.output_path,
+    with _chapter_store(app) as store:
+        # restore from the chapter store
+        saved = store.restore(app.chapters)
+        for chapter in app.chapters:
+            if chapter.id not in saved and _restore_chapter_file(app, store, chapter):
+                saved.add(chapter.id)
+        saved = set(
+            [chapter.id for chapter in app.chapters if chapter.success and chapter.id in saved]
         )
+        logger.debug(f"Restored {len(saved)} chapters from {store.db_path}")
+
+        if images:
+            for chapter in app.chapters:
+                if chapter.id in saved:
+                    images.add(chapter)
+
+        def save_chapter(chapter: Chapter):
+            _save_chapter(store, chapter)
+            saved.add(chapter.id)
+            if images:
+                images.add(chapter)
+
+        # download remaining chapters, saving each one as soon as it is done
+        app.progress = 0
+        for progress in app.crawler.download_chapters(
+            app.chapters,
+            on_chapter=save_chapter,
+        ):
+            app.progress += progress
+
+        # the chapters left out, e.g. when interrupted
+        for chapter in app.chapters:
+            if chapter.id not in saved:
+                _save_chapter(store, chapter)
+
+    logger.info(f"Processed {len(app.chapters)} chapters [{app.progress} fetched]")
+    logger.debug("Response cache stats: %s", get_response_cache().stats)
+    logger.debug("Request stats: %s", get_retry_stats())
+
+
+def export_chapter_files(app):
+    """Write the stored chapters in the per-chapter JSON layout"""
+    from .app import App
+
+    assert isinstance(app, App)
+
+    with _chapter_store(app) as store:
+        files = store.export_json(app.output_path, app.pack_by_volume)
+    logger.info(f"Exported {len(files)} chapter files")
+
+
+# the images being saved to the store, by (digest, profile)
+_storing_lock = Lock()
+_storing: Dict[Tuple[str, str], Future] = {}
+
+
+def _store_image(img, digest: str, profile: str) -> Future:
+    """Save the image to the image store, once even if many threads downloaded it.
+
+    Returns:
+        A future of the stored file.
+    """
+    key = (digest, profile)
+    with _storing_lock:
+        storing = _storing.get(key)
+        if storing:
+            img.close()
+            return storing
+        storing = _storing[key] = Future()
+
+    store = get_image_store()
+    stored_file = store.file_of(digest, profile)
+
+    def on_converted(converting: Future) -> None:
         try:
-            with open(file_name, "r", encoding="utf-8") as file:
-                old_chapter = json.load(file)
-                chapter.update(**old_chapter)
-        except FileNotFoundError:
-            logger.info("Missing File: %s Retrieved!" % file_name)
-        except json.JSONDecodeError:
-            logger.info("Unable to decode JSON from the file: %s" % file_name)
-        except Exception as e:
-            logger.exception("An error occurred while reading the file:", e)
+            converting.result()
+            store.add(digest, profile)
+        except BaseException as e:
+            storing.set_exception(e)
+        else:
+            storing.set_result(stored_file)
+        finally:
+            with _storing_lock:
+                _storing.pop(key, None)
 
-        if chapter.success:
-            logger.debug(f"Restored chapter {chapter.id} from {file_name}")
+    try:
+        stored_file.parent.mkdir(parents=True, exist_ok=True)
+        converting = get_image_transcoder().save(img, stored_file.as_posix(), profile)
+    except BaseException as e:
+        converting = Future()
+        converting.set_exception(e)
+    converting.add_done_callback(on_converted)
+    return storing
 
-    # download remaining chapters
-    app.progress = 0
-    for progress in app.crawler.download_chapters(app.chapters):
-        app.progress += progress
 
-    for chapter in app.chapters:
-        _save_chapter(app, chapter)
+def _link_stored_image(stored_file: Path, image_file: Path) -> bool:
+    """Link the stored image to the novel. False if it was evicted from the store meanwhile."""
+    try:
+        link_file(stored_file, image_file)
+    except FileNotFoundError:
+        logger.debug("Stored image was evicted: %s", stored_file)
+        return False
+    logger.debug("Linked stored image: %s", image_file)
+    return True
 
-    logger.info(f"Processed {len(app.chapters)} chapters [{app.progress} fetched]")
 
+def _fetch_content_image(app, url, image_file: Path) -> Optional[Future]:
+    """Download an image, and start saving it as JPEG.
 
-def _fetch_content_image(app, url, image_file: Path):
+    The images are saved once in the shared image store, and linked to the
+    output folder of the novel. The urls downloaded before are not requested again.
+
+    Returns:
+        A future which is done when the file is saved, or None if there was nothing to download.
+    """
     from .app import App
 
     assert isinstance(app, App)
 
-    if url and not (image_file.exists() and image_file.is_file()):
+    if not url or (image_file.exists() and image_file.is_file()):
+        return None
+
+    # the same image was downloaded before, maybe for another novel
+    store = get_image_store()
+    profile = ImageProfile(app.image_profile).value
+    stored_file = store.lookup(url, profile)
+    if stored_file and _link_stored_image(stored_file, image_file):
+        return None
+
+    img = app.crawler.download_image(url)
+    image_file.parent.mkdir(parents=True, exist_ok=True)
+    content = original_bytes(img)
+    if content is None:
+        # not a downloaded file. there is nothing to identify it by.
+        saving = get_image_transcoder().save(img, image_file.as_posix(), profile)
+        saving.add_done_callback(lambda _: logger.debug("Saved image: %s", image_file))
+        return saving
+
+    digest = content_digest(content)
+    store.remember(url, digest)
+    stored_file = store.find(digest, profile)
+    if stored_file and _link_stored_image(stored_file, image_file):
+        img.close()
+        return None
+
+    storing = _store_image(img, digest, profile)
+
+    # done only after the stored image is linked to the novel
+    saving: Future = Future()
+
+    def link_saved(storing: Future) -> None:
         try:
-            img = app.crawler.download_image(url)
-            image_file.parent.mkdir(parents=True, exist_ok=True)
-            if img.mode not in ("L", "RGB", "YCbCr", "RGBX"):
-                if img.mode == "RGBa":
-                    #RGBa -> RGB isn't supported so we go through RGBA first
-                    img.convert("RGBA").convert("RGB")
-                else:
-                    img = img.convert("RGB")
-            img.save(image_file.as_posix(), "JPEG", optimized=True)
-            img.close()
+            link_file(storing.result(), image_file)
             logger.debug("Saved image: %s", image_file)
-        finally:
-            app.progress += 1
+        except BaseException as e:
+            saving.set_exception(e)
+        else:
+            saving.set_result(None)
+
+    storing.add_done_callback(link_saved)
+    return saving
 
 
 def _fetch_cover_image(app):
@@ -132,11 +339,13 @@ def _fetch_cover_image(app):
     cover_file = Path(app.output_path) / filename
     if app.crawler.novel_cover:
         try:
-            _fetch_content_image(
+            saving = _fetch_content_image(
                 app,
                 app.crawler.novel_cover,
                 cover_file,
             )
+            if saving:
+                saving.result()
         except Exception as e:
             if logger.isEnabledFor(logging.DEBUG):
                 logger.exception("Failed to download cover", e)
@@ -149,33 +358,54 @@ def _fetch_cover_image(app):
     assert Path(app.book_cover).is_file(), "Failed to download or generate cover image"
 
 
-def _discard_failed_images(app, chapter, failed):
+def _cut_image_spans(body: str, spans: List[ImageSpan]) -> str:
+    """Remove the image elements from the body"""
+    cuts = sorted(set((start, end) for _, start, end in spans if start is not None))
+    pieces = []
+    last = 0
+    for start, end in cuts:
+        if start < last:
+            continue  # overlapping spans
+        pieces.append(body[last:start])
+        last = end
+    pieces.append(body[last:])
+    return "".join(pieces)
+
+
+def _discard_failed_images(app, chapter, spans: List[ImageSpan]) -> bool:
+    """Remove the failed images from a chapter, using their indexed positions"""
     from .app import App
 
     assert isinstance(app, App)
-    assert app.crawler is not None
-    assert isinstance(chapter, dict), "Invalid chapter"
+    assert isinstance(chapter, Chapter), "Invalid chapter"
 
-    if not chapter["body"] or "images" not in chapter:
-        return
+    body = chapter.body
+    if not body or not chapter.images:
+        return False
 
-    assert isinstance(chapter["images"], dict)
-    current_failed = [filename for filename in failed if filename in chapter["images"]]
-    if not current_failed:
-        return
+    filenames = set(filename for filename, _, _ in spans)
+    is_stale = any(
+        start is not None and f'alt="{filename}"' not in body[start:end]
+        for filename, start, end in spans
+    )
+    if is_stale:
+        # the body was changed after it was indexed
+        spans = find_image_spans(body, filenames)
 
-    soup = app.crawler.make_soup(chapter["body"])
-    for filename in current_failed:
-        chapter["images"].pop(filename)
-        for img in soup.select(f'img[alt="{filename}"]'):
-            img.extract()
+    for filename in filenames:
+        chapter.images.pop(filename, None)
+    chapter.body = _cut_image_spans(body, spans)
+    return True
 
-    soup_body = soup.select_one("body")
-    assert soup_body
-    chapter["body"] = "".join([str(x) for x in soup_body.contents])
 
+def fetch_chapter_images(app, images: Optional[ImageQueue] = None):
+    """Download the cover and the content images that are not downloaded yet,
+    and wait for the ones queued while the chapters were being downloaded.
 
-def fetch_chapter_images(app):
+    Args:
+    - app (App): The app to download the images of.
+    - images (ImageQueue, optional): The queue used by `fetch_chapter_body`.
+    """
     from .app import App
 
     assert isinstance(app, App)
@@ -190,35 +420,32 @@ def fetch_chapter_images(app):
         )
     ]
 
-    # download content images
-    image_folder = Path(app.output_path) / "images"
-    images_to_download = set(
-        [
-            (filename, url)
-            for chapter in app.chapters
-            for filename, url in chapter.get("images", {}).items()
-        ]
-    )
-    futures += [
-        app.crawler.executor.submit(
-            _fetch_content_image,
-            app,
-            url,
-            image_folder / filename,
-        )
-        for filename, url in images_to_download
-    ]
+    def count_image(future: Future):
+        app.progress += 1
 
+    # download content images
+    queue = images or ImageQueue(app)
     failed = []
     try:
+        for chapter in app.chapters:
+            queue.add(chapter)
+        for future in queue.futures.values():
+            future.add_done_callback(count_image)
+        futures += list(queue.futures.values())
         app.crawler.resolve_futures(futures, desc="  Images", unit="item")
-        failed = [
-            filename
-            for filename, url in images_to_download
-            if not (image_folder / filename).is_file()
-        ]
+        failed = queue.failed()
     finally:
         logger.info("Processed %d images [%d failed]" % (app.progress, len(failed)))
+        if not images:
+            queue.close()
+
+    if not failed:
+        return
 
-    for chapter in app.chapters:
-        _discard_failed_images(app, chapter, failed)
+    # only the chapters using the failed images are changed
+    chapters = {chapter.id: chapter for chapter in app.chapters}
+    with _chapter_store(app) as store:
+        for chapter_id, spans in store.find_images(failed).items():
+            chapter = chapters.get(chapter_id)
+            if chapter and _discard_failed_images(app, chapter, spans):
+                store.put(chapter, unload_body=True)
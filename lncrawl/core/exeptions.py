@@ -14,6 +14,13 @@ class FallbackToBrowser(Exception):
     pass
 
 
+class CircuitOpenError(LNException):
+    def __init__(self, message: str, retry_after: float = 0, opened_at: float = 0) -> None:
+        super().__init__(message)
+        self.retry_after = retry_after  # seconds until the circuit can be probed
+        self.opened_at = opened_at  # when the circuit was opened
+
+
 ScraperErrorGroup = (
     URLError,
     HTTPError,
@@ -21,4 +28,5 @@ ScraperErrorGroup = (
     RequestException,
     FallbackToBrowser,
     UnidentifiedImageError,
+    CircuitOpenError,
 )
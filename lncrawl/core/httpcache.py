@@ -0,0 +1,499 @@
+"""
+Persistent HTTP response cache with conditional revalidation
+"""
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import tempfile
+import time
+from email.utils import parsedate_to_datetime
+from io import BytesIO
+from pathlib import Path
+from threading import Lock
+from typing import BinaryIO, Dict, Mapping, Optional
+
+from requests import Response
+from requests.structures import CaseInsensitiveDict
+
+from .. import constants as C
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 64 * 1024
+
+# request headers that change the content of a response
+VARY_HEADERS = ["Accept", "Accept-Language", "Authorization", "Cookie"]
+
+# response headers to keep with the cached content
+STORED_HEADERS = [
+    "Content-Type",
+    "Content-Encoding",
+    "Content-Language",
+    "ETag",
+    "Last-Modified",
+]
+
+# columns added to the index after it was first released
+ADDED_COLUMNS = {
+    "final_url": "TEXT",
+    "max_age": "REAL",
+}
+
+__cache_lock = Lock()
+__cache: Optional["ResponseCache"] = None
+
+
+def parse_cache_control(value: Optional[str]) -> Dict[str, str]:
+    """The directives of a Cache-Control header, in lower case"""
+    directives = {}
+    for item in str(value or "").split(","):
+        name, _, arg = item.partition("=")
+        if name.strip():
+            directives[name.strip().lower()] = arg.strip().strip('"')
+    return directives
+
+
+def freshness_lifetime(response: Response) -> Optional[float]:
+    """Seconds the response may be served without revalidation, as said by
+    its Cache-Control or Expires headers. None if they do not say."""
+    directives = parse_cache_control(response.headers.get("Cache-Control"))
+    if "no-cache" in directives:
+        return 0
+    if "max-age" in directives:
+        try:
+            return max(0, int(directives["max-age"]))
+        except ValueError:
+            return 0
+    expires = response.headers.get("Expires")
+    if expires:
+        try:
+            date = response.headers.get("Date")
+            now = parsedate_to_datetime(date).timestamp() if date else time.time()
+            return max(0, parsedate_to_datetime(expires).timestamp() - now)
+        except (TypeError, ValueError):
+            return 0  # an invalid date means already expired
+    return None
+
+
+class CacheEntry:
+    def __init__(
+        self,
+        key: str,
+        url: str,
+        status: int,
+        headers: Dict[str, str],
+        body: str,
+        stored_at: float,
+        ttl: float,
+    ) -> None:
+        self.key = key
+        self.url = url
+        self.status = status
+        self.headers = CaseInsensitiveDict(headers)
+        self.body = body
+        self.stored_at = stored_at
+        self.ttl = ttl
+
+    @property
+    def is_fresh(self) -> bool:
+        return self.stored_at + self.ttl > time.time()
+
+    @property
+    def etag(self) -> Optional[str]:
+        return self.headers.get("ETag")
+
+    @property
+    def last_modified(self) -> Optional[str]:
+        return self.headers.get("Last-Modified")
+
+    def conditional_headers(self) -> Dict[str, str]:
+        """Headers to revalidate this entry with the origin server"""
+        headers = {}
+        if self.etag:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified:
+            headers["If-Modified-Since"] = self.last_modified
+        return headers
+
+
+class ResponseCache:
+    """A content-addressed on-disk cache of the GET responses.
+
+    The entries are indexed in a SQLite database by method + url + vary headers.
+    The Cookie header is one of them, so that responses of a logged in session
+    are never served to another one.
+    The bodies are stored as separate files named by the SHA-256 of the content,
+    so that identical contents from different urls are stored only once.
+    Least recently used entries are evicted when the total size exceeds the cap.
+
+    Args:
+    - cache_path (str, optional): Where to store the cache. Default: ~/.lncrawl/cache
+    - max_size (int, optional): Maximum size of the bodies in bytes. Default: 512MB
+    - default_ttl (float, optional): Seconds to serve a response without revalidation. Default: 1 hour.
+        A shorter max-age or Expires of the response is respected.
+    """
+
+    def __init__(
+        self,
+        cache_path: str = C.DEFAULT_CACHE_PATH,
+        max_size: int = C.DEFAULT_CACHE_SIZE,
+        default_ttl: float = C.DEFAULT_CACHE_TTL,
+    ) -> None:
+        self.root = Path(cache_path)
+        self.max_size = max_size
+        self.default_ttl = default_ttl
+        self.host_ttl: Dict[str, float] = {}
+        self.stats = {
+            "hits": 0,
+            "misses": 0,
+            "revalidated": 0,
+            "stored": 0,
+            "evicted": 0,
+        }
+        self._lock = Lock()
+        self._total_size: Optional[int] = None
+        self._db: Optional[sqlite3.Connection] = None
+
+    @property
+    def db(self) -> sqlite3.Connection:
+        if self._db is None:
+            self.root.mkdir(parents=True, exist_ok=True)
+            self._db = sqlite3.connect(
+                str(self.root / "index.db"),
+                timeout=30,
+                check_same_thread=False,
+                isolation_level=None,
+            )
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                """
+                CREATE TABLE IF NOT EXISTS responses (
+                    key TEXT PRIMARY KEY,
+                    url TEXT NOT NULL,
+                    hostname TEXT,
+                    status INTEGER,
+                    headers TEXT,
+                    body TEXT,
+                    size INTEGER,
+                    stored_at REAL,
+                    accessed_at REAL,
+                    final_url TEXT,
+                    max_age REAL
+                )
+                """
+            )
+            columns = [row[1] for row in self._db.execute("PRAGMA table_info(responses)")]
+            for name, kind in ADDED_COLUMNS.items():
+                if name not in columns:
+                    self._db.execute(f"ALTER TABLE responses ADD COLUMN {name} {kind}")
+            self._db.execute(
+                "CREATE INDEX IF NOT EXISTS responses_lru ON responses (accessed_at)"
+            )
+        return self._db
+
+    def close(self) -> None:
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+    # ------------------------------------------------------------------------- #
+    # Policies
+    # ------------------------------------------------------------------------- #
+
+    def set_ttl(self, hostname: str, ttl: float) -> None:
+        """Set the seconds to serve responses from a host without revalidation.
+        A negative value disables caching for the host."""
+        self.host_ttl[hostname] = ttl
+
+    def ttl_of(self, hostname: Optional[str]) -> float:
+        return self.host_ttl.get(hostname or "", self.default_ttl)
+
+    def make_key(self, method: str, url: str, headers: Mapping) -> str:
+        headers = CaseInsensitiveDict(headers)
+        vary = "\n".join([f"{k}:{headers.get(k) or ''}" for k in VARY_HEADERS])
+        raw = "\n".join([method.upper(), url, vary])
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def _body_file(self, body: str) -> Path:
+        return self.root / "bodies" / body[:2] / body
+
+    # ------------------------------------------------------------------------- #
+    # Lookup & Store
+    # ------------------------------------------------------------------------- #
+
+    def lookup(
+        self,
+        method: str,
+        url: str,
+        headers: Mapping,
+        hostname: Optional[str] = None,
+    ) -> Optional[CacheEntry]:
+        """Find a cached entry. The entry may need to be revalidated."""
+        ttl = self.ttl_of(hostname)
+        if ttl < 0:
+            return None
+
+        key = self.make_key(method, url, headers)
+        with self._lock:
+            row = self.db.execute(
+                "SELECT status, headers, body, stored_at, final_url, max_age"
+                " FROM responses WHERE key = ?",
+                (key,),
+            ).fetchone()
+            if not row or not self._body_file(row[2]).is_file():
+                self.stats["misses"] += 1
+                return None
+
+        status, headers_json, body, stored_at, final_url, max_age = row
+        if max_age is not None:
+            ttl = min(ttl, max_age)
+        return CacheEntry(
+            key=key,
+            url=final_url or url,
+            status=status,
+            headers=json.loads(headers_json),
+            body=body,
+            stored_at=stored_at,
+            ttl=ttl,
+        )
+
+    def _touch(self, entry: CacheEntry) -> None:
+        with self._lock:
+            self.db.execute(
+                "UPDATE responses SET accessed_at = ? WHERE key = ?",
+                (time.time(), entry.key),
+            )
+            self.stats["hits"] += 1
+
+    def _drop(self, entry: CacheEntry) -> None:
+        """Forget the entry, which body was evicted after the lookup"""
+        with self._lock:
+            self.db.execute(
+                "DELETE FROM responses WHERE key = ? AND body = ?",
+                (entry.key, entry.body),
+            )
+            self._total_size = None
+            self.stats["misses"] += 1
+
+    def to_response(self, entry: CacheEntry) -> Optional[Response]:
+        """Build a response from the cached entry and mark it as recently used.
+        Returns None if the body was evicted since the lookup."""
+        try:
+            with open(self._body_file(entry.body), "rb") as fp:
+                content = fp.read()
+        except FileNotFoundError:
+            self._drop(entry)
+            return None
+        self._touch(entry)
+
+        response = Response()
+        response._content = content
+        response.status_code = entry.status
+        response.headers = CaseInsensitiveDict(entry.headers)
+        response.url = entry.url
+        response.encoding = "utf8"
+        response.reason = "OK"
+        return response
+
+    def open_body(self, entry: CacheEntry) -> Optional[BinaryIO]:
+        """Open the cached content as a binary file and mark it as recently used.
+        Returns None if the body was evicted since the lookup."""
+        try:
+            fp = open(self._body_file(entry.body), "rb")
+        except FileNotFoundError:
+            self._drop(entry)
+            return None
+        self._touch(entry)
+        return fp
+
+    def refresh(self, entry: CacheEntry) -> None:
+        """Refresh the entry after the origin server replied with 304 Not Modified"""
+        with self._lock:
+            self.db.execute(
+                "UPDATE responses SET stored_at = ? WHERE key = ?",
+                (time.time(), entry.key),
+            )
+            self.stats["revalidated"] += 1
+
+    def revalidated(self, entry: CacheEntry) -> Optional[Response]:
+        """Refresh the entry and build a response from it.
+        Returns None if the body was evicted since the lookup."""
+        self.refresh(entry)
+        return self.to_response(entry)
+
+    def _can_store(self, response: Response, hostname: Optional[str]) -> bool:
+        if response.status_code != 200 or self.ttl_of(hostname) < 0:
+            return False
+        directives = parse_cache_control(response.headers.get("Cache-Control"))
+        return "no-store" not in directives and "private" not in directives
+
+    def _save_body(self, body: str, fp: BinaryIO) -> None:
+        body_file = self._body_file(body)
+        if body_file.is_file():
+            return
+        body_file.parent.mkdir(parents=True, exist_ok=True)
+        # unique, as other threads may be saving the same content
+        fd, temp_name = tempfile.mkstemp(prefix=f".{body}.", dir=body_file.parent)
+        try:
+            with os.fdopen(fd, "wb") as out:
+                for chunk in iter(lambda: fp.read(CHUNK_SIZE), b""):
+                    out.write(chunk)
+            if not body_file.is_file():
+                os.replace(temp_name, body_file)
+        except OSError:
+            # the same content saved by another thread or process is as good
+            if not body_file.is_file():
+                raise
+        finally:
+            if os.path.exists(temp_name):
+                os.unlink(temp_name)
+
+    def _insert(
+        self,
+        method: str,
+        url: str,
+        headers: Mapping,
+        response: Response,
+        body: str,
+        size: int,
+        hostname: Optional[str],
+    ) -> None:
+        stored_headers = {
+            k: str(response.headers[k])
+            for k in STORED_HEADERS
+            if k in response.headers
+        }
+        now = time.time()
+        key = self.make_key(method, url, headers)
+        with self._lock:
+            self.db.execute(
+                "INSERT OR REPLACE INTO responses"
+                " (key, url, hostname, status, headers, body, size,"
+                " stored_at, accessed_at, final_url, max_age)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    key,
+                    url,
+                    hostname,
+                    200,
+                    json.dumps(stored_headers),
+                    body,
+                    size,
+                    now,
+                    now,
+                    str(response.url or url),
+                    freshness_lifetime(response),
+                ),
+            )
+            if self._total_size is not None:
+                self._total_size += size
+            self.stats["stored"] += 1
+
+        if self.total_size > self.max_size:
+            self.evict()
+
+    def store(
+        self,
+        method: str,
+        url: str,
+        headers: Mapping,
+        response: Response,
+        hostname: Optional[str] = None,
+    ) -> None:
+        """Save a successful response to the cache. Failing to save it is not an error."""
+        if not self._can_store(response, hostname):
+            return
+        try:
+            content = response.content
+            body = hashlib.sha256(content).hexdigest()
+            self._save_body(body, BytesIO(content))
+            self._insert(method, url, headers, response, body, len(content), hostname)
+        except Exception as e:
+            logger.warning("Could not cache response of %s. Error: %s", url, e)
+
+    def store_file(
+        self,
+        method: str,
+        url: str,
+        headers: Mapping,
+        response: Response,
+        fp: BinaryIO,
+        hostname: Optional[str] = None,
+    ) -> None:
+        """Save a successful response, which content was streamed to a file.
+        Failing to save it is not an error."""
+        if not self._can_store(response, hostname):
+            return
+        try:
+            fp.seek(0)
+            sha256 = hashlib.sha256()
+            for chunk in iter(lambda: fp.read(CHUNK_SIZE), b""):
+                sha256.update(chunk)
+            size = fp.tell()
+            body = sha256.hexdigest()
+            fp.seek(0)
+            self._save_body(body, fp)
+            self._insert(method, url, headers, response, body, size, hostname)
+        except Exception as e:
+            logger.warning("Could not cache response of %s. Error: %s", url, e)
+
+    # ------------------------------------------------------------------------- #
+    # Eviction
+    # ------------------------------------------------------------------------- #
+
+    @property
+    def total_size(self) -> int:
+        """Size of the distinct bodies in the cache"""
+        if self._total_size is None:
+            with self._lock:
+                row = self.db.execute(
+                    "SELECT SUM(size) FROM "
+                    "(SELECT MAX(size) AS size FROM responses GROUP BY body)"
+                ).fetchone()
+            self._total_size = int(row[0] or 0)
+        return self._total_size
+
+    def evict(self, target_ratio: float = 0.9) -> None:
+        """Remove least recently used entries until the size is within the cap"""
+        target = self.max_size * target_ratio
+        self._total_size = None
+        while self.total_size > target:
+            with self._lock:
+                rows = self.db.execute(
+                    "SELECT key, body FROM responses ORDER BY accessed_at LIMIT 100"
+                ).fetchall()
+                if not rows:
+                    break
+                self.db.executemany(
+                    "DELETE FROM responses WHERE key = ?",
+                    [(key,) for key, _ in rows],
+                )
+                for body in set([body for _, body in rows]):
+                    in_use = self.db.execute(
+                        "SELECT 1 FROM responses WHERE body = ? LIMIT 1", (body,)
+                    ).fetchone()
+                    if not in_use:
+                        self._body_file(body).unlink(missing_ok=True)
+            self.stats["evicted"] += len(rows)
+            self._total_size = None
+        logger.debug("Cache evicted. Current size: %d bytes", self.total_size)
+
+    def clear(self) -> None:
+        """Remove every entry from the cache"""
+        with self._lock:
+            self.db.execute("DELETE FROM responses")
+            self._total_size = 0
+        for body_file in (self.root / "bodies").glob("*/*"):
+            body_file.unlink(missing_ok=True)
+
+
+def get_response_cache() -> ResponseCache:
+    """Returns the process-wide response cache. Creates one on first use."""
+    global __cache
+    with __cache_lock:
+        if __cache is None:
+            __cache = ResponseCache()
+        return __cache
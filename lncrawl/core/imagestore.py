@@ -0,0 +1,219 @@
+"""
+Content-addressed store of the downloaded images shared by all novels
+"""
+import hashlib
+import logging
+import os
+import shutil
+import sqlite3
+import time
+from pathlib import Path
+from threading import Lock
+from typing import Optional
+
+from .. import constants as C
+
+logger = logging.getLogger(__name__)
+
+__store_lock = Lock()
+__store: Optional["ImageStore"] = None
+
+
+def content_digest(content: bytes) -> str:
+    return hashlib.sha256(content).hexdigest()
+
+
+def link_file(source: Path, target: Path) -> None:
+    """Hardlink the source file to the target. Copies it if links are not supported."""
+    target.parent.mkdir(parents=True, exist_ok=True)
+    temp_file = target.with_name(f".{target.name}.{os.getpid()}")
+    try:
+        os.link(source, temp_file)
+    except OSError:
+        # e.g. on another device, or a file system without hardlinks
+        shutil.copyfile(source, temp_file)
+    os.replace(temp_file, target)
+
+
+class ImageStore:
+    """Keeps one copy of each saved image, shared by the novels.
+
+    The images are named by the SHA-256 of the downloaded content and the
+    image profile they were saved with, so that the same picture served from
+    different urls is stored only once. The url of every downloaded image is
+    mapped to its content, so a known url is never downloaded again.
+    Least recently used images are removed when the total size exceeds the cap.
+
+    Args:
+    - store_path (str, optional): Where to store the images. Default: ~/.lncrawl/images
+    - max_size (int, optional): Maximum size of the images in bytes. Default: 1GB
+    """
+
+    def __init__(
+        self,
+        store_path: str = C.DEFAULT_IMAGE_STORE_PATH,
+        max_size: int = C.DEFAULT_IMAGE_STORE_SIZE,
+    ) -> None:
+        self.root = Path(store_path)
+        self.max_size = max_size
+        self.stats = {
+            "hits": 0,
+            "misses": 0,
+            "stored": 0,
+            "evicted": 0,
+        }
+        self._lock = Lock()
+        self._total_size: Optional[int] = None
+        self._db: Optional[sqlite3.Connection] = None
+
+    @property
+    def db(self) -> sqlite3.Connection:
+        if self._db is None:
+            self.root.mkdir(parents=True, exist_ok=True)
+            self._db = sqlite3.connect(
+                str(self.root / "index.db"),
+                timeout=30,
+                check_same_thread=False,
+                isolation_level=None,
+            )
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                """
+                CREATE TABLE IF NOT EXISTS urls (
+                    url TEXT PRIMARY KEY,
+                    digest TEXT NOT NULL,
+                    stored_at REAL
+                )
+                """
+            )
+            self._db.execute(
+                """
+                CREATE TABLE IF NOT EXISTS images (
+                    digest TEXT NOT NULL,
+                    profile TEXT NOT NULL,
+                    size INTEGER,
+                    accessed_at REAL,
+                    PRIMARY KEY (digest, profile)
+                )
+                """
+            )
+            self._db.execute(
+                "CREATE INDEX IF NOT EXISTS images_lru ON images (accessed_at)"
+            )
+        return self._db
+
+    def close(self) -> None:
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+    def file_of(self, digest: str, profile: str) -> Path:
+        return self.root / "files" / profile / digest[:2] / f"{digest}.jpg"
+
+    # ------------------------------------------------------------------------- #
+    # Lookup
+    # ------------------------------------------------------------------------- #
+
+    def find(self, digest: str, profile: str) -> Optional[Path]:
+        """The saved image of the content, and mark it as recently used"""
+        image_file = self.file_of(digest, profile)
+        with self._lock:
+            row = self.db.execute(
+                "SELECT 1 FROM images WHERE digest = ? AND profile = ?",
+                (digest, profile),
+            ).fetchone()
+            if row and image_file.is_file():
+                self.db.execute(
+                    "UPDATE images SET accessed_at = ? WHERE digest = ? AND profile = ?",
+                    (time.time(), digest, profile),
+                )
+                self.stats["hits"] += 1
+                return image_file
+            self.stats["misses"] += 1
+        return None
+
+    def lookup(self, url: str, profile: str) -> Optional[Path]:
+        """The saved image of a url downloaded before"""
+        with self._lock:
+            row = self.db.execute(
+                "SELECT digest FROM urls WHERE url = ?", (url,)
+            ).fetchone()
+        if not row:
+            return None
+        return self.find(row[0], profile)
+
+    # ------------------------------------------------------------------------- #
+    # Store
+    # ------------------------------------------------------------------------- #
+
+    def remember(self, url: str, digest: str) -> None:
+        """Map the url to the downloaded content"""
+        with self._lock:
+            self.db.execute(
+                "INSERT OR REPLACE INTO urls VALUES (?, ?, ?)",
+                (url, digest, time.time()),
+            )
+
+    def add(self, digest: str, profile: str) -> None:
+        """Register the image saved to `file_of(digest, profile)`"""
+        size = self.file_of(digest, profile).stat().st_size
+        with self._lock:
+            self.db.execute(
+                "INSERT OR REPLACE INTO images VALUES (?, ?, ?, ?)",
+                (digest, profile, size, time.time()),
+            )
+            if self._total_size is not None:
+                self._total_size += size
+            self.stats["stored"] += 1
+
+        if self.total_size > self.max_size:
+            self.evict()
+
+    @property
+    def total_size(self) -> int:
+        if self._total_size is None:
+            with self._lock:
+                row = self.db.execute("SELECT SUM(size) FROM images").fetchone()
+            self._total_size = int(row[0] or 0)
+        return self._total_size
+
+    def evict(self, target_ratio: float = 0.9) -> None:
+        """Remove least recently used images until the size is within the cap.
+        The images linked to the novel folders are kept there."""
+        target = self.max_size * target_ratio
+        self._total_size = None
+        while self.total_size > target:
+            with self._lock:
+                rows = self.db.execute(
+                    "SELECT digest, profile FROM images ORDER BY accessed_at LIMIT 100"
+                ).fetchall()
+                if not rows:
+                    break
+                self.db.executemany(
+                    "DELETE FROM images WHERE digest = ? AND profile = ?",
+                    rows,
+                )
+                for digest, profile in rows:
+                    self.file_of(digest, profile).unlink(missing_ok=True)
+            self.stats["evicted"] += len(rows)
+            self._total_size = None
+        logger.debug("Image store evicted. Current size: %d bytes", self.total_size)
+
+    def clear(self) -> None:
+        """Remove every image from the store"""
+        with self._lock:
+            self.db.execute("DELETE FROM images")
+            self.db.execute("DELETE FROM urls")
+            self._total_size = 0
+        for image_file in (self.root / "files").glob("*/*/*"):
+            image_file.unlink(missing_ok=True)
+
+
+def get_image_store() -> ImageStore:
+    """Returns the process-wide image store. Creates one on first use."""
+    global __store
+    with __store_lock:
+        if __store is None:
+            __store = ImageStore()
+        return __store
@@ -98,6 +98,7 @@ def save_metadata(app, completed=False):
             login_data=app.login_data,
             output_path=app.output_path,
             output_formats=app.output_formats,
+            image_profile=app.image_profile,
             pack_by_volume=app.pack_by_volume,
             good_file_name=app.good_file_name,
             no_append_after_filename=app.no_suffix_after_filename,
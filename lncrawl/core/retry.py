@@ -0,0 +1,251 @@
+"""
+Retry policies and per-host circuit breakers for the Scraper
+"""
+import logging
+import random
+import time
+from email.utils import parsedate_to_datetime
+from threading import Lock
+from typing import Dict, Optional
+
+from PIL import UnidentifiedImageError
+from requests.exceptions import HTTPError, InvalidURL, MissingSchema
+
+from .exeptions import CircuitOpenError, FallbackToBrowser
+
+logger = logging.getLogger(__name__)
+
+RETRY_STATUS_CODES = {408, 425, 429, 500, 502, 503, 504, 520, 521, 522, 523, 524}
+RETRY_AFTER_STATUS_CODES = {429, 503}
+THROTTLE_STATUS_CODE = 429
+HALF_OPEN_POLL_INTERVAL = 1.0
+
+_registry_lock = Lock()
+_host_breakers: Dict[str, "CircuitBreaker"] = {}
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Parse the seconds to wait from a Retry-After header value"""
+    if not value:
+        return None
+    value = str(value).strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        return max(0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class RetryPolicy:
+    """Decides whether and when to retry a failed request.
+
+    Args:
+    - retries (int, optional): Number of retries after the first attempt. Default: 1.
+    - backoff (float, optional): Seconds to wait before the first retry. Default: 1.
+    - max_backoff (float, optional): Longest seconds to wait between retries. Default: 30.
+    - max_retry_after (float, optional): Longest Retry-After to honor, or give up. Default: 120.
+    """
+
+    def __init__(
+        self,
+        retries: int = 1,
+        backoff: float = 1,
+        max_backoff: float = 30,
+        max_retry_after: float = 120,
+    ) -> None:
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.max_retry_after = max_retry_after
+
+    def is_fatal(self, error: BaseException) -> bool:
+        """True if retrying the request would not change the outcome"""
+        if isinstance(
+            error,
+            (
+                CircuitOpenError,
+                FallbackToBrowser,
+                InvalidURL,
+                MissingSchema,
+                UnidentifiedImageError,
+            ),
+        ):
+            return True
+        if isinstance(error, HTTPError) and error.response is not None:
+            return error.response.status_code not in RETRY_STATUS_CODES
+        return False
+
+    def is_throttled(self, error: BaseException) -> bool:
+        """True if the server asked to slow down, with a 429 or a Retry-After"""
+        response = getattr(error, "response", None)
+        if response is None:
+            return False
+        if response.status_code == THROTTLE_STATUS_CODE:
+            return True
+        return bool(response.headers.get("Retry-After"))
+
+    def is_host_failure(self, error: BaseException) -> bool:
+        """True if the error says the host is down or overloaded.
+
+        Throttling is not a failure. It is handled by the backoff of the
+        rate limiter and the host gate, and must not open the circuit.
+        """
+        return not self.is_fatal(error) and not self.is_throttled(error)
+
+    def circuit_delay(
+        self,
+        error: CircuitOpenError,
+        waited_for: Optional[float],
+    ) -> Optional[float]:
+        """Seconds to wait for an open circuit, or None to give up.
+
+        A request waits out one opening of the circuit, and the probe of it.
+        If the probe fails and the circuit opens again, the request fails.
+
+        Args:
+        - error: The rejection of the circuit breaker.
+        - waited_for (optional): The `opened_at` of the circuit the request waited for.
+        """
+        if waited_for is not None and waited_for != error.opened_at:
+            return None
+        if error.retry_after > self.max_retry_after:
+            return None
+        return error.retry_after
+
+    def next_delay(
+        self,
+        error: BaseException,
+        attempt: int,
+        retries: Optional[int] = None,
+    ) -> Optional[float]:
+        """Seconds to wait before the next attempt, or None to give up.
+
+        Args:
+        - error: The error of the last attempt.
+        - attempt: Number of attempts made so far, starting from 0.
+        - retries (optional): Overrides the number of retries of this policy.
+        """
+        if retries is None:
+            retries = self.retries
+        if attempt >= retries or self.is_fatal(error):
+            return None
+
+        response = getattr(error, "response", None)
+        if response is not None and response.status_code in RETRY_AFTER_STATUS_CODES:
+            retry_after = parse_retry_after(response.headers.get("Retry-After"))
+            if retry_after is not None:
+                if retry_after > self.max_retry_after:
+                    return None
+                return retry_after
+
+        # exponential backoff with equal jitter
+        delay = min(self.max_backoff, self.backoff * (2**attempt))
+        return delay / 2 + random.uniform(0, delay / 2)
+
+
+class CircuitBreaker:
+    """Fails fast when a host keeps failing.
+
+    After `threshold` consecutive host failures the circuit opens and every
+    request is rejected for `reset_timeout` seconds. Then the circuit is
+    half-open, and a single probe request decides to close or reopen it.
+    The rejections tell how long to wait, so that the requests can wait
+    for the probe instead of failing at once.
+
+    Args:
+    - threshold (int, optional): Consecutive failures to open the circuit. Default: 5.
+    - reset_timeout (float, optional): Seconds to wait before probing again. Default: 30.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half-open"
+
+    def __init__(self, threshold: int = 5, reset_timeout: float = 30) -> None:
+        self.threshold = threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.stats = {
+            "requests": 0,
+            "retries": 0,
+            "failures": 0,
+            "rejected": 0,
+        }
+        self._lock = Lock()
+        self._probing = False
+
+    def before_request(self, hostname: str = "") -> bool:
+        """Raises CircuitOpenError if the request should not be sent.
+        Returns True if the request is the probe of a half-open circuit."""
+        with self._lock:
+            if self.state == self.OPEN:
+                elapsed = time.monotonic() - self.opened_at
+                if elapsed < self.reset_timeout:
+                    self.stats["rejected"] += 1
+                    raise CircuitOpenError(
+                        f"Circuit is open for {hostname}",
+                        retry_after=self.reset_timeout - elapsed,
+                        opened_at=self.opened_at,
+                    )
+                self.state = self.HALF_OPEN
+                self._probing = False
+            if self.state == self.HALF_OPEN:
+                if self._probing:
+                    self.stats["rejected"] += 1
+                    raise CircuitOpenError(
+                        f"Circuit is half-open for {hostname}",
+                        retry_after=HALF_OPEN_POLL_INTERVAL,
+                        opened_at=self.opened_at,
+                    )
+                self._probing = True
+                self.stats["requests"] += 1
+                return True
+            self.stats["requests"] += 1
+            return False
+
+    def release(self, probe: bool) -> None:
+        """Let another request probe, when the probe ended without a result,
+        e.g. it was cancelled"""
+        if not probe:
+            return
+        with self._lock:
+            if self.state == self.HALF_OPEN:
+                self._probing = False
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.failures = 0
+            self._probing = False
+            self.state = self.CLOSED
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.failures += 1
+            self._probing = False
+            self.stats["failures"] += 1
+            if self.state == self.HALF_OPEN or self.failures >= self.threshold:
+                if self.state != self.OPEN:
+                    logger.warning("Too many failures. Circuit opened for a while.")
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+
+    def record_retry(self) -> None:
+        with self._lock:
+            self.stats["retries"] += 1
+
+
+def get_circuit_breaker(hostname: str) -> CircuitBreaker:
+    """Returns the process-wide circuit breaker of a hostname"""
+    with _registry_lock:
+        if hostname not in _host_breakers:
+            _host_breakers[hostname] = CircuitBreaker()
+        return _host_breakers[hostname]
+
+
+def get_retry_stats() -> Dict[str, Dict[str, int]]:
+    """Request, retry and failure counts per hostname"""
+    with _registry_lock:
+        return {host: dict(breaker.stats) for host, breaker in _host_breakers.items()}
@@ -1,30 +1,113 @@
+import asyncio
 import base64
+import copy
+import json
 import logging
 import os
 import random
+import shutil
 import ssl
+import time
+from functools import partial
 from io import BytesIO
-from typing import Any, Dict, Optional, Union
+from tempfile import SpooledTemporaryFile
+from typing import Any, BinaryIO, Dict, Optional, Tuple, Union
 from urllib.parse import ParseResult, urlparse
 
 from bs4 import BeautifulSoup
 from cloudscraper import CloudScraper, User_Agent
-from PIL import Image, UnidentifiedImageError
-from requests import Response, Session
-from requests.exceptions import ProxyError
+from PIL import Image
+from requests import Request, Response, Session
+from requests.cookies import get_cookie_header
+from requests.exceptions import HTTPError, ProxyError
 from requests.structures import CaseInsensitiveDict
 
 from ..assets.user_agents import user_agents
+from ..utils.singleflight import SingleFlight
 from ..utils.ssl_no_verify import no_ssl_verification
-from .exeptions import ScraperErrorGroup
+from .aioengine import get_async_engine
+from .connpool import get_connection_pools
+from .cookiestore import get_cookie_store
+from .exeptions import CircuitOpenError, ScraperErrorGroup
+from .httpcache import VARY_HEADERS, CacheEntry, ResponseCache, get_response_cache
 from .proxy import get_a_proxy, remove_faulty_proxies
+from .retry import RetryPolicy, get_circuit_breaker
 from .soup import SoupMaker
 from .taskman import TaskManager
 
 logger = logging.getLogger(__name__)
 
+STREAM_CHUNK_SIZE = 64 * 1024
+SPOOLED_IMAGE_SIZE = 1024 * 1024  # keep smaller images in memory
+
+IMAGE_SIGNATURES = {
+    b"\xff\xd8\xff": "jpeg",
+    b"\x89PNG\r\n\x1a\n": "png",
+    b"GIF87a": "gif",
+    b"GIF89a": "gif",
+    b"BM": "bmp",
+    b"II*\x00": "tiff",
+    b"MM\x00*": "tiff",
+    b"\x00\x00\x01\x00": "ico",
+}
+
+
+def sniff_image_type(head: bytes) -> Optional[str]:
+    """Guess the image format from the first few bytes of the content"""
+    for signature, name in IMAGE_SIGNATURES.items():
+        if head.startswith(signature):
+            return name
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "webp"
+    if head[4:8] == b"ftyp" and head[8:12] in (b"avif", b"avis", b"heic", b"mif1"):
+        return "avif"
+    return None
+
+
+def copy_response(response: Response) -> Response:
+    """A shallow copy of a consumed response. The content bytes are shared."""
+    clone = copy.copy(response)
+    clone.headers = CaseInsensitiveDict(response.headers)
+    clone.cookies = response.cookies.copy()
+    return clone
+
+
+def content_validators(response: Response) -> Dict[str, str]:
+    """The headers identifying the version of the content of a response"""
+    return {
+        key: response.headers[key]
+        for key in ("ETag", "Last-Modified")
+        if response.headers.get(key)
+    }
+
+
+def if_range_header(validators: Dict[str, str]) -> Optional[str]:
+    """The If-Range value for the validators. A weak ETag can not be used."""
+    etag = validators.get("ETag")
+    if etag and not etag.startswith("W/"):
+        return etag
+    return validators.get("Last-Modified")
+
+
+def is_valid_resume(response: Response, offset: int, validators: Dict[str, str]) -> bool:
+    """Whether a 206 response continues the same content from the offset"""
+    # Content-Range: bytes 100-199/200
+    unit, _, span = response.headers.get("Content-Range", "").partition(" ")
+    first = span.partition("-")[0].strip()
+    if unit.lower() != "bytes" or not first.isdigit() or int(first) != offset:
+        return False
+    current = content_validators(response)
+    return all(current.get(key, value) == value for key, value in validators.items())
+
+
+# concurrent identical GET requests of this process share one response
+_single_flight = SingleFlight()
+
 
 class Scraper(TaskManager, SoupMaker):
+    # Override to change the retry attempts and backoff of the requests
+    retry_policy = RetryPolicy()
+
     # ------------------------------------------------------------------------- #
     # Initializers
     # ------------------------------------------------------------------------- #
@@ -46,6 +129,8 @@ class Scraper(TaskManager, SoupMaker):
         self.home_url = origin
         self.last_soup_url = ""
         self.use_proxy = os.getenv("use_proxy")
+        self.use_cache = not os.getenv("no_cache")
+        self.share_cookies = True
 
         self.init_scraper()
         self.change_user_agent()
@@ -78,6 +163,9 @@ class Scraper(TaskManager, SoupMaker):
         except Exception:
             logger.exception("Failed to initialize cloudscraper")
             self.scraper = session or Session()
+        get_connection_pools().mount(self.scraper)
+        self._cookie_hosts = set()
+        self.__load_cookies(self.origin.hostname)
 
     # ------------------------------------------------------------------------- #
     # Internal methods
@@ -88,14 +176,24 @@ class Scraper(TaskManager, SoupMaker):
             return {scheme: get_a_proxy(scheme, timeout)}
         return {}
 
-    def __process_request(self, method: str, url, **kwargs):
-        method_call = getattr(self.scraper, method)
-        assert callable(method_call), f"No request method: {method}"
+    def __load_cookies(self, hostname: Optional[str]) -> None:
+        """Load the saved cookies of a host once per session"""
+        if self.share_cookies and hostname and hostname not in self._cookie_hosts:
+            self._cookie_hosts.add(hostname)
+            get_cookie_store().load(hostname, self.scraper.cookies)
 
+    def __save_cookies(self, hostname: Optional[str]) -> None:
+        if self.share_cookies:
+            get_cookie_store().save(hostname, self.scraper.cookies)
+
+    def __prepare_request(
+        self, url, kwargs
+    ) -> Tuple[ParseResult, Optional[int], dict]:
         _parsed = urlparse(url)
+        self.__load_cookies(_parsed.hostname)
 
         kwargs = kwargs or dict()
-        retry = kwargs.pop("retry", 1)
+        retry = kwargs.pop("retry", None)
         kwargs.setdefault("allow_redirects", True)
         kwargs["proxies"] = self.__get_proxies(_parsed.scheme)
         headers = kwargs.pop("headers", {})
@@ -104,38 +202,262 @@ class Scraper(TaskManager, SoupMaker):
         headers.setdefault("Origin", self.home_url.strip("/"))
         headers.setdefault("Referer", self.last_soup_url or self.home_url)
         headers.setdefault("User-Agent", self.user_agent)
+        kwargs["headers"] = headers
+        return _parsed, retry, kwargs
+
+    def __cache_headers(self, url, headers) -> CaseInsensitiveDict:
+        """The request headers with the cookies the session will send, to key the cache"""
+        cache_headers = CaseInsensitiveDict(headers)
+        if "Cookie" not in cache_headers:
+            cookie = get_cookie_header(self.scraper.cookies, Request("GET", url))
+            if cookie:
+                cache_headers["Cookie"] = cookie
+        return cache_headers
+
+    def __lookup_cache(
+        self, method: str, url, parsed: ParseResult, kwargs: dict, use_cache: bool
+    ) -> Tuple[Optional[ResponseCache], Optional[CacheEntry], Dict[str, str]]:
+        """Returns the cache, the cached entry and the headers to key the cache with"""
+        if method != "get" or not use_cache:
+            return None, None, {}
+        cache = get_response_cache()
+        cache_headers = dict(self.__cache_headers(url, kwargs["headers"]))
+        entry = cache.lookup(method, url, cache_headers, parsed.hostname)
+        if entry and not entry.is_fresh:
+            kwargs["headers"].update(entry.conditional_headers())
+        return cache, entry, cache_headers
+
+    def __handle_failure(
+        self, error, attempt: int, retry, breaker, kwargs, parsed, proxy_timeout=0
+    ):
+        """Returns the seconds to wait before retrying, or raises the error"""
+        if self.retry_policy.is_host_failure(error):
+            breaker.record_failure()
+        else:
+            breaker.record_success()
+
+        delay = self.retry_policy.next_delay(error, attempt, retry)
+        if delay is None:  # retry attempt depleted
+            raise error
+
+        breaker.record_retry()
+        logger.debug(
+            f"{type(error).__qualname__}: {error} | Retrying after {delay:.2f}s..."
+        )
+
+        if isinstance(error, ProxyError):
+            for proxy_url in kwargs.get("proxies", {}).values():
+                remove_faulty_proxies(proxy_url)
+            kwargs["proxies"] = self.__get_proxies(parsed.scheme, proxy_timeout)
+        return delay
+
+    def __circuit_delay(self, error: CircuitOpenError, waited_for) -> float:
+        """Returns the seconds to wait for an open circuit, or raises the error"""
+        delay = self.retry_policy.circuit_delay(error, waited_for)
+        if delay is None:
+            raise error
+        logger.debug(f"{error} | Waiting {delay:.2f}s for the circuit...")
+        return delay
+
+    def __flight_key(self, method: str, url, headers, kwargs: dict) -> Optional[tuple]:
+        """Key to coalesce the request with identical ones, or None if it can not be shared"""
+        if method != "get" or kwargs.get("stream"):
+            return None
+        if any(kwargs.get(k) for k in ["params", "data", "json", "files", "cookies", "auth"]):
+            return None
+        self.__load_cookies(urlparse(url).hostname)
+        merged = CaseInsensitiveDict(self.scraper.headers)
+        merged.update(headers or {})
+        merged = self.__cache_headers(url, merged)
+        vary = tuple([str(merged.get(k) or "") for k in VARY_HEADERS])
+        # responses of a private session (e.g. logged in) are not shared with others
+        scope = None if self.use_cache else id(self)
+        return (method, url, vary, kwargs.get("allow_redirects", True), scope)
+
+    def __process_request(self, method: str, url, **kwargs):
+        use_cache = kwargs.pop("cache", self.use_cache)
+        key = self.__flight_key(method, url, kwargs.get("headers"), kwargs)
+        send = partial(self.__send_request, method, url, use_cache, **kwargs)
+        if key is None:
+            return send()
+        return _single_flight.do(key, send, follow=copy_response)
+
+    async def __process_request_async(self, method: str, url, **kwargs):
+        use_cache = kwargs.pop("cache", self.use_cache)
+        key = self.__flight_key(method, url, kwargs.get("headers"), kwargs)
+        send = partial(self.__send_request_async, method, url, use_cache, **kwargs)
+        if key is None:
+            return await send()
+        return await _single_flight.do_async(key, send, follow=copy_response)
+
+    def __send_request(self, method: str, url, use_cache: bool, **kwargs):
+        method_call = getattr(self.scraper, method)
+        assert callable(method_call), f"No request method: {method}"
+
+        _parsed, retry, kwargs = self.__prepare_request(url, kwargs)
+        cache, entry, cache_headers = self.__lookup_cache(
+            method, url, _parsed, kwargs, use_cache
+        )
+        if cache and entry and entry.is_fresh:
+            response = cache.to_response(entry)
+            if response:
+                return response
+            entry = None  # evicted after the lookup
+
         kwargs["headers"] = {
             str(k).encode("utf-8"): str(v).encode("utf-8")
-            for k, v in headers.items()
+            for k, v in kwargs["headers"].items()
             if v
         }
 
-        while retry >= 0:
+        get_connection_pools().reserve(
+            _parsed.hostname, self, self.workers, self.max_domain_window
+        )
+
+        attempt = 0
+        waited_for = None
+        breaker = get_circuit_breaker(_parsed.hostname)
+        while True:
+            try:
+                probe = breaker.before_request(_parsed.hostname)
+            except CircuitOpenError as e:
+                time.sleep(self.__circuit_delay(e, waited_for))
+                waited_for = e.opened_at
+                continue
             try:
                 logger.debug(
                     f"[{method.upper()}] {url}\n"
                     + ", ".join([f"{k}={v}" for k, v in kwargs.items()])
                 )
 
+                limiter = self.host_limiter(_parsed.hostname)
+                if limiter:
+                    limiter.acquire()
+
                 with self.domain_gate(_parsed.hostname):
                     with no_ssl_verification():
                         response: Response = method_call(url, **kwargs)
-                        response.raise_for_status()
+                        if not (entry and response.status_code == 304):
+                            response.raise_for_status()
                         response.encoding = "utf8"
-
-                self.cookies.update({x.name: x.value for x in response.cookies})
-                return response
             except ScraperErrorGroup as e:
-                if retry == 0:  # retry attempt depleted
-                    raise e
+                delay = self.__handle_failure(
+                    e, attempt, retry, breaker, kwargs, _parsed, proxy_timeout=5
+                )
+                attempt += 1
+                time.sleep(delay)
+                continue
+            except BaseException:
+                breaker.release(probe)
+                raise
+
+            breaker.record_success()
+            self.__save_cookies(_parsed.hostname)
+            if cache and entry and response.status_code == 304:
+                revalidated = cache.revalidated(entry)
+                if revalidated:
+                    return revalidated
+                # The cached content was evicted meanwhile. Ask for all of it.
+                for name in entry.conditional_headers():
+                    kwargs["headers"].pop(name.encode("utf-8"), None)
+                entry = None
+                continue
+
+            if cache:
+                cache.store(method, url, cache_headers, response, _parsed.hostname)
+            return response
+
+    async def __send_request_async(self, method: str, url, use_cache: bool, **kwargs):
+        engine = get_async_engine()
+        # The fallback runs on the default executor of the event loop, because
+        # the workers of self.executor may be blocked waiting for this request.
+        fallback = partial(self.__send_request, method, url, use_cache, **kwargs)
+        if not engine.has_http_client:
+            return await engine.run_sync(None, fallback)
+
+        kwargs = dict(kwargs)
+        _parsed, retry, kwargs = self.__prepare_request(url, kwargs)
+        cache, entry, cache_headers = self.__lookup_cache(
+            method, url, _parsed, kwargs, use_cache
+        )
+        if cache and entry and entry.is_fresh:
+            response = cache.to_response(entry)
+            if response:
+                return response
+            entry = None  # evicted after the lookup
 
-                retry -= 1
-                logger.debug(f"{type(e).__qualname__}: {e} | Retrying...", e)
+        headers = CaseInsensitiveDict(self.scraper.headers)
+        headers.update(kwargs["headers"])
+        kwargs["headers"] = {str(k): str(v) for k, v in headers.items() if v}
+        kwargs["cookies"] = self.cookies
 
-                if isinstance(e, ProxyError):
-                    for proxy_url in kwargs.get("proxies", {}).values():
-                        remove_faulty_proxies(proxy_url)
-                    kwargs["proxies"] = self.__get_proxies(_parsed.scheme, 5)
+        attempt = 0
+        waited_for = None
+        breaker = get_circuit_breaker(_parsed.hostname)
+        while True:
+            try:
+                probe = breaker.before_request(_parsed.hostname)
+            except CircuitOpenError as e:
+                await asyncio.sleep(self.__circuit_delay(e, waited_for))
+                waited_for = e.opened_at
+                continue
+            try:
+                logger.debug(
+                    f"[{method.upper()}] {url} (async)\n"
+                    + ", ".join([f"{k}={v}" for k, v in kwargs.items()])
+                )
+
+                limiter = self.host_limiter(_parsed.hostname)
+                if limiter:
+                    await limiter.acquire_async()
+
+                async with self.domain_gate(_parsed.hostname):
+                    response = await engine.request(method, url, **kwargs)
+                    if not (entry and response.status_code == 304):
+                        response.raise_for_status()
+            except HTTPError as e:
+                # Cloudflare challenges can only be solved by the cloudscraper
+                server = ""
+                if e.response is not None:
+                    server = e.response.headers.get("Server", "")
+                if "cloudflare" in server.lower():
+                    breaker.record_success()
+                    logger.debug("Cloudflare detected. Falling back to cloudscraper.")
+                    return await engine.run_sync(None, fallback)
+                delay = self.__handle_failure(
+                    e, attempt, retry, breaker, kwargs, _parsed
+                )
+                attempt += 1
+                await asyncio.sleep(delay)
+                continue
+            except ScraperErrorGroup as e:
+                delay = self.__handle_failure(
+                    e, attempt, retry, breaker, kwargs, _parsed
+                )
+                attempt += 1
+                await asyncio.sleep(delay)
+                continue
+            except BaseException:
+                breaker.release(probe)
+                raise
+
+            for name, value in response.cookies.items():
+                self.set_cookie(name, value)
+            breaker.record_success()
+            self.__save_cookies(_parsed.hostname)
+            if cache and entry and response.status_code == 304:
+                revalidated = cache.revalidated(entry)
+                if revalidated:
+                    return revalidated
+                # The cached content was evicted meanwhile. Ask for all of it.
+                for name in entry.conditional_headers():
+                    kwargs["headers"].pop(name, None)
+                entry = None
+                continue
+
+            if cache:
+                cache.store(method, url, cache_headers, response, _parsed.hostname)
+            return response
 
     # ------------------------------------------------------------------------- #
     # Helpers
@@ -196,7 +518,9 @@ class Scraper(TaskManager, SoupMaker):
     # Downloaders
     # ------------------------------------------------------------------------- #
 
-    def get_response(self, url, retry=1, timeout=(7, 301), **kwargs) -> Response:
+    def get_response(
+        self, url, retry=None, timeout=(7, 301), **kwargs
+    ) -> Response:
         """Fetch the content and return the response"""
         return self.__process_request(
             "get",
@@ -206,7 +530,19 @@ class Scraper(TaskManager, SoupMaker):
             **kwargs,
         )
 
-    def post_response(self, url, data={}, retry=1, **kwargs) -> Response:
+    async def async_get_response(
+        self, url, retry=None, timeout=(7, 301), **kwargs
+    ) -> Response:
+        """Fetch the content with the async engine and return the response"""
+        return await self.__process_request_async(
+            "get",
+            url,
+            retry=retry,
+            timeout=timeout,
+            **kwargs,
+        )
+
+    def post_response(self, url, data={}, retry=None, **kwargs) -> Response:
         """Make a POST request and return the response"""
         return self.__process_request(
             "post",
@@ -231,11 +567,172 @@ class Scraper(TaskManager, SoupMaker):
         )
         return self.post_response(url, data=data, headers=headers, **kwargs)
 
+    def __stream_to_file(
+        self,
+        url: str,
+        fp: BinaryIO,
+        headers={},
+        validators: Optional[Dict[str, str]] = None,
+        **kwargs,
+    ) -> str:
+        """Stream the content of the url to a binary file from its current position.
+        If the connection breaks midway, it resumes with a Range request.
+
+        The ETag and Last-Modified of the content are kept in the validators,
+        and a resumed request is accepted only if they did not change.
+        Otherwise the file is downloaded again from the start.
+
+        Identical downloads running at the same time wait for the first one,
+        and then copy the content from the response cache.
+
+        Returns:
+            The content type of the response.
+        """
+        if validators is None:
+            validators = {}
+        download = partial(self.__download_stream, url, fp, headers, validators, **kwargs)
+        use_cache = kwargs.get("cache", self.use_cache)
+        if not use_cache or fp.tell() > 0:
+            return download()
+        key = self.__flight_key("get", url, headers, kwargs)
+        if key is None:
+            return download()
+        return _single_flight.do(("stream",) + key, download, follow=lambda _: download())
+
+    def __download_stream(
+        self,
+        url: str,
+        fp: BinaryIO,
+        headers: Dict[str, str],
+        validators: Dict[str, str],
+        **kwargs,
+    ) -> str:
+        kwargs = dict(kwargs)
+        retry = kwargs.pop("retry", None)
+        use_cache = kwargs.pop("cache", self.use_cache)
+        headers = CaseInsensitiveDict(headers)
+        hostname = urlparse(url).hostname
+        start = offset = fp.tell()
+
+        cache = get_response_cache() if use_cache and start == 0 else None
+        cache_headers: Dict[str, str] = {}
+        entry = None
+        if cache:
+            self.__load_cookies(hostname)
+            cache_headers = dict(self.__cache_headers(url, headers))
+            entry = cache.lookup("get", url, cache_headers, hostname)
+        if cache and entry and entry.is_fresh:
+            body = cache.open_body(entry)
+            if body:
+                with body:
+                    shutil.copyfileobj(body, fp, STREAM_CHUNK_SIZE)
+                return str(entry.headers.get("Content-Type", ""))
+            entry = None  # evicted after the lookup
+
+        attempt = 0
+        is_encoded = False
+        while True:
+            request_headers = CaseInsensitiveDict(headers)
+            if offset > 0:
+                request_headers["Range"] = f"bytes={offset}-"
+                if_range = if_range_header(validators)
+                if if_range:
+                    request_headers["If-Range"] = if_range
+            elif entry:
+                request_headers.update(entry.conditional_headers())
+
+            response = self.__process_request(
+                "get",
+                url,
+                headers=request_headers,
+                stream=True,
+                cache=False,
+                retry=retry,
+                **kwargs,
+            )
+            try:
+                if cache and entry and response.status_code == 304:
+                    cache.refresh(entry)
+                    body = cache.open_body(entry)
+                    if body is None:
+                        # The cached content was evicted meanwhile. Ask for all of it.
+                        entry = None
+                        continue
+                    with body:
+                        shutil.copyfileobj(body, fp, STREAM_CHUNK_SIZE)
+                    return str(entry.headers.get("Content-Type", ""))
+
+                # Range offsets are not valid for the decoded content
+                encoding = response.headers.get("Content-Encoding", "identity")
+                is_encoded = encoding.lower() != "identity"
+                if offset > 0 and response.status_code == 206 and (
+                    is_encoded or not is_valid_resume(response, offset, validators)
+                ):
+                    # The content has changed. Request all of it again.
+                    fp.seek(0)
+                    fp.truncate()
+                    start = offset = 0
+                    validators.clear()
+                    continue
+                if offset > 0 and response.status_code != 206:
+                    # Range is not supported by the server. Start over.
+                    fp.seek(0)
+                    fp.truncate()
+                    start = offset = 0
+                if offset == 0:
+                    validators.clear()
+                    validators.update(content_validators(response))
+
+                for chunk in response.iter_content(STREAM_CHUNK_SIZE):
+                    fp.write(chunk)
+                    offset += len(chunk)
+                break
+            except ScraperErrorGroup as e:
+                delay = self.retry_policy.next_delay(e, attempt, retry)
+                if delay is None:
+                    raise e
+                attempt += 1
+                logger.debug(f"{type(e).__qualname__}: {e} | Resuming from {offset}")
+                if is_encoded:
+                    fp.seek(0)
+                    fp.truncate()
+                    start = offset = 0
+                time.sleep(delay)
+            finally:
+                response.close()
+
+        if cache and start == 0:
+            response.status_code = 200
+            cache.store_file("get", url, cache_headers, response, fp, hostname)
+            fp.seek(offset)
+        return str(response.headers.get("Content-Type", ""))
+
     def download_file(self, url: str, output_file: str, **kwargs) -> None:
-        """Download content of the url to a file"""
-        response = self.__process_request("get", url, **kwargs)
-        with open(output_file, "wb") as f:
-            f.write(response.content)
+        """Download content of the url to a file.
+        A partially downloaded file is resumed on the next call."""
+        part_file = output_file + ".part"
+        meta_file = part_file + ".json"
+        validators: Dict[str, str] = {}
+        with open(part_file, "a+b") as f:
+            if f.tell() > 0:
+                try:
+                    with open(meta_file, "r", encoding="utf-8") as mf:
+                        validators = dict(json.load(mf))
+                except (OSError, ValueError, TypeError):
+                    pass
+                if not validators:
+                    # The version of the partial content is not known
+                    f.seek(0)
+                    f.truncate()
+            try:
+                self.__stream_to_file(url, f, validators=validators, **kwargs)
+            finally:
+                if validators and f.tell() > 0:
+                    with open(meta_file, "w", encoding="utf-8") as mf:
+                        json.dump(validators, mf)
+        os.replace(part_file, output_file)
+        if os.path.exists(meta_file):
+            os.remove(meta_file)
 
     def download_image(self, url: str, headers={}, **kwargs) -> Image:
         """Download image from url"""
@@ -247,19 +744,24 @@ class Scraper(TaskManager, SoupMaker):
         headers.setdefault("Origin", None)
         headers.setdefault("Referer", None)
 
-        try:
-            response = self.__process_request("get", url, headers=headers, **kwargs)
-            content = response.content
-            return Image.open(BytesIO(content))
-
-        except UnidentifiedImageError:
-            headers.setdefault(
-                "Accept",
-                "image/avif,image/webp,image/apng,image/svg+xml,image/*,*/*;q=0.9",
+        fp = SpooledTemporaryFile(max_size=SPOOLED_IMAGE_SIZE)
+        content_type = self.__stream_to_file(url, fp, headers=headers, **kwargs)
+        fp.seek(0)
+        is_image = sniff_image_type(fp.read(32)) or content_type.startswith("image/")
+        fp.seek(0)
+
+        if not is_image and "Accept" not in headers:
+            # Most probably an html page. Ask for the image explicitly.
+            fp.close()
+            headers["Accept"] = (
+                "image/avif,image/webp,image/apng,image/svg+xml,image/*,*/*;q=0.9"
             )
-            response = self.__process_request("get", url, headers=headers, **kwargs)
-            content = response.content
-            return Image.open(BytesIO(content))
+            fp = SpooledTemporaryFile(max_size=SPOOLED_IMAGE_SIZE)
+            self.__stream_to_file(url, fp, headers=headers, **kwargs)
+            fp.seek(0)
+
+        # The image keeps a reference to the file. It will be removed with the image.
+        return Image.open(fp)
 
     def get_json(self, url, headers={}, **kwargs) -> Any:
         """Fetch the content and return the content as JSON object"""
@@ -271,6 +773,16 @@ class Scraper(TaskManager, SoupMaker):
         response = self.get_response(url, headers=headers, **kwargs)
         return response.json()
 
+    async def async_get_json(self, url, headers={}, **kwargs) -> Any:
+        """Fetch the content with the async engine and return it as JSON object"""
+        headers = CaseInsensitiveDict(headers)
+        headers.setdefault(
+            "Accept",
+            "application/json,text/plain,*/*",
+        )
+        response = await self.async_get_response(url, headers=headers, **kwargs)
+        return response.json()
+
     def post_json(self, url, data={}, headers={}, **kwargs) -> Any:
         """Make a POST request and return the content as JSON object"""
         headers = CaseInsensitiveDict(headers)
@@ -307,6 +819,19 @@ class Scraper(TaskManager, SoupMaker):
         self.last_soup_url = url
         return self.make_soup(response, encoding)
 
+    async def async_get_soup(
+        self, url, headers={}, encoding=None, **kwargs
+    ) -> BeautifulSoup:
+        """Fetch the content with the async engine and return a BeautifulSoup instance of the page"""
+        headers = CaseInsensitiveDict(headers)
+        headers.setdefault(
+            "Accept",
+            "text/html,application/xhtml+xml,application/xml;q=0.9",
+        )
+        response = await self.async_get_response(url, headers=headers, **kwargs)
+        self.last_soup_url = url
+        return self.make_soup(response, encoding)
+
     def post_soup(
         self, url, data={}, headers={}, encoding=None, **kwargs
     ) -> BeautifulSoup:
@@ -0,0 +1,147 @@
+"""
+Precompiled code of the source files, kept in a single file
+"""
+import hashlib
+import logging
+import marshal
+import mmap
+import os
+import struct
+import sys
+from importlib.util import MAGIC_NUMBER
+from pathlib import Path
+from threading import Lock
+from types import CodeType
+from typing import Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+BUNDLE_MAGIC = b"LNCB" + MAGIC_NUMBER
+HEADER = struct.Struct("<8sQ")  # magic, size of the table of contents
+
+
+def file_digest(file_path: Path) -> str:
+    with open(file_path, "rb") as fp:
+        return hashlib.md5(fp.read()).hexdigest()
+
+
+class SourceBundle:
+    """The compiled code of the source files, by the md5 of their content.
+
+    The file starts with a table of contents mapping each md5 to the offset
+    and size of the marshalled code. The file is memory mapped, so loading
+    one crawler reads and unmarshals only the code of its own file.
+    The python version is in the file name and the header, as the code of
+    one version can not be used by another.
+
+    Args:
+    - bundle_file (Path): The file to keep the code in.
+    """
+
+    def __init__(self, bundle_file: Path) -> None:
+        self.bundle_file = bundle_file
+        self._lock = Lock()
+        self._mmap: Optional[mmap.mmap] = None
+        self._toc: Optional[Dict[str, Tuple[int, int]]] = None
+
+    def _open(self) -> Dict[str, Tuple[int, int]]:
+        if self._toc is not None:
+            return self._toc
+        self._toc = {}
+        try:
+            with open(self.bundle_file, "rb") as fp:
+                data = mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ)
+            magic, toc_size = HEADER.unpack_from(data, 0)
+            if magic != BUNDLE_MAGIC:
+                data.close()
+                return self._toc
+            start = HEADER.size + toc_size
+            self._toc = {
+                digest: (start + offset, size)
+                for digest, (offset, size) in marshal.loads(data[HEADER.size:start]).items()
+            }
+            self._mmap = data
+        except (OSError, ValueError, EOFError, TypeError, struct.error) as e:
+            logger.debug("Could not open source bundle %s. Error: %s", self.bundle_file, e)
+        return self._toc
+
+    def close(self) -> None:
+        with self._lock:
+            if self._mmap is not None:
+                self._mmap.close()
+                self._mmap = None
+            self._toc = None
+
+    def __contains__(self, digest: str) -> bool:
+        with self._lock:
+            return digest in self._open()
+
+    def get(self, digest: str) -> Optional[CodeType]:
+        """The code of the source file with the md5, if it was bundled"""
+        with self._lock:
+            entry = self._open().get(digest)
+            if not entry or self._mmap is None:
+                return None
+            offset, size = entry
+            try:
+                return marshal.loads(self._mmap[offset:offset + size])
+            except (ValueError, EOFError, TypeError) as e:
+                logger.debug("Invalid code in source bundle: %s. Error: %s", digest, e)
+                return None
+
+    def update(self, files: Dict[str, Path]) -> None:
+        """Keep the code of the given files only, compiling the new ones.
+
+        Args:
+        - files (Dict[str, Path]): The source files by their md5.
+        """
+        with self._lock:
+            toc = self._open()
+            if set(toc.keys()) == set(files.keys()):
+                return
+
+            blobs: Dict[str, bytes] = {}
+            for digest, file_path in files.items():
+                entry = toc.get(digest)
+                if entry and self._mmap is not None:
+                    offset, size = entry
+                    blobs[digest] = self._mmap[offset:offset + size]
+                    continue
+                try:
+                    with open(file_path, "rb") as fp:
+                        code = compile(fp.read(), str(file_path), "exec", dont_inherit=True)
+                    blobs[digest] = marshal.dumps(code)
+                except Exception as e:
+                    logger.debug("Could not compile %s. Error: %s", file_path, e)
+
+            new_toc: Dict[str, Tuple[int, int]] = {}
+            offset = 0
+            for digest, blob in blobs.items():
+                new_toc[digest] = (offset, len(blob))
+                offset += len(blob)
+            toc_data = marshal.dumps(new_toc)
+
+            # the file can not be replaced while it is mapped on windows
+            if self._mmap is not None:
+                self._mmap.close()
+                self._mmap = None
+            self._toc = None
+
+            self.bundle_file.parent.mkdir(parents=True, exist_ok=True)
+            temp_file = self.bundle_file.with_name(f".{self.bundle_file.name}.{os.getpid()}")
+            try:
+                with open(temp_file, "wb") as fp:
+                    fp.write(HEADER.pack(BUNDLE_MAGIC, len(toc_data)))
+                    fp.write(toc_data)
+                    for blob in blobs.values():
+                        fp.write(blob)
+                os.replace(temp_file, self.bundle_file)
+                logger.debug("Source bundle saved with %d files", len(blobs))
+            except OSError as e:
+                logger.warning("Could not save source bundle. Error: %s", e)
+                if temp_file.exists():
+                    temp_file.unlink()
+
+
+def bundle_file_in(folder: Path) -> Path:
+    return folder / f"_bundle.{sys.implementation.cache_tag}.bin"
@@ -5,9 +5,11 @@ import logging
 import os
 import re
 import time
+from collections.abc import MutableMapping
 from concurrent.futures import Future
 from pathlib import Path
-from typing import Dict, List, Optional, Set, Type
+from threading import RLock, Thread
+from typing import Callable, Dict, Iterator, List, Optional, Set, Tuple, Type
 from urllib.parse import urlparse
 
 import requests
@@ -20,6 +22,7 @@ from .arguments import get_args
 from .crawler import Crawler
 from .display import new_version_news
 from .exeptions import LNException
+from .sourcebundle import SourceBundle, bundle_file_in, file_digest
 from .taskman import TaskManager
 
 logger = logging.getLogger(__name__)
@@ -28,13 +31,98 @@ logger = logging.getLogger(__name__)
 
 __all__ = [
     "load_sources",
+    "load_all_crawlers",
+    "get_searchable_links",
     "crawler_list",
     "rejected_sources",
 ]
 
+
+class CrawlerList(MutableMapping):
+    """Maps the base urls to the crawlers.
+
+    The crawlers listed in the sources index are not imported until they are
+    looked up. Checking whether a url is supported, or listing the urls,
+    does not import any of them.
+    """
+
+    def __init__(self) -> None:
+        # reentrant, as importing a file adds its crawlers
+        self._lock = RLock()
+        self._loaded: Dict[str, Type[Crawler]] = {}
+        self._indexed: Dict[str, Path] = {}
+        self._can_search: Set[str] = set()
+        self.load_file: Optional[Callable[[Path], None]] = None
+
+    def add_indexed(
+        self, url: str, file_path: Path, can_search: bool, replace_loaded: bool = True
+    ) -> None:
+        """Add a crawler of the index, to import from the file when needed.
+        An imported crawler is kept, unless `replace_loaded` is set."""
+        with self._lock:
+            if url in self._loaded:
+                if not replace_loaded:
+                    return
+                del self._loaded[url]
+            self._indexed[url] = file_path
+            if can_search:
+                self._can_search.add(url)
+            else:
+                self._can_search.discard(url)
+
+    def can_search(self, url: str) -> bool:
+        crawler = self._loaded.get(url)
+        if crawler:
+            return crawler.search_novel != Crawler.search_novel
+        return url in self._indexed and url in self._can_search
+
+    def load_all(self) -> None:
+        for url in list(self._indexed.keys()):
+            self.get(url)
+
+    def __getitem__(self, url: str) -> Type[Crawler]:
+        if url not in self._loaded and url in self._indexed:
+            with self._lock:
+                # another thread may have imported it meanwhile
+                file_path = self._indexed.get(url)
+                if url not in self._loaded and file_path:
+                    if self.load_file:
+                        self.load_file(file_path)
+                    if self._indexed.get(url) == file_path:
+                        # the file has no such crawler, or failed to import
+                        del self._indexed[url]
+        return self._loaded[url]
+
+    def __setitem__(self, url: str, crawler: Type[Crawler]) -> None:
+        with self._lock:
+            self._indexed.pop(url, None)
+            self._loaded[url] = crawler
+
+    def __delitem__(self, url: str) -> None:
+        with self._lock:
+            if url not in self._loaded and url not in self._indexed:
+                raise KeyError(url)
+            self._loaded.pop(url, None)
+            self._indexed.pop(url, None)
+
+    def __contains__(self, url: object) -> bool:
+        return url in self._loaded or url in self._indexed
+
+    def __iter__(self) -> Iterator[str]:
+        with self._lock:
+            loaded = list(self._loaded.keys())
+            indexed = [url for url in self._indexed.keys() if url not in self._loaded]
+        yield from loaded
+        yield from indexed
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._loaded) + sum(1 for url in self._indexed if url not in self._loaded)
+
+
 rejected_sources = {}
 template_list: Set[Type[Crawler]] = set()
-crawler_list: Dict[str, Type[Crawler]] = {}
+crawler_list = CrawlerList()
 
 # --------------------------------------------------------------------------- #
 # Utilities
@@ -43,7 +131,7 @@ crawler_list: Dict[str, Type[Crawler]] = {}
 __executor = TaskManager()
 
 
-def __download_data(url: str):
+def __request(url: str, headers: Optional[Dict[str, str]] = None) -> requests.Response:
     logger.debug("Downloading %s", url)
 
     if Platform.windows:
@@ -69,11 +157,16 @@ def __download_data(url: str):
         headers={
             "referer": referer,
             "user-agent": user_agent,
+            **(headers or {}),
         },
     )
 
     res.raise_for_status()
-    return res.content
+    return res
+
+
+def __download_data(url: str):
+    return __request(url).content
 
 
 # --------------------------------------------------------------------------- #
@@ -89,7 +182,8 @@ if not (__local_data_path / "sources").is_dir():
     __local_data_path = __local_data_path.parent
 
 __current_index = {}
-__latest_index = {}
+__bundle = SourceBundle(bundle_file_in(__user_data_path / "sources"))
+__update_thread: Optional[Thread] = None
 
 
 def __load_current_index():
@@ -108,55 +202,46 @@ def __load_current_index():
         logger.debug("Could not load sources index. Error: %s", e)
 
 
-def __save_current_index():
+def __save_index(index: dict):
+    """Write the whole index at once, so that it is never read half written"""
     index_file = __user_data_path / "sources" / "_index.json"
     index_file.parent.mkdir(parents=True, exist_ok=True)
+    temp_file = index_file.with_name(f".{index_file.name}.{os.getpid()}")
 
     logger.debug("Saving current index data to %s", index_file)
-    with open(index_file, "w", encoding="utf8") as fp:
-        json.dump(__current_index, fp, ensure_ascii=False)
-
-
-def __load_latest_index():
-    global __latest_index
-    global __current_index
+    with open(temp_file, "w", encoding="utf8") as fp:
+        json.dump(index, fp, ensure_ascii=False)
+    os.replace(temp_file, index_file)
+
+
+def __fetch_latest_index(current: dict) -> Optional[dict]:
+    """The latest index. None if it was not changed since the current one."""
+    headers = {}
+    if current.get("etag"):
+        headers["if-none-match"] = current["etag"]
+    if current.get("last_modified"):
+        headers["if-modified-since"] = current["last_modified"]
+
+    res = __request(__master_index_file_url, headers)
+    if res.status_code == 304:
+        logger.debug("Sources index is not changed")
+        return None
 
-    last_download = __current_index.get("v", 0)
-    if time.time() - last_download < __index_fetch_internval_in_seconds:
-        logger.debug("Current index was already downloaded once")
-        __latest_index = __current_index
-        return
-
-    try:
-        data = __download_data(__master_index_file_url)
-        __latest_index = json.loads(data.decode("utf8"))
-        if "crawlers" not in __current_index:
-            __current_index = __latest_index
-        __current_index["v"] = int(time.time())
-        __save_current_index()
-    except Exception as e:
-        if "crawlers" not in __current_index:
-            raise LNException("Could not fetch sources index")
-        logger.warning("Could not download latest index. Error: %s", e)
-        __latest_index = __current_index
+    latest = json.loads(res.content.decode("utf8"))
+    latest["etag"] = res.headers.get("etag")
+    latest["last_modified"] = res.headers.get("last-modified")
+    return latest
 
 
 def __check_updates():
-    __load_current_index()
-    __load_latest_index()
-
-    latest_app_version = __latest_index["app"]["version"]
-    if version.parse(latest_app_version) > version.parse(get_version()):
+    app = __current_index.get("app") or {}
+    latest_app_version = app.get("version")
+    if latest_app_version and version.parse(latest_app_version) > version.parse(get_version()):
         new_version_news(latest_app_version)
 
-    global __current_index
-    __current_index["app"] = __latest_index["app"]
-    __current_index["supported"] = __latest_index["supported"]
-    __current_index["rejected"] = __latest_index["rejected"]
-    __save_current_index()
-
-    global rejected_sources
-    rejected_sources = __current_index["rejected"]
+    # updated in place, as other modules hold the reference
+    rejected_sources.clear()
+    rejected_sources.update(__current_index.get("rejected") or {})
 
 
 # --------------------------------------------------------------------------- #
@@ -164,66 +249,123 @@ def __check_updates():
 # --------------------------------------------------------------------------- #
 
 
-def __save_source_data(source_id, data):
-    latest = __latest_index["crawlers"][source_id]
-    dst_file = __user_data_path / str(latest["file_path"])
+def __find_source_file(info: dict) -> Optional[Path]:
+    """The file of an index entry, if it has the same content"""
+    for root in [__user_data_path, __local_data_path]:
+        source_file = root / str(info["file_path"])
+        if source_file.is_file() and file_digest(source_file) == info["md5"]:
+            return source_file
+    return None
+
+
+def __save_source_data(info: dict, data: bytes):
+    if hashlib.md5(data).hexdigest() != info["md5"]:
+        raise LNException(f"Checksum mismatch: {info['file_path']}")
+
+    dst_file = __user_data_path / str(info["file_path"])
     dst_dir = dst_file.parent
-    temp_file = dst_dir / ("." + dst_file.name)
+    temp_file = dst_dir / (f".{dst_file.name}.{os.getpid()}")
 
     dst_dir.mkdir(parents=True, exist_ok=True)
     with open(temp_file, "wb") as fp:
         fp.write(data)
-
-    if dst_file.exists():
-        dst_file.unlink()
-    temp_file.rename(dst_file)
-
-    global __current_index
-    __current_index["crawlers"][source_id] = latest
-    __save_current_index()
+    os.replace(temp_file, dst_file)
 
     logger.debug("Source update downloaded: %s", dst_file.name)
 
 
-# def __get_file_md5(file: Path):
-#     if not file.is_file():
-#         return None
-#     with open(file, "rb") as f:
-#         return hashlib.md5(f.read()).hexdigest()
-
-
-def __download_sources():
-    tbd_sids = []
-    for sid in __current_index["crawlers"].keys():
-        if sid not in __latest_index["crawlers"]:
-            tbd_sids.append(sid)
-    for sid in tbd_sids:
-        del __current_index["crawlers"][sid]
+def __sync_sources(latest: dict, current: dict, show_progress: bool) -> Tuple[dict, List[dict]]:
+    """Download the source files whose content differs from the latest index.
 
+    Returns:
+        The index of the source files after the download, and the entries
+        of the downloaded ones.
+    """
+    crawlers: Dict[str, dict] = {}
     futures: Dict[str, Future] = {}
-    for sid, latest in __latest_index["crawlers"].items():
-        current = __current_index["crawlers"].get(sid)
-        has_new_version = not current or current["version"] < latest["version"]
-        __current_index["crawlers"][sid] = latest
-        user_file = (__user_data_path / str(latest["file_path"])).is_file()
-        local_file = (__local_data_path / str(latest["file_path"])).is_file()
-        if has_new_version or not (user_file or local_file):
-            future = __executor.submit_task(__download_data, latest["url"])
-            futures[sid] = future
-
-    if not futures:
-        return
+    for sid, info in latest["crawlers"].items():
+        if __find_source_file(info):
+            crawlers[sid] = info
+        else:
+            futures[sid] = __executor.submit_task(__download_data, info["url"])
+
+    if futures and show_progress:
+        __executor.resolve_futures(futures.values(), desc="Sources", unit="file")
 
-    __executor.resolve_futures(futures.values(), desc="Sources", unit="file")
+    downloaded: List[dict] = []
     for sid, future in futures.items():
+        info = latest["crawlers"][sid]
         try:
-            data = future.result()
-        except Exception:
-            continue
-        try:
-            __save_source_data(sid, data)
+            __save_source_data(info, future.result())
+            crawlers[sid] = info
+            downloaded.append(info)
         except Exception as e:
-            logger.warning("Failed to save source file. Error: %s", e)
+            logger.warning("Failed to update source file. Error: %s", e)
+            if sid in current.get("crawlers", {}):
+                crawlers[sid] = current["crawlers"][sid]
+
+    index = dict(latest, crawlers=crawlers)
+    if len(downloaded) < len(futures):
+        # to download the rest again on the next check
+        index["etag"] = index["last_modified"] = None
+    return index, downloaded
+
+
+def __update_bundle(index: dict):
+    """Precompile the source files of the index"""
+    files: Dict[str, Path] = {}
+    for info in index["crawlers"].values():
+        source_file = __find_source_file(info)
+        if source_file:
+            files[info["md5"]] = source_file
+    __bundle.update(files)
+
+
+def __update_sources(show_progress: bool = False):
+    """Bring the sources up to date with the latest index. The index file is
+    written once, after the source files are saved."""
+    global __current_index
+    current = __current_index
+    latest = __fetch_latest_index(current)
+    if latest is None:
+        index, downloaded = dict(current), []
+    else:
+        index, downloaded = __sync_sources(latest, current, show_progress)
+    index["v"] = int(time.time())
+    __save_index(index)
+    __update_bundle(index)
+    __current_index = index
+
+    # the crawlers not imported yet are replaced in this run too
+    for info in downloaded:
+        source_file = __user_data_path / str(info["file_path"])
+        for url in info["base_urls"]:
+            crawler_list.add_indexed(url, source_file, info["can_search"], replace_loaded=False)
+    rejected_sources.update(index.get("rejected") or {})
+    logger.debug("Sources updated. %d files downloaded", len(downloaded))
+
+
+def __update_sources_in_background():
+    try:
+        __update_sources()
+    except Exception as e:
+        logger.warning("Could not update sources. Error: %s", e)
+
+
+def __start_update():
+    global __update_thread
+    last_update = __current_index.get("v", 0)
+    if time.time() - last_update < __index_fetch_internval_in_seconds:
+        logger.debug("Current index was already downloaded once")
+        return
+    if __update_thread and __update_thread.is_alive():
+        return
+    __update_thread = Thread(
+        target=__update_sources_in_background,
+        name="SourceUpdater",
+        daemon=True,
+    )
+    __update_thread.start()
 
 
 # --------------------------------------------------------------------------- #
@@ -246,7 +388,11 @@ def __import_crawlers(file_path: Path) -> List[Type[Crawler]]:
         module_name = hashlib.md5(file_path.name.encode()).hexdigest()
         spec = importlib.util.spec_from_file_location(module_name, file_path)
         module = importlib.util.module_from_spec(spec)
-        spec.loader.exec_module(module)
+        code = __bundle.get(file_digest(file_path))
+        if code is None:
+            spec.loader.exec_module(module)
+        else:
+            exec(code, module.__dict__)
     except Exception as e:
         logger.warning("Module load failed: %s | %s", file_path, e)
         return []
@@ -291,7 +437,9 @@ def __import_crawlers(file_path: Path) -> List[Type[Crawler]]:
     return crawlers
 
 
-def __add_crawlers_from_path(path: Path):
+def __add_crawlers_from_path(
+    path: Path, index: Optional[Dict[str, dict]] = None, with_user_files: bool = False
+):
     if path.name.startswith("_") or not path.name[0].isalnum():
         return
 
@@ -301,7 +449,10 @@ def __add_crawlers_from_path(path: Path):
 
     if path.is_dir():
         for py_file in path.glob("**/*.py"):
-            __add_crawlers_from_path(py_file)
+            __add_crawlers_from_path(py_file, index, with_user_files)
+        return
+
+    if index and __add_indexed_crawlers(path, index, with_user_files):
         return
 
     global crawler_list
@@ -315,6 +466,50 @@ def __add_crawlers_from_path(path: Path):
         logger.warning("Could not load crawlers from %s. Error: %s", path, e)
 
 
+crawler_list.load_file = __add_crawlers_from_path
+
+
+def __index_by_file(index: dict) -> Dict[str, dict]:
+    """The crawlers of the sources index by their file path"""
+    by_file: Dict[str, dict] = {}
+    for info in index.get("crawlers", {}).values():
+        by_file.setdefault(str(info["file_path"]), dict(md5=info["md5"], crawlers=[]))
+        by_file[str(info["file_path"])]["crawlers"].append(info)
+    return by_file
+
+
+def __add_indexed_crawlers(path: Path, index: Dict[str, dict], with_user_files: bool) -> bool:
+    """Add the crawlers of a file without importing it, if the index
+    describes the same file. With `with_user_files`, the local files
+    downloaded again to the user data folder are skipped."""
+    for root in [__user_data_path, __local_data_path]:
+        try:
+            relative_path = path.absolute().relative_to(root).as_posix()
+            break
+        except ValueError:
+            continue
+    else:
+        return False
+
+    entry = index.get(relative_path)
+    if not entry:
+        return False
+    if (
+        with_user_files
+        and root == __local_data_path
+        and (__user_data_path / relative_path).is_file()
+    ):
+        # replaced by the downloaded file, which is added later
+        return True
+    if file_digest(path) != entry["md5"]:
+        return False
+
+    for info in entry["crawlers"]:
+        for url in info["base_urls"]:
+            crawler_list.add_indexed(url, path, info["can_search"])
+    return True
+
+
 # --------------------------------------------------------------------------- #
 # Public methods
 # --------------------------------------------------------------------------- #
@@ -329,22 +524,50 @@ def load_sources():
     )
 
     if not __is_dev_mode:
+        __load_current_index()
+        if "crawlers" not in __current_index:
+            # nothing to start with
+            try:
+                __update_sources(show_progress=True)
+            except Exception as e:
+                raise LNException(f"Could not fetch sources index. Error: {e}")
         __check_updates()
-        __download_sources()
-        __save_current_index()
+        index = __index_by_file(__current_index)
+    else:
+        index = {}
+        try:
+            with open(sources_path / "_index.json", "r", encoding="utf8") as fp:
+                index = __index_by_file(json.load(fp))
+        except Exception as e:
+            logger.debug("Could not load sources index. Error: %s", e)
 
-    __add_crawlers_from_path(__local_data_path / "sources")
+    # the files changed after the index was made are imported now
+    __add_crawlers_from_path(__local_data_path / "sources", index, not __is_dev_mode)
 
     if not __is_dev_mode:
         for _, current in __current_index["crawlers"].items():
             source_file = __user_data_path / str(current["file_path"])
             if source_file.is_file():
-                __add_crawlers_from_path(source_file)
+                __add_crawlers_from_path(source_file, index, True)
 
     args = get_args()
     for crawler_file in args.crawler:
         __add_crawlers_from_path(Path(crawler_file))
 
+    if not __is_dev_mode:
+        # used from the next run, or when a crawler is imported later
+        __start_update()
+
+
+def load_all_crawlers():
+    """Import all crawlers listed in the sources index"""
+    crawler_list.load_all()
+
+
+def get_searchable_links() -> List[str]:
+    """The base urls of the crawlers which can search novels"""
+    return [url for url in crawler_list if crawler_list.can_search(url)]
+
 
 def prepare_crawler(url: str) -> Optional[Crawler]:
     if not url:
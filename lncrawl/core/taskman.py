@@ -3,22 +3,27 @@ import os
 from abc import ABC
 from concurrent.futures import Future, ThreadPoolExecutor
 from threading import Semaphore, Thread
-from typing import Any, Dict, Iterable, List, Optional
+from typing import Any, Iterable, List, Optional
 
 from tqdm import tqdm
 
-from ..utils.ratelimit import RateLimiter
+from ..utils.hostgate import get_host_gate
+from ..utils.ratelimit import RateLimiter, get_host_limiter
 
 logger = logging.getLogger(__name__)
 
 MAX_WORKER_COUNT = 5
+MIN_REQUESTS_PER_DOMAIN = 1
 MAX_REQUESTS_PER_DOMAIN = 25
 
 _resolver = Semaphore(1)
-_host_semaphores: Dict[str, Semaphore] = {}
 
 
 class TaskManager(ABC):
+    # Floor and ceiling of the adaptive number of concurrent requests per hostname
+    min_domain_window: int = MIN_REQUESTS_PER_DOMAIN
+    max_domain_window: int = MAX_REQUESTS_PER_DOMAIN
+
     def __init__(
         self,
         workers: int = MAX_WORKER_COUNT,
@@ -37,8 +42,6 @@ class TaskManager(ABC):
         if hasattr(self, "_executor"):
             self._submit = None
             self._executor.shutdown(wait=False)
-        if hasattr(self, "_limiter"):
-            self._limiter.shutdown()
 
     @property
     def executor(self) -> ThreadPoolExecutor:
@@ -62,6 +65,9 @@ class TaskManager(ABC):
         If the number of workers are not the same as the current executor,
         it will shutdown the current executor, and cancel all pending tasks.
 
+        The ratelimit is applied to the start of each request per hostname,
+        so it does not restrict the number of workers.
+
         Args:
         - workers (int, optional): Number of concurrent workers to expect. Default: 5.
         - ratelimit (float, optional): Number of requests per second.
@@ -70,10 +76,9 @@ class TaskManager(ABC):
         self.__del__()  # cleanup previous initialization
 
         if ratelimit and ratelimit > 0:
-            workers = 1  # use single worker if ratelimit is being applied
-            self._limiter = RateLimiter(ratelimit)
-        elif hasattr(self, "_limiter"):
-            del self._limiter
+            self._ratelimit = ratelimit
+        elif hasattr(self, "_ratelimit"):
+            del self._ratelimit
 
         self._executor = ThreadPoolExecutor(
             max_workers=workers,
@@ -92,8 +97,6 @@ class TaskManager(ABC):
         Returns:
             A Future representing the given call.
         """
-        if hasattr(self, "_limiter"):
-            fn = self._limiter.wrap(fn)
         if not self._submit:
             raise Exception('No executor is available')
         future = self._submit(fn, *args, **kwargs)
@@ -112,11 +115,11 @@ class TaskManager(ABC):
         if os.getenv("debug_mode"):
             disable = True
 
+        acquired = False
         if not disable:
             # Since we are showing progress bar, it is not good to
             # resolve multiple list of futures at once
-            if not _resolver.acquire(True, timeout):
-                pass
+            acquired = _resolver.acquire(True, timeout)
 
         bar = tqdm(
             iterable=iterable,
@@ -129,7 +132,10 @@ class TaskManager(ABC):
         original_close = bar.close
 
         def extended_close():
-            if not bar.disable:
+            nonlocal acquired
+            if acquired:
+                # the bar may be disabled by tqdm itself, e.g. in a non-tty output
+                acquired = False
                 _resolver.release()
             original_close()
 
@@ -140,19 +146,45 @@ class TaskManager(ABC):
     def domain_gate(self, hostname: str = ""):
         """Limit number of entry per hostname.
 
+        The number of entries grows while the host is responding well, and
+        shrinks on 429/5xx errors or timeouts within the range of
+        `min_domain_window` and `max_domain_window`.
+
         Args:
             hostname: A fully qualified url.
 
         Returns:
-            A semaphore object to wait.
+            A context manager to wait. Works with `with` and `async with`.
 
         Example:
             with self.domain_gate(url):
                 self.scraper.get(url)
         """
-        if hostname not in _host_semaphores:
-            _host_semaphores[hostname] = Semaphore(MAX_REQUESTS_PER_DOMAIN)
-        return _host_semaphores[hostname]
+        gate = get_host_gate(
+            hostname,
+            self.min_domain_window,
+            self.max_domain_window,
+            initial=self.workers,
+        )
+        return gate.slot()
+
+    def host_limiter(self, hostname: str = "") -> Optional[RateLimiter]:
+        """Limit the rate of requests per hostname, if a ratelimit is given.
+
+        Args:
+            hostname: A fully qualified url.
+
+        Returns:
+            A token bucket to acquire before a request, or None.
+
+        Example:
+            limiter = self.host_limiter(hostname)
+            if limiter:
+                limiter.acquire()
+        """
+        if not hasattr(self, "_ratelimit"):
+            return None
+        return get_host_limiter(hostname, self._ratelimit)
 
     def cancel_futures(self, futures: Iterable[Future]) -> None:
         """Cancels all the future that are not yet done.
@@ -1,5 +1,5 @@
 from .chapter import Chapter
-from .formats import OutputFormat
+from .formats import ImageProfile, OutputFormat
 from .meta import MetaInfo
 from .novel import Novel, NovelStatus
 from .search_result import CombinedSearchResult, SearchResult
@@ -10,6 +10,7 @@ __all__ = [
     "Chapter",
     "CombinedSearchResult",
     "SearchResult",
+    "ImageProfile",
     "OutputFormat",
     "Novel",
     "NovelStatus",
@@ -1,9 +1,35 @@
-from typing import Dict, Optional
+import os
+from typing import Any, Dict, Optional
 
-from box import Box
+from ..utils.compress import CompressedText
+from .model import Model
 
+# bodies larger than this are kept compressed in memory with the low_memory option
+COMPRESS_BODY_SIZE = 1024
+
+
+class Chapter(Model):
+    __slots__ = (
+        "id",
+        "url",
+        "title",
+        "volume",
+        "volume_title",
+        "_body",
+        "images",
+        "success",
+    )
+    _fields = (
+        "id",
+        "url",
+        "title",
+        "volume",
+        "volume_title",
+        "body",
+        "images",
+        "success",
+    )
 
-class Chapter(Box):
     def __init__(
         self,
         id: int,
@@ -12,7 +38,7 @@ class Chapter(Box):
         volume: Optional[int] = None,
         volume_title: Optional[str] = None,
         body: Optional[str] = None,
-        images: Dict[str, str] = dict(),
+        images: Optional[Dict[str, str]] = None,
         success: bool = False,
         **kwargs,
     ) -> None:
@@ -22,9 +48,38 @@ class Chapter(Box):
         self.volume = volume
         self.volume_title = volume_title
         self.body = body
-        self.images = images
+        self.images = images if images is not None else {}
         self.success = success
-        self.update(kwargs)
+        if kwargs:
+            self.update(kwargs)
+
+    @property
+    def body(self) -> Optional[str]:
+        value = self._body
+        if value is None or isinstance(value, str):
+            return value
+        return str(value)  # decompress or load from the store on read
+
+    @body.setter
+    def body(self, value: Optional[str]) -> None:
+        if (
+            isinstance(value, str)
+            and len(value) > COMPRESS_BODY_SIZE
+            and os.getenv("low_memory")
+        ):
+            value = CompressedText.from_text(value)
+        self._body = value
+
+    @property
+    def raw_body(self) -> Any:
+        """The body as it is kept in memory: the text, a `CompressedText`,
+        or a reference to the stored body. Setting it keeps the value as it is.
+        """
+        return self._body
+
+    @raw_body.setter
+    def raw_body(self, value: Any) -> None:
+        self._body = value
 
     @staticmethod
     def without_body(item: "Chapter") -> "Chapter":
@@ -20,3 +20,9 @@ class OutputFormat(str, Enum):
     rb = "rb"
     snb = "snb"
     tcr = "tcr"
+
+
+class ImageProfile(str, Enum):
+    original = "original"
+    kindle_paperwhite = "kindle-paperwhite"
+    tablet = "tablet"
@@ -13,6 +13,7 @@ class MetaInfo(Box):
         session: Optional[Session] = None,
         **kwargs,
     ) -> None:
-        self.novel = novel
+        # the slotted models are kept as plain dicts to save them as JSON
+        self.novel = novel.to_dict() if isinstance(novel, Novel) else novel
         self.session = session
         self.update(kwargs)
@@ -0,0 +1,160 @@
+import json
+from collections.abc import Mapping, MutableMapping
+from typing import Any, Dict, FrozenSet, Iterable, Optional, Tuple
+
+
+def _to_plain(value: Any) -> Any:
+    if isinstance(value, Model):
+        return value.to_dict()
+    if isinstance(value, Mapping):
+        return {k: _to_plain(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_to_plain(v) for v in value]
+    return value
+
+
+class Model(MutableMapping):
+    """A compact record with `__slots__` for the known fields.
+
+    Like the python-box `Box` it replaces, the fields can be used either as
+    attributes or as keys, e.g. `chapter.body` and `chapter["body"]`.
+    The unknown fields are kept in a separate dict created on first use.
+
+    The known fields can not be removed. Deleting one resets it to None.
+
+    It is not a `dict`. Use `to_dict()` to serialize it, e.g. with `json.dump`.
+    """
+
+    __slots__ = ("_extra",)
+
+    # the known fields in order. set by each subclass.
+    _fields: Tuple[str, ...] = ()
+
+    # the attributes stored in the object itself. computed for each subclass.
+    _attrs: FrozenSet[str] = frozenset()
+    _slots: Tuple[str, ...] = ()
+
+    def __init_subclass__(cls, **kwargs) -> None:
+        super().__init_subclass__(**kwargs)
+        slots = []
+        properties = []
+        for klass in reversed(cls.__mro__):
+            slots += [s for s in klass.__dict__.get("__slots__", ()) if s != "_extra"]
+            properties += [k for k, v in klass.__dict__.items() if isinstance(v, property)]
+        cls._slots = tuple(slots)
+        cls._attrs = frozenset(slots) | frozenset(properties) | frozenset(cls._fields)
+
+    def __new__(cls, *args, **kwargs):
+        self = super().__new__(cls)
+        self._extra: Optional[Dict[str, Any]] = None
+        return self
+
+    # ------------------------------------------------------------------------- #
+    # Attribute access
+    # ------------------------------------------------------------------------- #
+
+    def __getattr__(self, name: str) -> Any:
+        # called only for the unknown fields
+        extra = self._extra
+        if extra is not None and name in extra:
+            return extra[name]
+        raise AttributeError(f"'{type(self).__name__}' has no field '{name}'")
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        if name in self._attrs or name == "_extra":
+            object.__setattr__(self, name, value)
+        else:
+            if self._extra is None:
+                self._extra = {}
+            self._extra[name] = value
+
+    def __delattr__(self, name: str) -> None:
+        try:
+            del self[name]
+        except KeyError:
+            raise AttributeError(name) from None
+
+    # ------------------------------------------------------------------------- #
+    # Mapping access
+    # ------------------------------------------------------------------------- #
+
+    def __getitem__(self, key: str) -> Any:
+        if key in self._fields:
+            return getattr(self, key)
+        extra = self._extra
+        if extra is not None and key in extra:
+            return extra[key]
+        raise KeyError(key)
+
+    def __setitem__(self, key: str, value: Any) -> None:
+        self.__setattr__(key, value)
+
+    def __delitem__(self, key: str) -> None:
+        if key in self._fields:
+            setattr(self, key, None)
+        elif self._extra is not None and key in self._extra:
+            del self._extra[key]
+        else:
+            raise KeyError(key)
+
+    def __iter__(self):
+        yield from self._fields
+        if self._extra:
+            yield from list(self._extra)
+
+    def __len__(self) -> int:
+        return len(self._fields) + len(self._extra or ())
+
+    def __contains__(self, key: object) -> bool:
+        return key in self._fields or bool(self._extra and key in self._extra)
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({dict(self.items())!r})"
+
+    def get(self, key: str, default: Any = None) -> Any:
+        if key in self._fields:
+            return getattr(self, key)
+        extra = self._extra
+        if extra is not None:
+            return extra.get(key, default)
+        return default
+
+    # ------------------------------------------------------------------------- #
+    # Conversion
+    # ------------------------------------------------------------------------- #
+
+    def copy(self):
+        """A shallow copy. The values are not converted or loaded."""
+        clone = type(self).__new__(type(self))
+        for name in self._slots:
+            try:
+                object.__setattr__(clone, name, object.__getattribute__(self, name))
+            except AttributeError:
+                pass  # unset slot
+        if self._extra:
+            clone._extra = dict(self._extra)
+        return clone
+
+    def to_dict(self, exclude: Iterable[str] = ()) -> Dict[str, Any]:
+        """A plain dict of the fields. The nested models are converted too.
+
+        Args:
+        - exclude (optional): Names of the fields to leave out, e.g. to not load the body.
+        """
+        exclude = frozenset(exclude)
+        return {key: _to_plain(self[key]) for key in self if key not in exclude}
+
+    def to_json(
+        self,
+        filename=None,
+        encoding: str = "utf-8",
+        errors: str = "strict",
+        **json_kwargs,
+    ) -> Optional[str]:
+        """Serialize as JSON. Writes to the file if the filename is given."""
+        text = json.dumps(self.to_dict(), **json_kwargs)
+        if filename is None:
+            return text
+        with open(filename, "w", encoding=encoding, errors=errors) as fp:
+            fp.write(text)
+        return None
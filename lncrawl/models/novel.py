@@ -1,11 +1,9 @@
 from enum import Enum
 from typing import List, Optional
 
-from box import Box
-
 from .chapter import Chapter
+from .model import Model
 from .volume import Volume
-from ..assets.languages import language_codes
 
 
 class NovelStatus(str, Enum):
@@ -15,7 +13,33 @@ class NovelStatus(str, Enum):
     hiatus = "Hiatus"
 
 
-class Novel(Box):
+class Novel(Model):
+    __slots__ = _fields = (
+        "url",
+        "title",
+        "authors",
+        "cover_url",
+        "chapters",
+        "volumes",
+        "is_rtl",
+        "synopsis",
+        "language",
+        "novel_tags",
+        "has_manga",
+        "has_mtl",
+        "language_code",
+        "source",
+        "editors",
+        "translators",
+        "status",
+        "genres",
+        "tags",
+        "description",
+        "original_publisher",
+        "english_publisher",
+        "novelupdates_url",
+    )
+
     def __init__(
         self,
         url: str,
@@ -45,29 +69,26 @@ class Novel(Box):
     ) -> None:
         self.url = url
         self.title = title
-        self.authors = authors
+        self.authors = list(authors)
         self.cover_url = cover_url
-        self.chapters = chapters
-        self.volumes = volumes
+        self.chapters = list(chapters)
+        self.volumes = list(volumes)
         self.is_rtl = is_rtl
         self.synopsis = synopsis
         self.language = language
-        self.novel_tags = novel_tags
+        self.novel_tags = list(novel_tags)
         self.has_manga = has_manga
         self.has_mtl = has_mtl
-        self.language_code = language_code
+        self.language_code = list(language_code)
         self.source = source
-        self.editors = editors
-        self.translators = translators
+        self.editors = list(editors)
+        self.translators = list(translators)
         self.status = status
-        self.genres = genres
-        self.tags = tags
+        self.genres = list(genres)
+        self.tags = list(tags)
         self.description = description
         self.original_publisher = original_publisher
         self.english_publisher = english_publisher
         self.novelupdates_url = novelupdates_url
-        self.update(kwargs)
-
-    @property
-    def language(self) -> str:
-        return language_codes.get(self.language_code, "Unknown")
+        if kwargs:
+            self.update(kwargs)
@@ -1,9 +1,11 @@
 from typing import List
 
-from box import Box
+from .model import Model
 
 
-class SearchResult(Box):
+class SearchResult(Model):
+    __slots__ = _fields = ("title", "url", "info")
+
     def __init__(
         self,
         title: str,
@@ -14,10 +16,13 @@ class SearchResult(Box):
         self.title = str(title)
         self.url = str(url)
         self.info = str(info)
-        self.update(kwargs)
+        if kwargs:
+            self.update(kwargs)
+
 
+class CombinedSearchResult(Model):
+    __slots__ = _fields = ("id", "title", "novels")
 
-class CombinedSearchResult(Box):
     def __init__(
         self,
         id: str,
@@ -27,5 +32,6 @@ class CombinedSearchResult(Box):
     ) -> None:
         self.id = id
         self.title = str(title)
-        self.novels = novels
-        self.update(kwargs)
+        self.novels = list(novels)
+        if kwargs:
+            self.update(kwargs)
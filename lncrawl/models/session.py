@@ -2,7 +2,7 @@ from typing import Dict, List, Optional, Tuple
 
 from box import Box
 
-from .formats import OutputFormat
+from .formats import ImageProfile, OutputFormat
 
 
 class Session(Box):
@@ -17,6 +17,7 @@ class Session(Box):
         no_append_after_filename: bool = False,
         login_data: Optional[Tuple[str, str]] = None,
         output_formats: Dict[OutputFormat, bool] = dict(),
+        image_profile: ImageProfile = ImageProfile.original,
         headers: Dict[str, str] = dict(),
         cookies: Dict[str, str] = dict(),
         proxies: Dict[str, str] = dict(),
@@ -31,6 +32,7 @@ class Session(Box):
         self.no_append_after_filename = no_append_after_filename
         self.login_data = login_data
         self.output_formats = output_formats
+        self.image_profile = image_profile
         self.headers = headers
         self.cookies = cookies
         self.proxies = proxies
@@ -1,9 +1,17 @@
 from typing import Optional
 
-from box import Box
+from .model import Model
 
 
-class Volume(Box):
+class Volume(Model):
+    __slots__ = _fields = (
+        "id",
+        "title",
+        "start_chapter",
+        "final_chapter",
+        "chapter_count",
+    )
+
     def __init__(
         self,
         id: int,
@@ -18,4 +26,5 @@ class Volume(Box):
         self.start_chapter = start_chapter
         self.final_chapter = final_chapter
         self.chapter_count = chapter_count
-        self.update(kwargs)
+        if kwargs:
+            self.update(kwargs)
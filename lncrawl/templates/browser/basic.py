@@ -1,7 +1,7 @@
 import logging
 from abc import abstractmethod
 from io import BytesIO
-from typing import Generator, List, Optional
+from typing import Callable, Generator, List, Optional
 
 from PIL import Image
 
@@ -100,9 +100,12 @@ class BasicBrowserTemplate(Crawler):
             self,
             chapters: List[Chapter],
             fail_fast=False,
+            on_chapter: Optional[Callable[[Chapter], None]] = None,
     ) -> Generator[int, None, None]:
         try:
-            yield from super().download_chapters(chapters, fail_fast=True)
+            yield from super().download_chapters(
+                chapters, fail_fast=True, on_chapter=on_chapter
+            )
         except ScraperErrorGroup as e:
             if logger.isEnabledFor(logging.DEBUG):
                 logger.exception("Failed in scraper: %s", e)
@@ -126,6 +129,8 @@ class BasicBrowserTemplate(Crawler):
                 if isinstance(e, KeyboardInterrupt):
                     break
             finally:
+                if on_chapter:
+                    on_chapter(chapter)
                 yield 1
 
         self.close_browser()
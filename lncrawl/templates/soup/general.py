@@ -4,6 +4,7 @@ from typing import Generator, Union
 
 from bs4 import BeautifulSoup, Tag
 
+from ...core.aioengine import get_async_engine
 from ...core.crawler import Crawler
 from ...core.exeptions import LNException
 from ...models import Chapter, Volume
@@ -67,6 +68,18 @@ class GeneralSoupTemplate(Crawler):
         body = self.select_chapter_body(soup)
         return self.parse_chapter_body(body)
 
+    async def async_download_chapter_body(self, chapter: Chapter) -> str:
+        if type(self).download_chapter_body is not GeneralSoupTemplate.download_chapter_body:
+            # the source downloads the chapter in its own way
+            return await super().async_download_chapter_body(chapter)
+        soup = await self.async_get_soup(chapter.url)
+        # the parsers may block, e.g. to get another page. keep them off the event loop.
+        return await get_async_engine().run_sync(self.executor, self.__parse_soup, soup)
+
+    def __parse_soup(self, soup: BeautifulSoup) -> str:
+        body = self.select_chapter_body(soup)
+        return self.parse_chapter_body(body)
+
     @abstractmethod
     def select_chapter_body(self, soup: BeautifulSoup) -> Tag:
         """Select the tag containing the chapter text"""
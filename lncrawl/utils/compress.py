@@ -0,0 +1,67 @@
+import zlib
+from threading import local
+from typing import Tuple
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+ZLIB = "zlib"
+ZSTD = "zstd"
+DEFAULT_CODEC = ZSTD if zstandard else ZLIB
+
+_local = local()  # zstd contexts are not thread-safe
+
+
+def _zstd_compressor():
+    if not hasattr(_local, "compressor"):
+        _local.compressor = zstandard.ZstdCompressor(level=3)
+    return _local.compressor
+
+
+def _zstd_decompressor():
+    if not hasattr(_local, "decompressor"):
+        _local.decompressor = zstandard.ZstdDecompressor()
+    return _local.decompressor
+
+
+def compress(data: bytes, codec: str = DEFAULT_CODEC) -> Tuple[str, bytes]:
+    """Compress the data with zstd if available, otherwise zlib.
+
+    Returns:
+        The codec name and the compressed data.
+    """
+    if codec == ZSTD and zstandard:
+        return ZSTD, _zstd_compressor().compress(data)
+    return ZLIB, zlib.compress(data, 6)
+
+
+def decompress(data: bytes, codec: str) -> bytes:
+    if codec == ZSTD:
+        if not zstandard:
+            raise ImportError("zstandard is required to read this content")
+        return _zstd_decompressor().decompress(data)
+    if codec == ZLIB:
+        return zlib.decompress(data)
+    raise ValueError(f"Unknown codec: {codec}")
+
+
+class CompressedText:
+    """A text kept compressed in memory. Use `str()` to get the text back."""
+
+    __slots__ = ("codec", "data")
+
+    def __init__(self, codec: str, data: bytes) -> None:
+        self.codec = codec
+        self.data = data
+
+    @classmethod
+    def from_text(cls, text: str) -> "CompressedText":
+        return cls(*compress(text.encode("utf-8")))
+
+    def __str__(self) -> str:
+        return decompress(self.data, self.codec).decode("utf-8")
+
+    def __repr__(self) -> str:
+        return f"<CompressedText {self.codec} {len(self.data)} bytes>"
@@ -0,0 +1,218 @@
+import asyncio
+import logging
+import time
+from collections import deque
+from threading import Event, Lock
+from typing import Deque, Dict, Optional, Union
+
+from requests.exceptions import ConnectionError, Timeout
+
+logger = logging.getLogger(__name__)
+
+OVERLOAD_STATUS_CODES = {429, 500, 502, 503, 504, 520, 521, 522, 523, 524}
+
+_registry_lock = Lock()
+_host_gates: Dict[str, "AdaptiveSemaphore"] = {}
+
+
+def is_overload_error(error: Optional[BaseException]) -> bool:
+    """True if the error says that the host is getting too many requests"""
+    if error is None:
+        return False
+    if isinstance(error, (Timeout, ConnectionError)):
+        return True
+    response = getattr(error, "response", None)
+    status_code = getattr(response, "status_code", None)
+    return status_code in OVERLOAD_STATUS_CODES
+
+
+class AdaptiveSemaphore:
+    """A semaphore with a concurrency window controlled by AIMD
+    (additive increase, multiplicative decrease).
+
+    The window grows by one slot per window of healthy responses, and is
+    halved on overload errors (429, 5xx, timeouts). It never goes out of
+    the [min_window, max_window] range. It can be acquired from threads
+    and from asyncio tasks at the same time.
+
+    Args:
+    - min_window (int): The lowest number of concurrent requests.
+    - max_window (int): The highest number of concurrent requests.
+    - initial (int, optional): The starting window. Default: min_window.
+    """
+
+    def __init__(self, min_window: int, max_window: int, initial: int = 0) -> None:
+        self._lock = Lock()
+        self._active = 0
+        self._waiters: Deque[Union[Event, tuple]] = deque()
+        self._latency = 0.0  # smoothed latency of recent requests
+        self._base_latency = 0.0  # lowest smoothed latency seen so far
+        self._last_decrease = 0.0
+        self.set_bounds(min_window, max_window)
+        self._window = float(max(self.min_window, min(self.max_window, initial)))
+
+    @property
+    def window(self) -> int:
+        return int(self._window)
+
+    @property
+    def active(self) -> int:
+        return self._active
+
+    def set_bounds(self, min_window: int, max_window: int) -> None:
+        self.min_window = max(1, int(min_window))
+        self.max_window = max(self.min_window, int(max_window))
+        with self._lock:
+            if hasattr(self, "_window"):
+                self._window = max(self.min_window, min(self.max_window, self._window))
+                self._wake_waiters()
+
+    # ------------------------------------------------------------------------- #
+    # Acquire & Release
+    # ------------------------------------------------------------------------- #
+
+    def _try_acquire(self) -> bool:
+        if not self._waiters and self._active < self.window:
+            self._active += 1
+            return True
+        return False
+
+    def _wake_waiters(self) -> None:
+        while self._waiters and self._active < self.window:
+            waiter = self._waiters.popleft()
+            self._active += 1
+            if isinstance(waiter, Event):
+                waiter.set()
+            else:
+                loop, future = waiter
+                loop.call_soon_threadsafe(self._hand_over, future)
+
+    def _hand_over(self, future: asyncio.Future) -> None:
+        if future.cancelled():
+            self.release()
+        else:
+            future.set_result(True)
+
+    def acquire(self, timeout: Optional[float] = None) -> bool:
+        with self._lock:
+            if self._try_acquire():
+                return True
+            event = Event()
+            self._waiters.append(event)
+        if event.wait(timeout):
+            return True
+        with self._lock:
+            if event in self._waiters:
+                self._waiters.remove(event)
+                return False
+        return True  # the slot was handed over just after the timeout
+
+    async def acquire_async(self) -> bool:
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            if self._try_acquire():
+                return True
+            future = loop.create_future()
+            waiter = (loop, future)
+            self._waiters.append(waiter)
+        try:
+            return await future
+        except asyncio.CancelledError:
+            with self._lock:
+                if waiter in self._waiters:
+                    self._waiters.remove(waiter)
+                    raise
+            if future.done() and not future.cancelled():
+                self.release()
+            raise
+
+    def release(self) -> None:
+        with self._lock:
+            self._active = max(0, self._active - 1)
+            self._wake_waiters()
+
+    # ------------------------------------------------------------------------- #
+    # Window control
+    # ------------------------------------------------------------------------- #
+
+    def record(self, latency: float, error: Optional[BaseException] = None) -> None:
+        """Adjust the window with the outcome of a request"""
+        with self._lock:
+            if is_overload_error(error):
+                self._decrease()
+            elif error is None:
+                self._on_success(latency)
+            self._wake_waiters()
+
+    def _on_success(self, latency: float) -> None:
+        if self._latency:
+            self._latency = 0.8 * self._latency + 0.2 * latency
+        else:
+            self._latency = latency
+        if not self._base_latency or self._latency < self._base_latency:
+            self._base_latency = self._latency
+        if self._latency > 2 * self._base_latency:
+            return  # the host is slowing down, hold the window
+        if self._active + 1 >= self.window:  # only grow a window in use
+            self._window = min(self.max_window, self._window + 1 / self._window)
+
+    def _decrease(self) -> None:
+        # decrease at most once per round-trip time for a burst of failures
+        now = time.monotonic()
+        if now - self._last_decrease < max(self._latency, 1):
+            return
+        self._last_decrease = now
+        window = max(self.min_window, self._window / 2)
+        if window != self._window:
+            logger.debug("Host overloaded. Window: %d -> %d", self._window, window)
+        self._window = window
+
+    # ------------------------------------------------------------------------- #
+    # Context managers
+    # ------------------------------------------------------------------------- #
+
+    def slot(self) -> "_Slot":
+        """A context manager to hold a slot during a request and record its outcome"""
+        return _Slot(self)
+
+
+class _Slot:
+    def __init__(self, gate: AdaptiveSemaphore) -> None:
+        self.gate = gate
+        self.started = 0.0
+
+    def __enter__(self) -> "_Slot":
+        self.gate.acquire()
+        self.started = time.monotonic()
+        return self
+
+    def __exit__(self, exc_type, exc, traceback) -> None:
+        try:
+            self.gate.record(time.monotonic() - self.started, exc)
+        finally:
+            self.gate.release()
+
+    async def __aenter__(self) -> "_Slot":
+        await self.gate.acquire_async()
+        self.started = time.monotonic()
+        return self
+
+    async def __aexit__(self, exc_type, exc, traceback) -> None:
+        self.__exit__(exc_type, exc, traceback)
+
+
+def get_host_gate(
+    hostname: str,
+    min_window: int,
+    max_window: int,
+    initial: int = 0,
+) -> AdaptiveSemaphore:
+    """Returns the process-wide gate of a hostname"""
+    with _registry_lock:
+        gate = _host_gates.get(hostname)
+        if gate is None:
+            gate = AdaptiveSemaphore(min_window, max_window, initial)
+            _host_gates[hostname] = gate
+        elif (gate.min_window, gate.max_window) != (min_window, max_window):
+            gate.set_bounds(min_window, max_window)
+        return gate
@@ -1,38 +1,76 @@
+import asyncio
 import logging
 import time
+from threading import Lock
+from typing import Dict, Optional
 
 logger = logging.getLogger(__name__)
 
+_registry_lock = Lock()
+_host_limiters: Dict[str, "RateLimiter"] = {}
+
 
 class RateLimiter(object):
-    """A helper class for a controlling number of requests per seconds.
+    """A token bucket for controlling number of requests per seconds.
     It is being used along with the TaskManager class.
 
+    It paces the start of the calls, regardless of how many of them are
+    running in parallel. Can be used from threads and asyncio tasks.
+
     Args:
-    - ratelimit (float, optional): Number of requests per seconds.
+    - ratelimit (float): Number of requests per seconds.
+    - burst (int, optional): Number of requests that can start at once. Default: 1.
     """
 
-    def __init__(self, ratelimit: float):
+    def __init__(self, ratelimit: float, burst: int = 1):
         if ratelimit <= 0:
             raise ValueError("ratelimit should be a non-zero positive number")
-        self.period = 1 / ratelimit
+        self._lock = Lock()
         self._closed = False
+        self.update(ratelimit, burst)
+        self._tokens = float(self.burst)
+        self._time = self._now()
 
     def _now(self):
         if hasattr(time, "monotonic"):
             return time.monotonic()
         return time.time()
 
+    def update(self, ratelimit: float, burst: int = 1):
+        with self._lock:
+            self.ratelimit = ratelimit
+            self.burst = max(1, int(burst))
+            self.period = 1 / ratelimit
+
+    def _reserve(self) -> float:
+        """Takes a token and returns the seconds to wait before using it"""
+        with self._lock:
+            if self._closed:
+                return 0
+            now = self._now()
+            self._tokens += (now - self._time) * self.ratelimit
+            self._tokens = min(self.burst, self._tokens)
+            self._time = now
+            self._tokens -= 1
+            if self._tokens >= 0:
+                return 0
+            return -self._tokens * self.period
+
+    def acquire(self):
+        delay = self._reserve()
+        if delay > 0:
+            time.sleep(delay)
+
+    async def acquire_async(self):
+        delay = self._reserve()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
     def __enter__(self):
-        self._time = self._now()
+        self.acquire()
 
     def __exit__(self, type, value, traceback):
-        if self._closed:
-            return
-        d = (self._time + self.period) - self._now()
-        self._time = self._now()
-        if d > 0:
-            time.sleep(d)
+        pass
 
     def shutdown(self):
         self._closed = True
@@ -43,3 +81,28 @@ class RateLimiter(object):
                 return fn(*args, **kwargs)
 
         return inner
+
+
+def get_host_limiter(
+    hostname: str,
+    ratelimit: float,
+    burst: Optional[int] = None,
+) -> RateLimiter:
+    """Returns the process-wide rate limiter of a hostname.
+
+    The scrapers of a host share the limiter. If they ask for different
+    rates, the strictest rate and burst are kept, so that no scraper can
+    loosen the limit set by another one.
+    """
+    burst = burst or max(1, int(ratelimit))
+    with _registry_lock:
+        limiter = _host_limiters.get(hostname)
+        if limiter is None:
+            limiter = RateLimiter(ratelimit, burst)
+            _host_limiters[hostname] = limiter
+        elif ratelimit < limiter.ratelimit or burst < limiter.burst:
+            limiter.update(
+                min(ratelimit, limiter.ratelimit),
+                min(burst, limiter.burst),
+            )
+        return limiter
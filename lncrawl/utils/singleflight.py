@@ -0,0 +1,85 @@
+import asyncio
+from concurrent.futures import Future
+from threading import Lock
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple
+
+
+class SingleFlight:
+    """Runs only one call at a time for a key.
+    Concurrent callers with the same key wait for the running call and share its outcome.
+
+    It can be used from threads and asyncio tasks at the same time.
+    """
+
+    def __init__(self) -> None:
+        self._lock = Lock()
+        self._calls: Dict[Hashable, Future] = {}
+
+    def _join(self, key: Hashable) -> Tuple[Future, bool]:
+        with self._lock:
+            future = self._calls.get(key)
+            if future is not None:
+                return future, False
+            future = Future()
+            self._calls[key] = future
+            return future, True
+
+    def _finish(
+        self,
+        key: Hashable,
+        future: Future,
+        result: Any = None,
+        error: Optional[BaseException] = None,
+    ) -> None:
+        with self._lock:
+            self._calls.pop(key, None)
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
+
+    def do(
+        self,
+        key: Hashable,
+        fn: Callable[[], Any],
+        follow: Optional[Callable[[Any], Any]] = None,
+    ) -> Any:
+        """Call the function, or wait for the running call of the same key.
+
+        Args:
+        - key: Calls with equal keys are coalesced.
+        - fn: The function to call.
+        - follow (optional): Maps the shared result for a waiting caller. e.g. to make a copy.
+        """
+        future, is_leader = self._join(key)
+        if not is_leader:
+            result = future.result()
+            return follow(result) if follow else result
+
+        try:
+            result = fn()
+        except BaseException as e:
+            self._finish(key, future, error=e)
+            raise
+        self._finish(key, future, result)
+        return result
+
+    async def do_async(
+        self,
+        key: Hashable,
+        fn: Callable[[], Awaitable],
+        follow: Optional[Callable[[Any], Any]] = None,
+    ) -> Any:
+        """Async version of the `do`. The `fn` should return an awaitable."""
+        future, is_leader = self._join(key)
+        if not is_leader:
+            result = await asyncio.wrap_future(future)
+            return follow(result) if follow else result
+
+        try:
+            result = await fn()
+        except BaseException as e:
+            self._finish(key, future, error=e)
+            raise
+        self._finish(key, future, result)
+        return result
@@ -0,0 +1,176 @@
+"""
+Saves the downloaded images as JPEG, converting them in a pool of processes
+"""
+import atexit
+import logging
+import multiprocessing
+import os
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import partial
+from io import BytesIO
+from threading import Lock
+from typing import Any, Dict, Optional, Tuple, Union
+
+from PIL import Image
+
+logger = logging.getLogger(__name__)
+
+JPEG_MODES = ("L", "RGB")
+
+# Settings of each `lncrawl.models.ImageProfile`
+# - max_size: The largest (width, height) to keep. The larger images are scaled down.
+# - grayscale: Whether to remove the colors.
+# - quality: The JPEG quality of the converted images.
+IMAGE_PROFILES: Dict[str, Dict[str, Any]] = {
+    "original": dict(max_size=None, grayscale=False, quality=75),
+    "kindle-paperwhite": dict(max_size=(1072, 1448), grayscale=True, quality=70),
+    "tablet": dict(max_size=(1600, 2560), grayscale=False, quality=80),
+}
+DEFAULT_PROFILE = "original"
+
+__transcoder_lock = Lock()
+__transcoder: Optional["ImageTranscoder"] = None
+
+
+def _write_file(output_file: str, data: bytes) -> None:
+    temp_file = f"{output_file}.{os.getpid()}.part"
+    with open(temp_file, "wb") as fp:
+        fp.write(data)
+    os.replace(temp_file, output_file)
+
+
+def _convert(
+    source: Union[bytes, Image.Image],
+    output_file: str,
+    max_size: Optional[Tuple[int, int]] = None,
+    grayscale: bool = False,
+    quality: int = 75,
+) -> None:
+    """Convert an image to JPEG. Runs in the worker processes."""
+    img = Image.open(BytesIO(source)) if isinstance(source, bytes) else source
+    try:
+        if max_size:
+            # JPEG files can be decoded at a smaller scale directly
+            img.draft("L" if grayscale else "RGB", max_size)
+            if img.width > max_size[0] or img.height > max_size[1]:
+                img.thumbnail(max_size, Image.LANCZOS)
+        if img.mode not in ("L", "RGB", "YCbCr", "RGBX"):
+            if img.mode == "RGBa":
+                # RGBa -> RGB isn't supported so we go through RGBA first
+                img = img.convert("RGBA")
+            img = img.convert("RGB")
+        if grayscale and img.mode != "L":
+            img = img.convert("L")
+        buffer = BytesIO()
+        img.save(buffer, "JPEG", quality=quality, optimize=True)
+        _write_file(output_file, buffer.getvalue())
+    finally:
+        img.close()
+
+
+def _run_now(fn, *args) -> Future:
+    future: Future = Future()
+    try:
+        future.set_result(fn(*args))
+    except Exception as e:
+        future.set_exception(e)
+    return future
+
+
+def original_bytes(img: Image.Image) -> Optional[bytes]:
+    """Content of the file the image was opened from, if it was not changed"""
+    fp = getattr(img, "fp", None)
+    if fp is None or getattr(fp, "closed", False):
+        return None
+    try:
+        fp.seek(0)
+        return fp.read()
+    except Exception:
+        return None
+
+
+def is_plain_jpeg(img: Image.Image, max_size=None, grayscale=False, **kwargs) -> bool:
+    """Whether the image is a baseline JPEG that can be used as it is
+    with the given profile settings"""
+    return (
+        img.format == "JPEG"
+        and img.mode in (("L",) if grayscale else JPEG_MODES)
+        and not img.info.get("progressive")
+        and not img.info.get("progression")
+        and not (max_size and (img.width > max_size[0] or img.height > max_size[1]))
+    )
+
+
+class ImageTranscoder:
+    """Saves the images as JPEG without blocking the downloading threads.
+
+    The baseline JPEG files that already suit the image profile are written
+    byte-for-byte without decoding them. The other images are converted,
+    and resized for the profile, in a pool of processes, so that the
+    conversion does not hold the GIL of the downloaders.
+
+    Args:
+    - workers (int, optional): Number of processes. Default: number of CPUs.
+    """
+
+    def __init__(self, workers: Optional[int] = None) -> None:
+        self.workers = workers or os.cpu_count() or 1
+        self._lock = Lock()
+        self._pool: Optional[ProcessPoolExecutor] = None
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._pool is None:
+                # forking a process with running threads is not safe
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+            return self._pool
+
+    def save(self, img: Image.Image, output_file: str, profile: str = DEFAULT_PROFILE) -> Future:
+        """Save the image to the file as JPEG. The image is closed afterwards.
+
+        Args:
+        - img (Image): The image to save.
+        - output_file (str): The file to write.
+        - profile (str, optional): One of the `IMAGE_PROFILES`. Default: original.
+
+        Returns:
+            A future which is done when the file is written.
+        """
+        settings = IMAGE_PROFILES.get(profile) or IMAGE_PROFILES[DEFAULT_PROFILE]
+        content = original_bytes(img)
+        if content is not None and is_plain_jpeg(img, **settings):
+            img.close()
+            return _run_now(_write_file, output_file, content)
+
+        source: Union[bytes, Image.Image] = img
+        if content is not None:
+            # the encoded file is smaller to send than the pixels
+            source = content
+            img.close()
+        try:
+            return self._get_pool().submit(_convert, source, output_file, **settings)
+        except (BrokenProcessPool, OSError, RuntimeError) as e:
+            logger.debug(f"Image process pool is not available. {e}")
+            with self._lock:
+                self._pool = None
+            return _run_now(partial(_convert, **settings), source, output_file)
+
+    def shutdown(self) -> None:
+        with self._lock:
+            if self._pool:
+                self._pool.shutdown(wait=False)
+                self._pool = None
+
+
+def get_image_transcoder() -> ImageTranscoder:
+    """Returns the process-wide image transcoder. Creates one on first use."""
+    global __transcoder
+    with __transcoder_lock:
+        if __transcoder is None:
+            __transcoder = ImageTranscoder()
+            atexit.register(__transcoder.shutdown)
+        return __transcoder
@@ -0,0 +1,317 @@
+#!/usr/bin/env python3
+"""
+Compare the chapter cleaner with its previous multi-pass version.
+
+The chapters are generated from the markup commonly found on the sources:
+ads, scripts, comments, nested blocks, line breaks, images and tables.
+The output of both cleaners must be identical for every chapter.
+
+The matching of bad texts is measured with the rules of the sources.
+The paragraph extraction is also measured on deeply nested elements and
+on a single huge element, where the previous version was quadratic.
+"""
+import os
+import random
+import re
+import sys
+import time
+from typing import Callable, List
+
+from bs4 import BeautifulSoup, Comment, Tag
+
+try:
+    path = os.path.realpath(os.path.abspath(__file__))
+    sys.path.insert(0, os.path.dirname(os.path.dirname(path)))
+    from lncrawl.core.cleaner import LINE_SEP, NONPRINTABLE_MAPPING, TextCleaner
+except ImportError:
+    print("lncrawl not found")
+    exit(1)
+
+CHAPTER_COUNT = 100
+SEED = 42
+
+
+class LegacyCleaner(TextCleaner):
+    """The cleaner before it was merged into a single walk,
+    compiling its text rules on each instance"""
+
+    def clean_contents(self, div):
+        if not isinstance(div, Tag):
+            return div
+
+        if self.bad_css:
+            for bad in div.select(",".join(self.bad_css)):
+                bad.extract()
+
+        if self.bad_tag_text_pairs:
+            for tag in div.select(",".join(self.bad_tag_text_pairs.keys())):
+                if self.tag_contains_bad_text(tag):
+                    tag.extract()
+
+        for tag in div.find_all(True):
+            if not isinstance(tag, Tag):
+                continue
+            if tag.name in self.bad_tags:
+                tag.extract()
+            elif tag.name in ["br", "hr"]:
+                self.extract_on_duplicate_sibling(tag)
+            elif tag.name == "img":
+                self.clean_image(tag)
+            else:
+                self.clean_attributes(tag)
+
+        self.clean_attributes(div)
+        return div
+
+    def clean_text(self, text) -> str:
+        text = str(text).strip()
+        text = text.translate(NONPRINTABLE_MAPPING)
+        if not hasattr(self, "_subs_"):
+            self._subs_ = re.compile(
+                "|".join([f"({x})" for x in self.substitutions.keys()]),
+                flags=re.IGNORECASE,
+            )
+        text = self._subs_.sub(
+            lambda m: self.substitutions[str(m.group(0)).lower()], text
+        )
+        return text
+
+    def tag_contains_bad_text(self, tag: Tag) -> bool:
+        pattern = self.bad_tag_text_pairs.get(tag.name)
+        if not tag.text:
+            return True
+        if not pattern:
+            return False
+        if isinstance(pattern, list):
+            pattern = "|".join([f"({x})" for x in pattern if x])
+        if not isinstance(pattern, re.Pattern):
+            pattern = re.compile(pattern, re.M)
+            self.bad_tag_text_pairs[tag.name] = pattern
+        return bool(pattern.search(tag.text))
+
+    def contains_bad_texts(self, text: str) -> bool:
+        if not text.strip():
+            return True
+        if not self.bad_text_regex:
+            return False
+        if not hasattr(self, "__blacklist__"):
+            pattern = re.compile("|".join(["(%s)" % p for p in self.bad_text_regex]))
+            self.__blacklist__ = pattern
+        return bool(self.__blacklist__.search(text))
+
+    def extract_contents(self, tag) -> str:
+        self.clean_contents(tag)
+        body = self.extract_paragraphs(tag)
+        paragraphs = " ".join(body).split(LINE_SEP)
+        return "".join(
+            [
+                f"<p>{p.strip()}</p>"
+                for p in paragraphs
+                # stripped to match the anchored patterns like the current version
+                if not self.contains_bad_texts(p.strip())
+            ]
+        )
+
+    def extract_paragraphs(self, tag) -> list:
+        if not isinstance(tag, Tag):
+            return []
+
+        body = []
+        for elem in tag.contents:
+            if isinstance(elem, Comment):
+                continue
+            if not isinstance(elem, Tag):
+                body.append(self.clean_text(elem))
+                continue
+            if elem.name in self.unchanged_tags:
+                body.append(str(elem))
+                continue
+            if elem.name in ["br", "hr"]:
+                body.append(LINE_SEP)
+                continue
+
+            is_block = elem.name in self.p_block_tags
+            is_plain = elem.name in self.plain_text_tags
+            content = " ".join(self.extract_paragraphs(elem))
+
+            if is_block:
+                body.append(LINE_SEP)
+
+            for line in content.split(LINE_SEP):
+                line = line.strip()
+                if not line:
+                    continue
+                if not (is_plain or is_block):
+                    line = "<%s>%s</%s>" % (elem.name, line, elem.name)
+                body.append(line)
+                body.append(LINE_SEP)
+
+            if body and body[-1] == LINE_SEP and not is_block:
+                body.pop()
+
+        return [x.strip() for x in body if x.strip()]
+
+
+def configure(cleaner: TextCleaner, variant: int) -> TextCleaner:
+    """Settings like the ones used by the sources"""
+    if variant >= 1:
+        cleaner.bad_css.update([".note", ".entry .title a", "div[style*='none']"])
+        cleaner.bad_tag_text_pairs.update(
+            {
+                "p": [r"^Translator:", r"Read at \w+\.com"],
+                "h3": r"^Chapter \d+",
+            }
+        )
+    if variant == 2:
+        # matched before cleaning, as these depend on the siblings
+        cleaner.bad_css.update(["p.note + p", "div > p:first-child"])
+    if variant >= 3:
+        cleaner.bad_text_regex = set(
+            [
+                r"^Translator:",
+                r"Read at \w+\.com",
+                r"consectetur\s+elit$",
+                r"tom & jerry",
+                "dolor amet",
+            ]
+        )
+    return cleaner
+
+
+def random_text(rng: random.Random) -> str:
+    words = ["lorem", "ipsum", "dolor", "<sit>", "amet", "&", "consectetur",
+             "​adipiscing", "elit", "Translator:", "Read at site.com",
+             "Chapter 12", " ", "tom & jerry", "<b>"]
+    return " ".join(rng.choice(words) for _ in range(rng.randint(0, 12)))
+
+
+def random_node(rng: random.Random, depth: int = 0) -> str:
+    kind = rng.random()
+    text = random_text(rng)
+    if depth > 2 or kind < 0.25:
+        return text
+    if kind < 0.35:
+        return rng.choice(["<br>", "<br><br>", "<br/><br/><br/>", "<hr>", "<br> <br>"])
+    if kind < 0.40:
+        return rng.choice(
+            [
+                '<img src="/a.jpg">',
+                '<img data-src="/b.png" class="lazy">',
+                '<img data-lazy-src="https://x.com/c.gif" alt="c">',
+                "<img>",
+            ]
+        )
+    if kind < 0.45:
+        return rng.choice(
+            [
+                "<script>var ad = 1;</script>",
+                "<!-- comment -->",
+                '<div class="ads">ad text</div>',
+                '<ins class="adsbygoogle"></ins>',
+                '<p class="note">note</p>',
+                '<a href="https://patreon.com/x">support</a>',
+                "<style>p { color: red }</style>",
+                '<div style="display: none">hidden</div>',
+            ]
+        )
+    tag = rng.choice(["p", "div", "span", "em", "strong", "a", "h3", "section",
+                      "table", "tr", "td", "blockquote", "sup", "pre"])
+    attrs = rng.choice([
+        "",
+        ' class="title"',
+        ' style="font-weight: bold; color: red"',
+        ' id="x" onclick="f()"',
+        ' style="FONT-STYLE:italic"',
+    ])
+    inner = "".join(random_node(rng, depth + 1) for _ in range(rng.randint(0, 4)))
+    return f"<{tag}{attrs}>{text}{inner}</{tag}>"
+
+
+def make_corpus() -> List[str]:
+    rng = random.Random(SEED)
+    corpus = []
+    for _ in range(CHAPTER_COUNT):
+        nodes = "".join(random_node(rng) for _ in range(rng.randint(20, 80)))
+        corpus.append(f'<div class="entry">{nodes}</div>')
+    return corpus
+
+
+def make_nested_corpus() -> List[str]:
+    """Pathological chapters for the paragraph extraction"""
+    paragraphs = "".join(f"<p>Paragraph {i} <em>with</em> text</p>" for i in range(500))
+    lines = "".join(f"Line {i} of a single block<br>" for i in range(5000))
+    return [
+        # blocks nested in wrapper templates
+        '<div class="entry">' + "<div>" * 200 + paragraphs + "</div>" * 200 + "</div>",
+        # inline formatting nested many times
+        '<div class="entry">' + "<span><em>" * 100 + paragraphs + "</em></span>" * 100 + "</div>",
+        # the whole chapter in one element
+        f'<div class="entry"><div>{lines}</div></div>',
+    ]
+
+
+def run(cleaner: TextCleaner, corpus: List[str]) -> List[str]:
+    return [
+        cleaner.extract_contents(BeautifulSoup(html, "lxml").select_one("div.entry"))
+        for html in corpus
+    ]
+
+
+def measure_time(fn: Callable, corpus: List[str], repeat: int = 3) -> float:
+    """CPU time per chapter, excluding the parsing"""
+    best = float("inf")
+    for _ in range(repeat):
+        tags = [BeautifulSoup(html, "lxml").select_one("div.entry") for html in corpus]
+        start = time.process_time()
+        for tag in tags:
+            fn(tag)
+        best = min(best, time.process_time() - start)
+    return best * 1000 / len(corpus)
+
+
+def compare(legacy: TextCleaner, current: TextCleaner, corpus: List[str], name: str) -> None:
+    expected = run(legacy, corpus)
+    actual = run(current, corpus)
+    mismatches = [i for i, (a, b) in enumerate(zip(expected, actual)) if a != b]
+    if mismatches:
+        print(f"{name}: {len(mismatches)} chapters differ, e.g. #{mismatches[0]}")
+        exit(1)
+
+
+def main():
+    corpus = make_corpus()
+    print(f"{len(corpus)} chapters")
+    print("%-32s %12s %12s" % ("", "legacy", "current"))
+    for variant in range(4):
+        legacy = configure(LegacyCleaner(), variant)
+        current = configure(TextCleaner(), variant)
+        compare(legacy, current, corpus, f"variant {variant}")
+        print("%-32s %12.2f %12.2f" % (
+            f"variant {variant} clean (ms/chapter)",
+            measure_time(legacy.clean_contents, corpus),
+            measure_time(current.clean_contents, corpus),
+        ))
+    print("%-32s %12.2f %12.2f" % (
+        f"variant {variant} contents (ms/chapter)",
+        measure_time(legacy.extract_contents, corpus),
+        measure_time(current.extract_contents, corpus),
+    ))
+
+    legacy, current = LegacyCleaner(), TextCleaner()
+    print("%-32s %12.2f %12.2f" % (
+        "paragraphs (ms/chapter)",
+        measure_time(legacy.extract_paragraphs, corpus),
+        measure_time(current.extract_paragraphs, corpus),
+    ))
+    for i, html in enumerate(make_nested_corpus()):
+        compare(legacy, current, [html], f"nested #{i}")
+        print("%-32s %12.2f %12.2f" % (
+            f"nested #{i} paragraphs (ms)",
+            measure_time(legacy.extract_paragraphs, [html]),
+            measure_time(current.extract_paragraphs, [html]),
+        ))
+    print("output is identical")
+
+
+if __name__ == "__main__":
+    main()
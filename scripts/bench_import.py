@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Measure the time to start and import the modules of lncrawl.
+
+Each import is timed in a new python process, as it happens on every start
+of the app, a bot worker or the index generator.
+"""
+import os
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+WORKDIR = Path(__file__).parent.parent.absolute()
+REPEAT = 7
+
+# how the nonprintable characters were found on every import before
+LEGACY_TABLE = """
+import itertools, sys, unicodedata
+INVISIBLE_CHARS = [
+    code
+    for code in range(sys.maxunicode)
+    if unicodedata.category(chr(code)) in {"Cf", "Cc"}
+]
+NONPRINTABLE = itertools.chain(range(0x00, 0x20), range(0x7F, 0xA0), INVISIBLE_CHARS)
+NONPRINTABLE_MAPPING = {character: None for character in NONPRINTABLE}
+"""
+
+CASES = [
+    ("python", "pass"),
+    ("legacy nonprintable table", LEGACY_TABLE),
+    ("import lncrawl.core.cleaner", "import lncrawl.core.cleaner"),
+    ("first clean_text", "from lncrawl.core.cleaner import TextCleaner; TextCleaner().clean_text('a')"),
+    ("import lncrawl.core.crawler", "import lncrawl.core.crawler"),
+]
+
+
+def measure(code: str) -> float:
+    """Best wall time of a new process running the code, in milliseconds"""
+    env = dict(os.environ, PYTHONPATH=str(WORKDIR), PYTHONDONTWRITEBYTECODE="")
+    best = float("inf")
+    for _ in range(REPEAT):
+        start = time.perf_counter()
+        subprocess.run(
+            [sys.executable, "-c", code],
+            env=env,
+            cwd=WORKDIR,
+            check=True,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def measure_module(module: str) -> float:
+    """Best time to run the module itself when imported, in milliseconds"""
+    env = dict(os.environ, PYTHONPATH=str(WORKDIR))
+    best = float("inf")
+    for _ in range(REPEAT):
+        result = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+            env=env,
+            cwd=WORKDIR,
+            check=True,
+            capture_output=True,
+            text=True,
+        )
+        elapsed = 0
+        for line in result.stderr.splitlines():
+            # import time: self [us] | cumulative | imported package
+            # the module may be listed again after its parent packages
+            parts = line.split("|")
+            if len(parts) == 3 and parts[2].strip() == module:
+                elapsed = max(elapsed, int(parts[0].split(":")[1]))
+        best = min(best, elapsed / 1000)
+    return best
+
+
+def main():
+    print("%-32s %12s" % ("", "ms"))
+    for name, code in CASES:
+        print("%-32s %12.1f" % (name, measure(code)))
+    print("%-32s %12.1f" % ("lncrawl.core.cleaner itself", measure_module("lncrawl.core.cleaner")))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+Compare the memory and access time of the chapter models on a large novel.
+
+The python-box based model, which was used before, is the baseline.
+"""
+import gc
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Callable, List
+
+from box import Box
+
+try:
+    path = os.path.realpath(os.path.abspath(__file__))
+    sys.path.insert(0, os.path.dirname(os.path.dirname(path)))
+    from lncrawl.core.chapterstore import ChapterStore
+    from lncrawl.models import Chapter
+except ImportError:
+    print("lncrawl not found")
+    exit(1)
+
+CHAPTER_COUNT = 10000
+BODY = "".join(f"<p>Paragraph {i} of the chapter with some text.</p>" for i in range(60))
+
+
+class BoxChapter(Box):
+    def __init__(self, id, url="", title="", volume=None, volume_title=None,
+                 body=None, images=dict(), success=False, **kwargs):
+        self.id = id
+        self.url = url
+        self.title = title
+        self.volume = volume
+        self.volume_title = volume_title
+        self.body = body
+        self.images = images
+        self.success = success
+        self.update(kwargs)
+
+
+def make_chapters(model: Callable, body=None) -> List:
+    return [
+        model(
+            id=i,
+            url=f"https://example.com/novel/chapter-{i}",
+            title=f"Chapter {i}",
+            volume=1 + i // 100,
+            body=f"<h1>Chapter {i}</h1>{body}" if body else None,
+        )
+        for i in range(1, CHAPTER_COUNT + 1)
+    ]
+
+
+def measure_memory(fn: Callable) -> float:
+    gc.collect()
+    tracemalloc.start()
+    result = fn()
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    return current / 1024 / 1024
+
+
+def measure_time(fn: Callable, repeat: int = 5) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def access_fields(chapters: List) -> None:
+    # the fields used by format_novel and the binders
+    for chapter in chapters:
+        chapter.id, chapter.title, chapter.volume
+        chapter["id"], chapter["title"], chapter["volume"]
+        chapter.get("volume")
+
+
+def restore_chapters(store: ChapterStore) -> List:
+    chapters = make_chapters(Chapter)
+    store.restore(chapters)
+    return chapters
+
+
+def main():
+    print(f"{CHAPTER_COUNT} chapters")
+    print("%-32s %12s %12s" % ("", "box", "slots"))
+
+    row = "%-32s %12.1f %12.1f"
+    print(row % (
+        "memory without body (MB)",
+        measure_memory(lambda: make_chapters(BoxChapter)),
+        measure_memory(lambda: make_chapters(Chapter)),
+    ))
+    print(row % (
+        "create (ms)",
+        measure_time(lambda: make_chapters(BoxChapter)),
+        measure_time(lambda: make_chapters(Chapter)),
+    ))
+
+    box_chapters = make_chapters(BoxChapter)
+    slot_chapters = make_chapters(Chapter)
+    print(row % (
+        "field access (ms)",
+        measure_time(lambda: access_fields(box_chapters)),
+        measure_time(lambda: access_fields(slot_chapters)),
+    ))
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        with ChapterStore(os.path.join(tmp_dir, "chapters.db")) as store:
+            store.put_many(make_chapters(Chapter, BODY))
+            print(row % (
+                "memory with body (MB)",
+                measure_memory(lambda: make_chapters(BoxChapter, BODY)),
+                measure_memory(lambda: restore_chapters(store)),
+            ))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,45 @@
+#!/usr/bin/env python3
+"""
+Generate the table of nonprintable characters removed by the text cleaner.
+
+Finding them needs the category of every unicode character, which is too
+slow to do on every start. Run this again with a newer python to update the
+table for a newer unicode version.
+"""
+import os
+import sys
+import unicodedata
+from pathlib import Path
+
+try:
+    path = os.path.realpath(os.path.abspath(__file__))
+    sys.path.insert(0, os.path.dirname(os.path.dirname(path)))
+    from lncrawl.core.cleaner import find_nonprintable_ranges
+except ImportError:
+    print("lncrawl not found")
+    exit(1)
+
+OUTPUT_FILE = Path(__file__).parent.parent / "lncrawl" / "assets" / "nonprintable.py"
+
+
+def main():
+    ranges = find_nonprintable_ranges()
+    lines = [
+        '"""',
+        "Ranges of the nonprintable characters.",
+        "Generated by scripts/gen_nonprintable.py. Do not edit.",
+        '"""',
+        "",
+        f'UNIDATA_VERSION = "{unicodedata.unidata_version}"',
+        "",
+        "NONPRINTABLE_RANGES = [",
+        *[f"    (0x{start:04X}, 0x{end:04X})," for start, end in ranges],
+        "]",
+        "",
+    ]
+    OUTPUT_FILE.write_text("\n".join(lines), encoding="utf-8")
+    print(f"{len(ranges)} ranges of unicode {unicodedata.unidata_version} written to {OUTPUT_FILE}")
+
+
+if __name__ == "__main__":
+    main()